@@ -0,0 +1,343 @@
+# consume-wise-backend/analyze_jobs.py
+
+import os
+import hmac
+import json
+import uuid
+import asyncio
+import socket
+import hashlib
+import logging
+import ipaddress
+import http.client
+import urllib.parse
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Collection, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from logs import trace_id_var
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL = (COMPLETED, FAILED)
+
+
+class IdempotencyConflict(Exception):
+    # The idempotency key was already used for a different upload
+    pass
+
+
+class CallbackRejected(Exception):
+    # The callback URL is not http(s) or points somewhere jobs may not call
+    pass
+
+
+def check_callback_url(callback_url: str, allowed_hosts: Collection[str] = ()) -> str:
+    # The address to deliver a callback to. Without an allowlist the host must resolve
+    # only to public addresses, so a callback cannot reach the loopback, private or
+    # link-local (cloud metadata) networks of the server; with one, only its hosts are
+    # accepted, and they may be internal.
+    parts = urllib.parse.urlsplit(callback_url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise CallbackRejected("callback_url must be an http(s) URL.")
+    host = parts.hostname.lower()
+    if allowed_hosts and host not in allowed_hosts:
+        raise CallbackRejected("callback_url host is not allowed.")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)))
+    except (ValueError, OSError):
+        raise CallbackRejected("callback_url host could not be resolved.")
+    if not allowed_hosts:
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%")[0])
+            if ip.version == 6 and ip.ipv4_mapped:
+                ip = ip.ipv4_mapped
+            if not ip.is_global or ip.is_multicast:
+                raise CallbackRejected("callback_url must point to a public address.")
+    return addresses[0]
+
+
+def post_callback(callback_url: str, address: str, body: bytes, headers: Dict[str, str], timeout: float) -> int:
+    # POST to the checked address (the name is not resolved again, so it cannot be
+    # re-pointed after the check); the Host header and TLS certificate still use the
+    # URL's host. Redirects are not followed: a 3xx is a failed delivery.
+    parts = urllib.parse.urlsplit(callback_url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.hostname, port, timeout=timeout)
+    connection._create_connection = lambda _, *args: socket.create_connection((address, port), *args)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    try:
+        connection.request("POST", path, body=body, headers=headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+class AnalyzeJobService:
+    # Asynchronous /analyze: a submission is stored and answered with a job id at once,
+    # and a fixed number of local workers run the pipeline. Jobs live in MongoDB with a
+    # TTL, so results can be polled (or long-polled) from any process until they expire,
+    # and queued jobs survive a restart because the upload is kept on disk until it ran.
+    def __init__(
+        self,
+        jobs_collection,
+        run_job: Callable[[bytes, Dict], Awaitable[Dict]],
+        work_dir: str,
+        concurrency: int = 2,
+        ttl_seconds: float = 24 * 3600,
+        max_attempts: int = 5,
+        webhook_secret: Optional[str] = None,
+        webhook_timeout_seconds: float = 10,
+        webhook_attempts: int = 3,
+        callback_hosts: Collection[str] = (),  # Only these callback hosts when set (see check_callback_url)
+    ):
+        self.jobs = jobs_collection
+        self.run_job = run_job
+        self.work_dir = work_dir
+        self.concurrency = concurrency
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+        self.webhook_secret = webhook_secret
+        self.webhook_timeout_seconds = webhook_timeout_seconds
+        self.webhook_attempts = webhook_attempts
+        self.callback_hosts = {host.lower() for host in callback_hosts}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self.submitted = registry.counter("analyze_jobs.submitted")
+        self.reused = registry.counter("analyze_jobs.idempotent_hits")
+        self.completed = registry.counter("analyze_jobs.completed")
+        self.failed = registry.counter("analyze_jobs.failed")
+        self.webhooks_delivered = registry.counter("analyze_jobs.webhooks.delivered")
+        self.webhooks_failed = registry.counter("analyze_jobs.webhooks.failed")
+        self.run_timer = registry.timer("analyze_jobs.run")
+        self.webhook_timer = registry.timer("analyze_jobs.webhooks.call")
+        self.queue_wait_timer = registry.timer("analyze_jobs.queue_wait")
+        os.makedirs(work_dir, exist_ok=True)
+
+    async def ensure_indexes(self) -> None:
+        # Finished and abandoned jobs disappear once expires_at has passed
+        await self.jobs.create_index("expires_at", expireAfterSeconds=0)
+        await self.jobs.create_index("idempotency_key", unique=True, sparse=True)
+        await self.jobs.create_index("status")
+
+    def upload_path(self, job_id: str) -> str:
+        return os.path.join(self.work_dir, f"{job_id}.upload")
+
+    def start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def resume_incomplete(self) -> None:
+        # Jobs a previous process accepted but did not finish
+        async for job in self.jobs.find({"status": {"$in": [QUEUED, RUNNING]}}, {"_id": 1}):
+            if os.path.exists(self.upload_path(job["_id"])):
+                self._queue.put_nowait(job["_id"])
+            else:
+                await self._finish(job["_id"], FAILED, error={"status_code": 500, "detail": "Upload was lost."})
+
+    async def submit(
+        self,
+        image_bytes: bytes,
+        options: Dict,
+        idempotency_key: Optional[str] = None,
+        callback_url: Optional[str] = None,
+    ) -> Dict:
+        # Returns the job; a retried submission with the same idempotency key gets the
+        # original job back instead of running the pipeline again
+        if callback_url:
+            await asyncio.to_thread(check_callback_url, callback_url, self.callback_hosts)
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        if idempotency_key:
+            existing = await self.jobs.find_one({"idempotency_key": idempotency_key}, {"result": 0})
+            if existing is not None:
+                return self._reuse(existing, digest)
+
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._save_upload, job_id, image_bytes)
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "status": QUEUED,
+            "options": options,
+            "upload_digest": digest,
+            "callback_url": callback_url,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        if idempotency_key:
+            job["idempotency_key"] = idempotency_key
+        try:
+            await self.jobs.insert_one(job)
+        except DuplicateKeyError:
+            # A concurrent retry won the race
+            os.remove(self.upload_path(job_id))
+            existing = await self.jobs.find_one({"idempotency_key": idempotency_key}, {"result": 0})
+            return self._reuse(existing, digest)
+        self.submitted.inc()
+        self._queue.put_nowait(job_id)
+        return job
+
+    def _reuse(self, job: Dict, digest: str) -> Dict:
+        if job.get("upload_digest") != digest:
+            raise IdempotencyConflict("Idempotency key was already used with a different image.")
+        self.reused.inc()
+        return job
+
+    def _save_upload(self, job_id: str, image_bytes: bytes) -> None:
+        temp_path = self.upload_path(job_id) + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(image_bytes)
+        os.replace(temp_path, self.upload_path(job_id))
+
+    async def get(self, job_id: str, wait_seconds: float = 0) -> Optional[Dict]:
+        # Long-poll: returns as soon as the job finishes, or after wait_seconds. Jobs run by
+        # this process wake the waiter directly; others are re-read every second.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+        while True:
+            job = await self.jobs.find_one({"_id": job_id})
+            remaining = deadline - loop.time()
+            if job is None or job["status"] in TERMINAL or remaining <= 0:
+                if job is None or job["status"] in TERMINAL:
+                    self._finished.pop(job_id, None)
+                return job
+            event = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.exception("Analyze job %s crashed: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        # Everything logged while the job runs carries the job id as its trace id
+        trace_id_var.set(job_id)
+        claimed = await self.jobs.find_one_and_update(
+            {"_id": job_id, "status": {"$in": [QUEUED, RUNNING]}},
+            {"$set": {"status": RUNNING, "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+        )
+        if claimed is None:
+            return
+        self.queue_wait_timer.observe((datetime.utcnow() - claimed["created_at"]).total_seconds())
+        image_bytes = await asyncio.to_thread(self._read_upload, job_id)
+
+        attempt = 0
+        with self.run_timer.time():
+            while True:
+                try:
+                    result = await self.run_job(image_bytes, claimed.get("options") or {})
+                    await self._finish(job_id, COMPLETED, result=result)
+                    break
+                except Exception as e:
+                    attempt += 1
+                    status_code = getattr(e, "status_code", 500)
+                    # Back off while the OCR pool or the LLM is saturated
+                    if status_code == 503 and attempt < self.max_attempts:
+                        await asyncio.sleep(min(2 ** attempt, 30))
+                        continue
+                    if not hasattr(e, "status_code"):
+                        logger.exception("Analyze job %s failed: %s", job_id, e)
+                    detail = str(getattr(e, "detail", "")) or "Internal Server Error."
+                    await self._finish(job_id, FAILED, error={"status_code": status_code, "detail": detail})
+                    break
+
+        if claimed.get("callback_url"):
+            await self._deliver(job_id, claimed["callback_url"])
+
+    def _read_upload(self, job_id: str) -> bytes:
+        with open(self.upload_path(job_id), "rb") as f:
+            return f.read()
+
+    async def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[Dict] = None) -> None:
+        now = datetime.utcnow()
+        update = {"status": status, "updated_at": now, "finished_at": now, "expires_at": now + timedelta(seconds=self.ttl_seconds)}
+        if result is not None:
+            update["result"] = result
+        if error is not None:
+            update["error"] = error
+        await self.jobs.update_one({"_id": job_id}, {"$set": update})
+        (self.completed if status == COMPLETED else self.failed).inc()
+        try:
+            os.remove(self.upload_path(job_id))
+        except OSError:
+            pass
+        event = self._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _deliver(self, job_id: str, callback_url: str) -> None:
+        # POST the finished job to the client's callback URL, retrying with backoff.
+        # With a secret configured the body is signed: X-Signature: sha256=<hex hmac>.
+        # The URL is checked again, as the name may resolve elsewhere than at submission.
+        job = public_job(await self.jobs.find_one({"_id": job_id}))
+        body = json.dumps(job, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Job-Id": job_id}
+        if self.webhook_secret:
+            signature = hmac.new(self.webhook_secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Signature"] = f"sha256={signature}"
+
+        def post() -> int:
+            address = check_callback_url(callback_url, self.callback_hosts)
+            return post_callback(callback_url, address, body, headers, self.webhook_timeout_seconds)
+
+        for attempt in range(1, self.webhook_attempts + 1):
+            try:
+                with self.webhook_timer.time():
+                    status = await asyncio.to_thread(post)
+                if 200 <= status < 300:
+                    self.webhooks_delivered.inc()
+                    await self.jobs.update_one({"_id": job_id}, {"$set": {"callback_delivered_at": datetime.utcnow()}})
+                    return
+                logger.warning("Callback for analyze job %s got HTTP %d (attempt %d)", job_id, status, attempt)
+            except CallbackRejected as e:
+                logger.warning("Callback for analyze job %s rejected: %s", job_id, e)
+                break
+            except Exception as e:
+                logger.warning("Callback for analyze job %s failed (attempt %d): %s", job_id, attempt, e)
+            if attempt < self.webhook_attempts:
+                await asyncio.sleep(2 ** attempt)
+        self.webhooks_failed.inc()
+
+
+def public_job(job: Dict) -> Dict:
+    # API view of a job document
+    view = {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "expires_at": job["expires_at"],
+    }
+    for field in ("finished_at", "result", "error", "callback_delivered_at"):
+        if field in job:
+            view[field] = job[field]
+    return view
@@ -0,0 +1,91 @@
+# consume-wise-backend/artifacts.py
+
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import Optional, Tuple
+
+from metrics import registry
+
+MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+# Artifact ids are content hashes plus an extension; anything else is rejected
+ARTIFACT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}\.(jpg|webp)$")
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+class ArtifactStore:
+    # Content-addressed files on local disk with a TTL measured from the last write.
+    # The id doubles as a strong ETag because the bytes behind it never change.
+    def __init__(self, directory: str, ttl_seconds: float = 3600, purge_interval_seconds: float = 60):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self.stored = registry.counter("artifacts.stored")
+        self.stored_bytes = registry.counter("artifacts.stored_bytes")
+        self.expired = registry.counter("artifacts.expired")
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, data: bytes, extension: str) -> str:
+        artifact_id = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+        path = os.path.join(self.directory, artifact_id)
+        if os.path.exists(path):
+            # Same content already stored: just refresh its TTL
+            os.utime(path)
+        else:
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.stored.inc()
+            self.stored_bytes.inc(len(data))
+        self._maybe_purge()
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Tuple[str, str]]:
+        # Returns (path, media_type) for a live artifact
+        if not ARTIFACT_ID_PATTERN.match(artifact_id):
+            return None
+        path = os.path.join(self.directory, artifact_id)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return None
+        if modified + self.ttl_seconds < time.time():
+            return None
+        return path, MEDIA_TYPES[artifact_id.rsplit(".", 1)[1]]
+
+    def remaining_ttl(self, path: str) -> int:
+        return max(int(os.path.getmtime(path) + self.ttl_seconds - time.time()), 0)
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval_seconds:
+                return
+            self._last_purge = now
+        self.purge_expired()
+
+    def purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    self.expired.inc()
+            except OSError:
+                pass
@@ -0,0 +1,61 @@
+# consume-wise-backend/barcode.py
+#
+# Barcode / QR detection for the catalog lookup that runs before OCR. Retail barcodes
+# (EAN-13, EAN-8, UPC-A) and GS1 QR codes both carry a GTIN; every code is reduced to one
+# canonical GTIN string so a photo and a catalog entry match however the code was printed.
+
+import re
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+# GS1 Digital Link (https://id.gs1.org/01/<gtin>) or element string ((01)<gtin> / 01<gtin>)
+GS1_GTIN = re.compile(r"(?:/01/|\(01\)|^01)(\d{14})")
+
+
+def gtin_check_digit_ok(digits: str) -> bool:
+    # GS1 mod-10: weights 3 and 1 alternate from the rightmost data digit
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits[:-1])))
+    return (10 - total % 10) % 10 == int(digits[-1])
+
+
+def normalize_barcode(value: Optional[str]) -> Optional[str]:
+    # Canonical GTIN: UPC-A and GTIN-14 with a zero indicator become EAN-13, EAN-8 stays as
+    # is. Anything that is not a valid GTIN (URLs, free text, bad check digit) gives None.
+    if not value:
+        return None
+    value = value.strip()
+    match = GS1_GTIN.search(value)
+    digits = match.group(1) if match else re.sub(r"[\s-]", "", value)
+    if not digits.isdigit() or len(digits) not in (8, 12, 13, 14) or not gtin_check_digit_ok(digits):
+        return None
+    if len(digits) == 12:
+        return "0" + digits
+    if len(digits) == 14 and digits.startswith("0"):
+        return digits[1:]
+    return digits
+
+
+def detect_barcodes(image: np.ndarray, qr_max_side: int = 1280) -> List[str]:
+    # Canonical GTINs of every barcode and QR code found in a BGR image, in detection order.
+    # The 1D detector locates codes on its own downsampled copy but decodes at full
+    # resolution, so it gets the original frame; QR search costs grow with the pixel count
+    # (~200 ms on a 6 MP photo), so QR codes are looked for on a copy at most qr_max_side wide.
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    values = []
+    found, decoded, _, _ = cv2.barcode.BarcodeDetector().detectAndDecodeWithType(gray)
+    if found:
+        values.extend(decoded)
+    scale = qr_max_side / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    found, decoded, _, _ = cv2.QRCodeDetector().detectAndDecodeMulti(gray)
+    if found:
+        values.extend(decoded)
+    codes = []
+    for value in values:
+        code = normalize_barcode(value)
+        if code and code not in codes:
+            codes.append(code)
+    return codes
@@ -0,0 +1,303 @@
+# consume-wise-backend/benchmarks/e2e_bench.py
+#
+# End-to-end load test for /analyze, /add_product and /get_products. By default the
+# app runs in-process with the fake LLM backend and an in-memory MongoDB stand-in
+# (mongomock-motor), so only OCR and our own code are measured. Reports p50/p95/p99,
+# requests per second at each concurrency level, and the average time per pipeline
+# stage taken from the /stats timers. Needs httpx, plus mongomock-motor for --mongo memory.
+#
+#   python benchmarks/e2e_bench.py --concurrency 1,4,16 --requests 100 --output run.json
+#   python benchmarks/e2e_bench.py --mongo mongodb://localhost:27017/bench --llm-latency-ms 1500
+#   python benchmarks/e2e_bench.py --url http://localhost:8000 --endpoints get_products
+#   python benchmarks/e2e_bench.py --compare base.json run.json --threshold 10
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_IMAGES = os.path.join(BACKEND_DIR, "..", "consume-wise", "public", "images")
+DEFAULT_TEXTS = os.path.join(BACKEND_DIR, "benchmarks", "corpus", "ingredients.txt")
+ENDPOINTS = ("analyze", "add_product", "get_products")
+
+# Pipeline stage -> /stats timers that make it up
+STAGES = {
+    "decode": ["image.decode"],
+    "preprocess": ["ocr.preprocess"],
+    "ocr_queue": ["ocr.queue_wait", "ocr.batch_window_wait"],
+    "ocr": ["ocr.execution"],
+    "llm": ["llm.call"],
+    "parse": ["analysis.parse"],
+    "highlight": ["highlight.execution"],
+    "prompt": ["llm.prompt_build"],
+    "base64": ["image.base64_encode"],
+    "db": [
+        "db.products.insert", "db.products.find", "db.products.find_one", "db.products.count",
+        "db.analysis_cache.get", "db.analysis_cache.set",
+    ],
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def load_corpus(image_dir: str, texts_path: str, limit: int):
+    images = []
+    for path in sorted(glob.glob(os.path.join(image_dir, "*")))[:limit or None]:
+        with open(path, "rb") as f:
+            images.append((os.path.basename(path), f.read()))
+    with open(texts_path) as f:
+        texts = [line.strip() for line in f if line.strip()]
+    return images, texts
+
+
+def request_factory(endpoint: str, images, texts, image_mode: str):
+    # Returns a function building the n-th request as (method, path, kwargs)
+    names = [text.split(",")[0].split("(")[0].strip() for text in texts]
+
+    def analyze(n):
+        filename, data = images[n % len(images)]
+        return "POST", "/analyze", {
+            "params": {"image_mode": image_mode},
+            "files": {"file": (filename, data, "image/jpeg")},
+        }
+
+    def add_product(n):
+        return "POST", "/add_product", {"data": {
+            "product_name": f"{names[n % len(names)]} Bench {n}",
+            "product_qty": "100 g",
+            "brand_name": f"Bench Brand {n % 7}",
+            "weightage": 100,
+            "weight_unit": "g",
+            "product_category": random.choice(["Snacks", "Beverages", "Dairy"]),
+            "ingredients": texts[n % len(texts)],
+        }}
+
+    def get_products(n):
+        queries = [
+            {"view": "card"},
+            {"product_name": names[n % len(names)][:4], "view": "summary"},
+            {"product_category": "Snacks", "count": "estimate"},
+            {"brand_name": "bench", "limit": 20},
+        ]
+        return "GET", "/get_products", {"params": queries[n % len(queries)]}
+
+    return {"analyze": analyze, "add_product": add_product, "get_products": get_products}[endpoint]
+
+
+def stage_breakdown(before: Dict, after: Dict, requests: int) -> Dict[str, float]:
+    # Average milliseconds each stage added per request during one run
+    timers_before, timers_after = before.get("timers", {}), after.get("timers", {})
+    stages = {}
+    for stage, names in STAGES.items():
+        total = sum(
+            timers_after.get(name, {}).get("total_ms", 0.0) - timers_before.get(name, {}).get("total_ms", 0.0)
+            for name in names
+        )
+        if total > 0:
+            stages[stage] = round(total / requests, 2)
+    return stages
+
+
+async def run_level(client, build_request, concurrency: int, requests: int) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for n in counter:
+            method, path, kwargs = build_request(n)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except Exception:
+                status = 0
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    before = (await client.get("/stats")).json()
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    after = (await client.get("/stats")).json()
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if not 200 <= status < 300),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "stages_ms": stage_breakdown(before, after, requests),
+    }
+
+
+def configure_environment(args) -> None:
+    # Must run before main is imported: main reads its configuration at import time
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["OCR_WARMUP"] = "false"  # Warmed up explicitly, outside the measurements
+    os.environ["MONGODB_URI"] = "mongodb://localhost:27017" if args.mongo == "memory" else args.mongo
+    if args.cold:
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+        os.environ["CACHE_SHARED"] = "false"
+    if args.mongo == "memory":
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+async def seed_products(collection, texts: List[str], count: int) -> None:
+    from catalog import search_fields
+    from llm import FAKE_ANALYSIS
+    documents = []
+    for n in range(count):
+        document = {
+            "product_name": f"{texts[n % len(texts)].split(',')[0]} Seed {n}",
+            "product_qty": "100 g",
+            "brand_name": f"Seed Brand {n % 11}",
+            "weightage": 100,
+            "weight_unit": "g",
+            "product_category": ["Snacks", "Beverages", "Dairy"][n % 3],
+            "ingredients": [part.strip() for part in texts[n % len(texts)].split(",")],
+            "analysis": FAKE_ANALYSIS,
+            "health_score": {"score": 40 + n % 60, "review": "Seeded product."},
+        }
+        document.update(search_fields(document))
+        documents.append(document)
+    if documents:
+        await collection.insert_many(documents)
+
+
+async def run(args) -> Dict:
+    import httpx
+
+    images, texts = load_corpus(args.images, args.texts, args.limit)
+    endpoints = args.endpoints.split(",")
+    if "analyze" in endpoints and not images:
+        raise SystemExit(f"No images found in {args.images}.")
+
+    app = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=300)
+    else:
+        configure_environment(args)
+        import main
+        app = main.app
+        for handler in app.router.on_startup:
+            await handler()
+        await main.ocr_pool.warmup()
+        await seed_products(main.products_collection, texts, args.seed_products)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+    results = []
+    async with client:
+        for endpoint in endpoints:
+            build_request = request_factory(endpoint, images, texts, args.image_mode)
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                # A short unmeasured burst so each level starts from a warm state
+                await run_level(client, build_request, concurrency, min(concurrency, args.requests))
+                result = {"endpoint": endpoint, **await run_level(client, build_request, concurrency, args.requests)}
+                results.append(result)
+                print_result(result)
+
+    if app is not None:
+        for handler in app.router.on_shutdown:
+            await handler()
+    return {
+        "config": {
+            "url": args.url,
+            "mongo": "external" if args.url else ("memory" if args.mongo == "memory" else "mongod"),
+            "llm_latency_ms": args.llm_latency_ms,
+            "cold": args.cold,
+            "images": len(images),
+            "image_mode": args.image_mode,
+        },
+        "results": results,
+    }
+
+
+def print_result(result: Dict) -> None:
+    stages = " ".join(f"{stage}={ms:.1f}" for stage, ms in result["stages_ms"].items())
+    print(
+        f"{result['endpoint']:<13} c={result['concurrency']:<3} rps={result['rps']:<8.1f} "
+        f"p50={result['p50_ms']:<8.1f} p95={result['p95_ms']:<8.1f} p99={result['p99_ms']:<8.1f} "
+        f"errors={result['errors']:<3} {stages}"
+    )
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> bool:
+    # Prints the change per endpoint and concurrency; False if anything regressed by more
+    # than `threshold` percent (higher p95/p99 or lower rps)
+    with open(base_path) as f:
+        base = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    def change(old: float, current: float) -> float:
+        return 100 * (current - old) / old if old else 0.0
+
+    ok = True
+    print(f"{'endpoint':<13} {'c':>3} {'rps':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    for key in sorted(base.keys() & new.keys()):
+        old, current = base[key], new[key]
+        deltas = {metric: change(old[metric], current[metric]) for metric in ("rps", "p50_ms", "p95_ms", "p99_ms")}
+        regressed = deltas["rps"] < -threshold or deltas["p95_ms"] > threshold or deltas["p99_ms"] > threshold
+        ok = ok and not regressed
+        cells = " ".join(
+            f"{current[metric]:>9.1f} ({deltas[metric]:+5.1f}%)" for metric in ("rps", "p50_ms", "p95_ms", "p99_ms")
+        )
+        print(f"{key[0]:<13} {key[1]:>3} {cells}{'  REGRESSION' if regressed else ''}")
+        for stage in sorted(set(old["stages_ms"]) | set(current["stages_ms"])):
+            before, after = old["stages_ms"].get(stage, 0.0), current["stages_ms"].get(stage, 0.0)
+            print(f"{'':<18}{stage:<11} {before:>8.1f} -> {after:>8.1f} ms")
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"{key[0]:<13} {key[1]:>3} only in {'base' if key in base else 'new'} run")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark for the backend endpoints")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and level")
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="Directory of label photos")
+    parser.add_argument("--texts", default=DEFAULT_TEXTS, help="One ingredient list per line")
+    parser.add_argument("--limit", type=int, default=50, help="Max images loaded from the corpus")
+    parser.add_argument("--image-mode", default="inline", choices=["inline", "url"])
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Fake Gemini latency")
+    parser.add_argument("--mongo", default="memory", help="'memory' or a MongoDB URI (e.g. a local mongod)")
+    parser.add_argument("--seed-products", type=int, default=500)
+    parser.add_argument("--cold", action="store_true", help="Disable the in-process analysis caches")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two result files")
+    parser.add_argument("--threshold", type=float, default=10, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(0 if compare(*args.compare, args.threshold) else 1)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
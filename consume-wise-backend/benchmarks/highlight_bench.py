@@ -0,0 +1,68 @@
+# consume-wise-backend/benchmarks/highlight_bench.py
+#
+# Cost of locating and drawing ingredient boxes as labels grow to hundreds of OCR lines.
+# Lines are built from the ingredient corpus; the harmful list mimics an LLM answer.
+#
+#   python benchmarks/highlight_bench.py --lines 50,200,1000
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from highlight import highlight_boxes  # noqa: E402
+from ingredients import IngredientIndex  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(BENCH_DIR, "corpus", "ingredients.txt")
+INDEX = os.path.join(os.path.dirname(BENCH_DIR), "ingredients.json")
+
+
+def synthetic_label(line_count: int, rng: random.Random):
+    with open(CORPUS) as f:
+        ingredients = [item.strip() for line in f for item in line.split(",") if item.strip()]
+    items = []
+    for row in range(line_count):
+        text = ", ".join(rng.sample(ingredients, 3))
+        y = 10 + row * 24
+        items.append({"text": text, "coords": [[10, y], [10 + 8 * len(text), y], [10 + 8 * len(text), y + 20], [10, y + 20]]})
+    harmful = rng.sample(ingredients, 8)
+    return items, harmful
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark highlight matching and drawing")
+    parser.add_argument("--lines", default="50,200,1000", help="Comma-separated OCR line counts")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    index = IngredientIndex.load(INDEX)
+    rng = random.Random(0)
+    print(f"{'lines':>6} {'boxes':>6} {'match ms':>9} {'draw ms':>8} {'us/line':>8}")
+    for line_count in (int(value) for value in args.lines.split(",")):
+        items, harmful = synthetic_label(line_count, rng)
+        image = np.zeros((20 + line_count * 24, 1200, 3), np.uint8)
+        match_ms = draw_ms = 0.0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            boxes = highlight_boxes(items, harmful, index)
+            match_ms += (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            for color, name in (((0, 165, 255), "neutral"), ((0, 255, 0), "beneficial"), ((0, 0, 255), "harmful")):
+                if boxes[name]:
+                    cv2.polylines(image, boxes[name], isClosed=True, color=color, thickness=2)
+            draw_ms += (time.perf_counter() - start) * 1000
+        match_ms /= args.repeat
+        draw_ms /= args.repeat
+        box_count = sum(len(polygons) for polygons in boxes.values())
+        print(f"{line_count:>6} {box_count:>6} {match_ms:>9.2f} {draw_ms:>8.2f} {(match_ms + draw_ms) * 1000 / line_count:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# consume-wise-backend/benchmarks/ingredient_index_bench.py
+#
+# Load time, per-list classification latency and coverage of the local ingredient index.
+# Coverage is the share of lists that can be scored without any LLM call.
+#
+#   python benchmarks/ingredient_index_bench.py
+#   python benchmarks/ingredient_index_bench.py --corpus my_lists.txt --repeat 1000
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingredients import IngredientIndex, local_analysis  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(BENCH_DIR, "corpus", "ingredients.txt")
+INDEX = os.path.join(os.path.dirname(BENCH_DIR), "ingredients.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local ingredient index")
+    parser.add_argument("--corpus", default=CORPUS, help="One comma-separated ingredient list per line")
+    parser.add_argument("--index", default=INDEX)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        lists = [line.strip().split(",") for line in f if line.strip()]
+
+    start = time.perf_counter()
+    index = IngredientIndex.load(args.index)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for _ in range(args.repeat):
+        for ingredients in lists:
+            start = time.perf_counter()
+            matches, _ = index.classify(ingredients)
+            local_analysis(matches)
+            latencies.append((time.perf_counter() - start) * 1_000_000)
+
+    results = [index.classify(ingredients) for ingredients in lists]
+    complete = sum(1 for _, unknown in results if not unknown)
+    known = sum(len(matches) for matches, _ in results)
+    unknown = sum(len(unknown) for _, unknown in results)
+    ordered = sorted(latencies)
+
+    print(f"entries: {len(index.entries)}  load: {load_ms:.1f} ms")
+    print(f"lists: {len(lists)}  scored without LLM: {complete} ({complete / len(lists):.0%})")
+    print(f"ingredients known: {known}  unknown: {unknown}")
+    print(
+        f"classify + analysis: p50 {statistics.median(latencies):.1f} us  "
+        f"p95 {ordered[int(0.95 * (len(ordered) - 1))]:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
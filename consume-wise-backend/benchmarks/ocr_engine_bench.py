@@ -0,0 +1,113 @@
+# consume-wise-backend/benchmarks/ocr_engine_bench.py
+#
+# Compares OCR engines on startup time (import + model load), resident memory and
+# per-image latency. Each engine runs in a fresh process so load cost and RSS are not
+# shared between engines.
+#
+#   python benchmarks/ocr_engine_bench.py ../consume-wise/public/images --limit 20
+#   python benchmarks/ocr_engine_bench.py ../consume-wise/public/images --engines paddle-fast,onnx
+
+import os
+import sys
+import glob
+import time
+import argparse
+import resource
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_engines import ENGINES  # noqa: E402
+
+
+def rss_mb() -> float:
+    # Current resident set size of this process
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_engine(name: str, paths, preprocess_images: bool, queue) -> None:
+    try:
+        baseline = rss_mb()
+        start = time.perf_counter()
+        from ocr_engines import create_engine
+        from preprocess import decode_image, preprocess
+        engine = create_engine(name)
+        engine.load()
+        startup_ms = (time.perf_counter() - start) * 1000
+        loaded_rss = rss_mb()
+
+        latencies, lines = [], 0
+        for path in paths:
+            with open(path, "rb") as f:
+                image = decode_image(f.read())
+            if preprocess_images:
+                image, _ = preprocess(image)
+            start = time.perf_counter()
+            lines += len(engine.extract(image))
+            latencies.append((time.perf_counter() - start) * 1000)
+        queue.put({
+            "engine": name,
+            "startup_ms": startup_ms,
+            "model_rss_mb": loaded_rss - baseline,
+            "peak_rss_mb": peak_rss_mb(),
+            "latencies": latencies,
+            "lines": lines,
+        })
+    except Exception as e:
+        queue.put({"engine": name, "error": f"{type(e).__name__}: {e}"})
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR engines")
+    parser.add_argument("image_dir")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated engine names")
+    parser.add_argument("--raw", action="store_true", help="Skip pre-processing (OCR the decoded photo)")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.image_dir, "*")))
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print("No images found.")
+        return
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in args.engines.split(","):
+        queue = context.Queue()
+        process = context.Process(target=run_engine, args=(name, paths, not args.raw, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"images: {len(paths)}")
+    print(f"{'engine':<12} {'startup ms':>10} {'model MB':>9} {'peak MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'lines':>6}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['engine']:<12} unavailable ({result['error']})")
+            continue
+        latencies = result["latencies"]
+        print(
+            f"{result['engine']:<12} {result['startup_ms']:>10.0f} {result['model_rss_mb']:>9.0f} "
+            f"{result['peak_rss_mb']:>8.0f} {statistics.median(latencies):>8.1f} "
+            f"{percentile(latencies, 0.95):>8.1f} {result['lines']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# consume-wise-backend/benchmarks/preprocess_bench.py
+#
+# Measures how much the OCR pre-processing stage shrinks label photos and how much
+# faster OCR runs on the result.
+#
+#   python benchmarks/preprocess_bench.py ../consume-wise/public/images --limit 50
+#   python benchmarks/preprocess_bench.py ../consume-wise/public/images --no-ocr
+
+import os
+import sys
+import glob
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess import decode_image, preprocess  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR pre-processing")
+    parser.add_argument("image_dir")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--max-long-edge", type=int, default=1600)
+    parser.add_argument("--no-crop", action="store_true")
+    parser.add_argument("--no-deskew", action="store_true")
+    parser.add_argument("--no-ocr", action="store_true", help="Only report pixel reduction")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.image_dir, "*")))
+    if args.limit:
+        paths = paths[:args.limit]
+
+    ocr = None
+    if not args.no_ocr:
+        from paddleocr import PaddleOCR
+        ocr = PaddleOCR(use_angle_cls=True, lang="en", use_gpu=False, show_log=False)
+
+    input_pixels = output_pixels = 0
+    preprocess_ms, raw_ocr_ms, processed_ocr_ms = [], [], []
+    for path in paths:
+        with open(path, "rb") as f:
+            image = decode_image(f.read())
+        start = time.perf_counter()
+        processed, _ = preprocess(
+            image,
+            max_long_edge=args.max_long_edge,
+            crop_to_text=not args.no_crop,
+            deskew=not args.no_deskew,
+        )
+        preprocess_ms.append((time.perf_counter() - start) * 1000)
+        input_pixels += image.shape[0] * image.shape[1]
+        output_pixels += processed.shape[0] * processed.shape[1]
+
+        if ocr is not None:
+            start = time.perf_counter()
+            ocr.ocr(image, cls=True)
+            raw_ocr_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            ocr.ocr(processed, cls=True)
+            processed_ocr_ms.append((time.perf_counter() - start) * 1000)
+
+    if not paths:
+        print("No images found.")
+        return
+    print(f"images:              {len(paths)}")
+    print(f"pixel reduction:     {100 * (1 - output_pixels / input_pixels):.1f}%")
+    print(f"preprocess (median): {statistics.median(preprocess_ms):.2f} ms")
+    if raw_ocr_ms:
+        raw, processed = statistics.median(raw_ocr_ms), statistics.median(processed_ocr_ms)
+        print(f"OCR raw (median):    {raw:.1f} ms")
+        print(f"OCR pre (median):    {processed:.1f} ms")
+        print(f"OCR speedup:         {raw / processed:.2f}x (total {sum(raw_ocr_ms) / sum(processed_ocr_ms):.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# consume-wise-backend/benchmarks/profile_tokens.py
+#
+# Token cost of each analysis profile: prompt size, output budget and, with --generate,
+# the output tokens and latency of real calls. Prompt tokens come from the Gemini
+# count_tokens API when GENAI_API_KEY is set, otherwise from a 4-characters-per-token estimate.
+#
+#   python benchmarks/profile_tokens.py
+#   GENAI_API_KEY=... python benchmarks/profile_tokens.py --generate --limit 5
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import GeminiBackend, estimate_tokens  # noqa: E402
+from profiles import PROFILES, build_prompt, max_output_tokens, response_schema  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "ingredients.txt")
+MODEL_NAME = "gemini-1.5-flash"
+
+
+def load_texts(path: str, limit: int):
+    with open(path) as f:
+        texts = [line.strip() for line in f if line.strip()]
+    return texts[:limit] if limit else texts
+
+
+async def run_profile(name, sections, texts, model, backend):
+    prompts = [build_prompt(text, sections) for text in texts]
+    if model is not None:
+        prompt_tokens = [(await model.count_tokens_async(prompt)).total_tokens for prompt in prompts]
+    else:
+        prompt_tokens = [estimate_tokens(prompt) for prompt in prompts]
+    result = {
+        "profile": name,
+        "sections": len(sections),
+        "prompt_chars": statistics.mean(len(prompt) for prompt in prompts),
+        "prompt_tokens": statistics.mean(prompt_tokens),
+        "max_output_tokens": max_output_tokens(sections),
+    }
+    if backend is not None:
+        config = {
+            "temperature": 1,
+            "response_mime_type": "application/json",
+            "response_schema": response_schema(sections),
+            "max_output_tokens": max_output_tokens(sections),
+        }
+        output_tokens, latencies = [], []
+        for prompt in prompts:
+            usage = {}
+            start = time.perf_counter()
+            await backend.generate(prompt, config, usage)
+            latencies.append((time.perf_counter() - start) * 1000)
+            output_tokens.append(usage.get("output_tokens") or 0)
+        result["output_tokens"] = statistics.mean(output_tokens)
+        result["latency_ms"] = statistics.median(latencies)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Report token counts per analysis profile")
+    parser.add_argument("--corpus", default=CORPUS, help="One ingredient text per line")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--generate", action="store_true", help="Also call the model (needs GENAI_API_KEY)")
+    args = parser.parse_args()
+
+    texts = load_texts(args.corpus, args.limit)
+    api_key = os.getenv("GENAI_API_KEY")
+    model = backend = None
+    if api_key:
+        backend = GeminiBackend(api_key=api_key, model_name=MODEL_NAME, generation_config={})
+        model = backend.model
+    elif args.generate:
+        print("--generate needs GENAI_API_KEY.")
+        return
+    if not args.generate:
+        backend = None
+
+    results = [await run_profile(name, PROFILES[name], texts, model, backend) for name in args.profiles.split(",")]
+
+    print(f"texts: {len(texts)}  prompt tokens: {'count_tokens' if model is not None else 'estimated'}")
+    print(f"{'profile':<10} {'sections':>8} {'prompt chars':>12} {'prompt tok':>10} {'max out':>8} {'out tok':>8} {'p50 ms':>8}")
+    for result in results:
+        generated = (
+            f"{result['output_tokens']:>8.0f} {result['latency_ms']:>8.0f}" if "output_tokens" in result
+            else f"{'-':>8} {'-':>8}"
+        )
+        print(
+            f"{result['profile']:<10} {result['sections']:>8} {result['prompt_chars']:>12.0f} "
+            f"{result['prompt_tokens']:>10.0f} {result['max_output_tokens']:>8} {generated}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
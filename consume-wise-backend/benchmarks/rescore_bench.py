@@ -0,0 +1,62 @@
+# consume-wise-backend/benchmarks/rescore_bench.py
+#
+# Scoring cost of a catalogue re-scoring batch: per-product calculate_health_score against
+# feature extraction plus one vectorized health_scores call. Analyses are built from the
+# local ingredient index, so they have the shape of stored product analyses.
+#
+#   python benchmarks/rescore_bench.py --products 100000
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingredients import IngredientIndex, local_analysis  # noqa: E402
+from scoring import calculate_health_score, feature_array, health_scores  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(BENCH_DIR, "corpus", "ingredients.txt")
+INDEX = os.path.join(os.path.dirname(BENCH_DIR), "ingredients.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch health scoring")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    index = IngredientIndex.load(INDEX)
+    with open(CORPUS) as f:
+        lists = [line.strip().split(",") for line in f if line.strip()]
+    templates = [local_analysis(index.classify(ingredients)[0]) for ingredients in lists]
+    rng = random.Random(0)
+    analyses = [rng.choice(templates) for _ in range(args.products)]
+
+    start = time.perf_counter()
+    scalar = [calculate_health_score(analysis) for analysis in analyses]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extract_s = 0.0
+    vectorized = []
+    for offset in range(0, len(analyses), args.batch_size):
+        batch_start = time.perf_counter()
+        features = feature_array(analyses[offset:offset + args.batch_size])
+        extract_s += time.perf_counter() - batch_start
+        vectorized.extend(health_scores(features).tolist())
+    batch_s = time.perf_counter() - start
+
+    assert scalar == vectorized
+    print(f"products: {args.products}  batch size: {args.batch_size}")
+    print(f"per product:  {scalar_s * 1000:8.1f} ms  {args.products / scalar_s:10.0f} products/s")
+    print(
+        f"batched:      {batch_s * 1000:8.1f} ms  {args.products / batch_s:10.0f} products/s"
+        f"  (feature extraction {extract_s / batch_s:.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# consume-wise-backend/cache.py
+
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+def image_cache_key(image_digest: str) -> str:
+    # image_digest is the hex SHA-256 of the raw upload (see LabelImage.digest)
+    return "img:" + image_digest
+
+
+def text_cache_key(normalized_text: str, variant: str = "") -> str:
+    # `variant` separates analyses of the same text that cover different sections
+    key = "txt:" + hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+    return f"{key}:{variant}" if variant else key
+
+
+def json_size(value: Any) -> int:
+    # Approximate in-memory footprint by the size of the JSON encoding
+    return len(json.dumps(value, default=str))
+
+
+class LRUCache:
+    # In-process LRU with per-entry TTL, bounded by entry count and total bytes
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        sizeof: Callable[[Any], int] = json_size,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            # Never let a single oversized value flush the whole cache
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                registry.counter("cache.evictions").inc()
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class MongoCacheTier:
+    # Shared cache tier backed by a MongoDB collection with a TTL index on expires_at
+    def __init__(self, collection, ttl_seconds: float = 24 * 3600):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[Any]:
+        with registry.timer("db.analysis_cache.get").time():
+            document = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"value": 1},
+            )
+        return document["value"] if document else None
+
+    async def set(self, key: str, value: Any) -> None:
+        with registry.timer("db.analysis_cache.set").time():
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "value": value,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                }},
+                upsert=True,
+            )
+
+
+class AnalysisCache:
+    # Two-tier cache: local LRU in front of an optional shared MongoDB tier
+    def __init__(self, name: str, local: LRUCache, shared: Optional[MongoCacheTier] = None):
+        self.name = name
+        self.local = local
+        self.shared = shared
+        self.local_hits = registry.counter(f"cache.{name}.hits.local")
+        self.shared_hits = registry.counter(f"cache.{name}.hits.shared")
+        self.misses = registry.counter(f"cache.{name}.misses")
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits.inc()
+            return value
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                logger.warning("Shared cache lookup failed for %s: %s", self.name, e)
+                value = None
+            if value is not None:
+                self.shared_hits.inc()
+                self.local.set(key, value)
+                return value
+        self.misses.inc()
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value)
+            except Exception as e:
+                logger.warning("Shared cache write failed for %s: %s", self.name, e)
@@ -0,0 +1,252 @@
+# consume-wise-backend/catalog.py
+#
+# Index definitions and search queries for the products collection.
+#
+# Checking that searches are index-backed (exits non-zero if any plan has a COLLSCAN):
+#   MONGODB_URI=mongodb://localhost:27017 python catalog.py
+
+import re
+import json
+import base64
+import binascii
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, TEXT, UpdateOne
+
+# "regex" is the original substring search and stays the default so existing clients keep
+# their results; "prefix" and "text" are index-backed and must be asked for
+SEARCH_MODES = ("regex", "prefix", "text")
+
+# Keyset pagination orders; every order ends with _id so positions are unique
+SORT_KEYS = ("_id", "product_name")
+COUNT_MODES = ("exact", "estimate", "none")
+
+# Stored fields a client may ask for by name (derived search fields stay internal)
+PRODUCT_FIELDS = (
+    "product_name", "product_qty", "brand_name", "weightage", "weight_unit", "product_category",
+    "ingredients", "nutritional_info", "proprietary_claims", "analysis", "analysis_sections", "health_score",
+    "image_url", "purpose", "frequency", "barcode",
+)
+SEARCH_FIELDS = ("product_name_tokens", "brand_name_tokens")
+
+# Named projections for product listings; "full" is every stored field
+PRODUCT_VIEWS = {
+    "summary": ("product_name", "brand_name", "health_score.score"),
+    "card": (
+        "product_name", "brand_name", "product_qty", "weightage", "weight_unit",
+        "product_category", "purpose", "frequency", "health_score", "image_url",
+    ),
+    "full": None,
+}
+
+
+def product_projection(view: str = "full", fields: Optional[List[str]] = None, sort_key: str = "_id") -> Dict:
+    # MongoDB projection for a view or an explicit field list. The sort key is always
+    # included so a cursor can be built from the last document of a page.
+    if fields:
+        included = list(fields)
+    elif PRODUCT_VIEWS[view] is not None:
+        included = list(PRODUCT_VIEWS[view])
+    else:
+        return {field: 0 for field in SEARCH_FIELDS}
+    if sort_key != "_id" and sort_key not in included:
+        included.append(sort_key)
+    return {field: 1 for field in included}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    # "product_name,brand_name" -> ["product_name", "brand_name"]; raises on unknown names
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name.split(".", 1)[0] not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}.")
+    return names
+
+PRODUCT_INDEXES = [
+    ([("product_category", ASCENDING), ("purpose", ASCENDING), ("frequency", ASCENDING)],
+     {"name": "category_purpose_frequency"}),
+    ([("product_name_tokens", ASCENDING)], {"name": "product_name_tokens"}),
+    ([("brand_name_tokens", ASCENDING)], {"name": "brand_name_tokens"}),
+    ([("product_name", ASCENDING), ("_id", ASCENDING)], {"name": "product_name_id"}),
+    # Barcode lookups before OCR; products without a barcode stay out of the index
+    ([("barcode", ASCENDING)], {"name": "barcode", "partialFilterExpression": {"barcode": {"$type": "string"}}}),
+    ([("product_name", TEXT), ("brand_name", TEXT)],
+     {"name": "name_brand_text", "weights": {"product_name": 3, "brand_name": 1}}),
+]
+
+
+def tokenize_name(value: Optional[str]) -> List[str]:
+    # Lower-cased words, punctuation trimmed: "Nature's Best" -> ["nature's", "best"]
+    return [token for token in re.split(r"[^\w']+", (value or "").lower()) if token]
+
+
+def search_fields(document: Dict) -> Dict:
+    # Derived fields stored alongside every product so prefix searches can use an index
+    return {
+        "product_name_tokens": tokenize_name(document.get("product_name")),
+        "brand_name_tokens": tokenize_name(document.get("brand_name")),
+    }
+
+
+def name_filter(field: str, value: str, search_mode: str) -> List[Dict]:
+    if search_mode == "regex":
+        # The original unanchored, case-insensitive substring match (always a full scan)
+        return [{field: {"$regex": value, "$options": "i"}}]
+    # Every typed word must be the start of some word of the name: anchored,
+    # case-sensitive regexes on the lower-cased tokens are bounded index scans.
+    return [{f"{field}_tokens": {"$regex": "^" + re.escape(token)}} for token in tokenize_name(value)]
+
+
+def build_search_query(
+    product_name: Optional[str] = None,
+    brand_name: Optional[str] = None,
+    product_category: Optional[str] = None,
+    purpose: Optional[str] = None,
+    frequency: Optional[str] = None,
+    search_mode: str = "regex",
+) -> Dict:
+    query: Dict = {}
+    if search_mode == "text":
+        terms = " ".join(term for term in (product_name, brand_name) if term)
+        if terms:
+            query["$text"] = {"$search": terms}
+    else:
+        conditions = []
+        if product_name:
+            conditions.extend(name_filter("product_name", product_name, search_mode))
+        if brand_name:
+            conditions.extend(name_filter("brand_name", brand_name, search_mode))
+        if conditions:
+            query["$and"] = conditions
+    if product_category:
+        # Exact match for category
+        query["product_category"] = product_category
+    if purpose:
+        # Exact match for purpose
+        query["purpose"] = purpose
+    if frequency:
+        # Exact match for frequency
+        query["frequency"] = frequency
+    return query
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_key: str, document: Dict) -> str:
+    # Opaque to clients: the last document's sort value and _id, URL-safe base64 JSON
+    position = {"s": sort_key, "id": str(document["_id"])}
+    if sort_key != "_id":
+        position["v"] = document.get(sort_key)
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        position["id"] = ObjectId(position["id"])
+    except (ValueError, KeyError, TypeError, InvalidId, binascii.Error):
+        raise InvalidCursor("Malformed cursor.")
+    if position.get("s") != sort_key:
+        raise InvalidCursor("Cursor was issued for a different sort order.")
+    return position
+
+
+def keyset_filter(sort_key: str, position: Dict[str, Any]) -> Dict:
+    # Everything strictly after the cursor position in (sort_key, _id) order
+    if sort_key == "_id":
+        return {"_id": {"$gt": position["id"]}}
+    return {"$or": [
+        {sort_key: {"$gt": position["v"]}},
+        {sort_key: position["v"], "_id": {"$gt": position["id"]}},
+    ]}
+
+
+def sort_spec(sort_key: str) -> List:
+    if sort_key == "_id":
+        return [("_id", ASCENDING)]
+    return [(sort_key, ASCENDING), ("_id", ASCENDING)]
+
+
+async def ensure_product_indexes(collection) -> None:
+    for keys, options in PRODUCT_INDEXES:
+        await collection.create_index(keys, **options)
+
+
+async def backfill_search_fields(collection, batch_size: int = 500) -> int:
+    # Documents written before the token fields existed get them once
+    updated = 0
+    operations = []
+    cursor = collection.find(
+        {"product_name_tokens": {"$exists": False}},
+        {"product_name": 1, "brand_name": 1},
+    )
+    async for document in cursor:
+        operations.append(UpdateOne({"_id": document["_id"]}, {"$set": search_fields(document)}))
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+
+def plan_stages(plan: Dict) -> List[str]:
+    # Flatten an explain() winning plan into its stage names
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return [stage for stage in stages if stage]
+
+
+async def explain_stages(collection, query: Dict) -> List[str]:
+    explanation = await collection.find(query).explain()
+    return plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+
+# Index-backed modes only: the default regex mode is a full scan by design
+SAMPLE_SEARCHES = [
+    {"product_name": "almond", "search_mode": "prefix"},
+    {"product_name": "almond milk", "search_mode": "prefix"},
+    {"brand_name": "nature", "search_mode": "prefix"},
+    {"product_name": "almond", "search_mode": "text"},
+    {"product_category": "Beverages"},
+    {"product_category": "Beverages", "purpose": "Nutritional", "frequency": "Daily"},
+]
+
+
+async def check_search_plans(collection) -> bool:
+    ok = True
+    for search in SAMPLE_SEARCHES:
+        stages = await explain_stages(collection, build_search_query(**search))
+        uses_collscan = "COLLSCAN" in stages
+        ok = ok and not uses_collscan
+        print(f"{'FAIL' if uses_collscan else 'ok  '} {search} -> {' > '.join(stages)}")
+    return ok
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import asyncio
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+
+    async def main():
+        collection = AsyncIOMotorClient(os.environ["MONGODB_URI"])["consume_wise_db"]["products"]
+        await ensure_product_indexes(collection)
+        return await check_search_plans(collection)
+
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,164 @@
+# consume-wise-backend/facets.py
+#
+# Catalogue facets for dashboards: product counts, average health score and the number of
+# highly processed products per category, brand, purpose, frequency and processing level.
+# One summary document per (facet, value) is kept up to date with $inc as products are
+# written, so a dashboard reads a handful of small documents however large the catalogue
+# gets. rebuild() recomputes every summary from the products with one aggregation, for
+# the first deployment and to repair drift.
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+
+from metrics import registry
+
+# Facet name -> product field (dotted path)
+FACETS = {
+    "product_category": "product_category",
+    "brand_name": "brand_name",
+    "purpose": "purpose",
+    "frequency": "frequency",
+    "processing_level": "analysis.ProcessingLevel.Level",
+}
+TOTAL = "total"  # Facet of the single whole-catalogue summary
+FACET_SORTS = ("count", "value")
+
+# Fields a summary is computed from, for projections of the products being written
+SUMMARY_FIELDS = list(FACETS.values()) + ["health_score.score"]
+
+
+def field_value(document: Dict, path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+def summary_id(facet: str, value: Any) -> str:
+    return f"{facet}:{value}"
+
+
+def contribution(document: Dict) -> Dict[str, float]:
+    # What one product adds to each summary it belongs to
+    score = field_value(document, "health_score.score")
+    level = field_value(document, FACETS["processing_level"])
+    scored = isinstance(score, (int, float)) and not isinstance(score, bool)
+    return {
+        "count": 1,
+        "scored": 1 if scored else 0,
+        "score_sum": score if scored else 0,
+        "highly_processed": 1 if isinstance(level, str) and level.lower() == "high" else 0,
+    }
+
+
+def summary_keys(document: Dict) -> List[tuple]:
+    # (facet, value) of every summary a product counts towards; unset fields are left out
+    keys = [(TOTAL, TOTAL)]
+    for facet, path in FACETS.items():
+        value = field_value(document, path)
+        if value is not None and value != "":
+            keys.append((facet, value))
+    return keys
+
+
+def group_stage(path: Optional[str]) -> Dict:
+    return {"$group": {
+        "_id": f"${path}" if path else None,
+        "count": {"$sum": 1},
+        "scored": {"$sum": {"$cond": [{"$isNumber": "$health_score.score"}, 1, 0]}},
+        "score_sum": {"$sum": "$health_score.score"},
+        "highly_processed": {"$sum": {"$cond": [
+            {"$eq": [{"$toLower": {"$ifNull": [f"${FACETS['processing_level']}", ""]}}, "high"]}, 1, 0
+        ]}},
+    }}
+
+
+def public_summary(summary: Dict) -> Dict:
+    view = {
+        "count": summary["count"],
+        "avg_health_score": round(summary["score_sum"] / summary["scored"], 1) if summary.get("scored") else None,
+        "highly_processed": summary["highly_processed"],
+    }
+    if summary["facet"] != TOTAL:
+        view = {"value": summary["value"], **view}
+    return view
+
+
+class FacetSummaries:
+    def __init__(self, summaries_collection, products_collection):
+        self.summaries = summaries_collection
+        self.products = products_collection
+        self.update_timer = registry.timer("db.facets.update")
+        self.read_timer = registry.timer("db.facets.read")
+        self.rebuild_timer = registry.timer("db.facets.rebuild")
+
+    async def ensure_indexes(self) -> None:
+        # Top values of a facet by count, or in value order
+        await self.summaries.create_index([("facet", ASCENDING), ("count", DESCENDING)])
+        await self.summaries.create_index([("facet", ASCENDING), ("value", ASCENDING)])
+
+    async def is_empty(self) -> bool:
+        return await self.summaries.find_one({}, {"_id": 1}) is None
+
+    async def record(self, added: Iterable[Dict] = (), removed: Iterable[Dict] = ()) -> None:
+        # Applies written products (and subtracts the versions they replaced) in one bulk write
+        deltas: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for documents, sign in ((added, 1), (removed, -1)):
+            for document in documents:
+                change = contribution(document)
+                for key in summary_keys(document):
+                    for field, amount in change.items():
+                        deltas[key][field] += sign * amount
+        operations = []
+        for (facet, value), delta in deltas.items():
+            increments = {field: int(amount) if float(amount).is_integer() else amount for field, amount in delta.items()}
+            if not any(increments.values()):
+                continue
+            operations.append(UpdateOne(
+                {"_id": summary_id(facet, value)},
+                {"$inc": increments, "$setOnInsert": {"facet": facet, "value": value}},
+                upsert=True,
+            ))
+        if operations:
+            with self.update_timer.time():
+                await self.summaries.bulk_write(operations, ordered=False)
+
+    async def get(self, facets: List[str], limit: int = 20, sort: str = "count") -> Dict:
+        order = [("count", DESCENDING), ("value", ASCENDING)] if sort == "count" else [("value", ASCENDING)]
+        with self.read_timer.time():
+            total = await self.summaries.find_one({"_id": summary_id(TOTAL, TOTAL)})
+            result = {}
+            for facet in facets:
+                cursor = self.summaries.find({"facet": facet, "count": {"$gt": 0}}).sort(order).limit(limit)
+                result[facet] = [public_summary(summary) async for summary in cursor]
+        return {
+            "total": public_summary(total) if total else {"count": 0, "avg_health_score": None, "highly_processed": 0},
+            "facets": result,
+        }
+
+    async def rebuild(self) -> int:
+        # Recomputes every summary with one $facet aggregation over the products, then
+        # drops summaries of values that no longer occur. Returns the number of summaries.
+        pipeline = [
+            {"$project": {field: 1 for field in SUMMARY_FIELDS}},
+            {"$facet": {
+                TOTAL: [group_stage(None)],
+                **{facet: [{"$match": {path: {"$nin": [None, ""]}}}, group_stage(path)] for facet, path in FACETS.items()},
+            }},
+        ]
+        with self.rebuild_timer.time():
+            grouped = await self.products.aggregate(pipeline, allowDiskUse=True).to_list(None)
+            operations, ids = [], []
+            for facet, groups in grouped[0].items():
+                for group in groups:
+                    value = TOTAL if facet == TOTAL else group["_id"]
+                    summary = {key: group[key] for key in ("count", "scored", "score_sum", "highly_processed")}
+                    ids.append(summary_id(facet, value))
+                    operations.append(ReplaceOne({"_id": ids[-1]}, {"facet": facet, "value": value, **summary}, upsert=True))
+            if operations:
+                await self.summaries.bulk_write(operations, ordered=False)
+            await self.summaries.delete_many({"_id": {"$nin": ids}})
+        return len(ids)
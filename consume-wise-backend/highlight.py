@@ -0,0 +1,71 @@
+# consume-wise-backend/highlight.py
+#
+# Finds ingredient terms inside OCR lines for highlight_image. Each line is tokenized once
+# and scanned by two Aho-Corasick automata: the static ingredient index and the harmful
+# ingredients the LLM reported for this label. Every match becomes a sub-line box
+# interpolated along the line's quad, and boxes are grouped by class so each color is
+# drawn with a single polylines call.
+
+from typing import Dict, List
+
+import numpy as np
+
+from ingredients import IngredientIndex, TermAutomaton, leftmost_longest, token_spans, tokenize
+
+CLASS_PRIORITY = {"harmful": 3, "beneficial": 2, "neutral": 1}
+
+
+def find_spans(detected_items: List[Dict], harmful_terms: List[str], index: IngredientIndex) -> List[tuple]:
+    # (item position, start fraction, end fraction, class) for every term in the OCR lines;
+    # lines without any term get one whole-line "neutral" span
+    harmful = TermAutomaton((tokenize(term), "harmful") for term in harmful_terms)
+    spans = []
+    for position, item in enumerate(detected_items):
+        text = item["text"]
+        tokens, offsets = token_spans(text)
+        # The LLM names ingredients as printed, so its terms are matched before typo correction
+        found = harmful.search(tokens)
+        found += [
+            (start, end, index.entries[value]["class"])
+            for start, end, value in index.automaton.search([index.correct(token) for token in tokens])
+        ]
+        matches = leftmost_longest(found, CLASS_PRIORITY.get)
+        if not matches:
+            spans.append((position, 0.0, 1.0, "neutral"))
+            continue
+        for start, end, name in matches:
+            spans.append((position, offsets[start][0] / len(text), offsets[end - 1][1] / len(text), name))
+    return spans
+
+
+def sub_quads(quads: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    # Slices of (N, 4, 2) quads ordered top-left, top-right, bottom-right, bottom-left,
+    # between fractions `start` and `end` of their width (characters are assumed evenly spaced)
+    start, end = start[:, None], end[:, None]
+    top = quads[:, 1] - quads[:, 0]
+    bottom = quads[:, 2] - quads[:, 3]
+    corners = [quads[:, 0] + top * start, quads[:, 0] + top * end, quads[:, 3] + bottom * end, quads[:, 3] + bottom * start]
+    return np.rint(np.stack(corners, axis=1)).astype(np.int32)
+
+
+def highlight_boxes(
+    detected_items: List[Dict], harmful_terms: List[str], index: IngredientIndex
+) -> Dict[str, List[np.ndarray]]:
+    # Class -> polygons ready for cv2.polylines
+    boxes: Dict[str, List[np.ndarray]] = {name: [] for name in CLASS_PRIORITY}
+    spans = find_spans(detected_items, harmful_terms, index)
+    quad_spans = []
+    for span in spans:
+        coords = np.asarray(detected_items[span[0]]["coords"], dtype=np.float64).reshape(-1, 2)
+        if coords.shape[0] == 4:
+            quad_spans.append((coords, span))
+        else:
+            # Arbitrary polygons cannot be sliced; the whole polygon takes the span's class
+            boxes[span[3]].append(np.rint(coords).astype(np.int32).reshape(-1, 1, 2))
+    if quad_spans:
+        quads = np.stack([coords for coords, _ in quad_spans])
+        start = np.array([span[1] for _, span in quad_spans])
+        end = np.array([span[2] for _, span in quad_spans])
+        for polygon, (_, span) in zip(sub_quads(quads, start, end), quad_spans):
+            boxes[span[3]].append(polygon.reshape(-1, 1, 2))
+    return boxes
@@ -0,0 +1,267 @@
+# consume-wise-backend/ingest.py
+
+import io
+import os
+import csv
+import json
+import uuid
+import shutil
+import asyncio
+import logging
+import zipfile
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from facets import SUMMARY_FIELDS
+from logs import trace_id_var
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FIELDS = [
+    "product_name", "product_qty", "brand_name", "weightage", "weight_unit",
+    "product_category", "ingredients", "ingredients_image", "purpose", "frequency", "barcode",
+]
+
+# Item / job states
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+
+
+def parse_manifest(data: bytes, manifest_format: str) -> List[Dict]:
+    # CSV with a header row, or one JSON object per line
+    text = data.decode("utf-8-sig")
+    if manifest_format == "jsonl":
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    return [{field: row.get(field) for field in MANIFEST_FIELDS if row.get(field) not in (None, "")} for row in rows]
+
+
+def dedupe_key(row: Dict) -> str:
+    # Rows that will certainly produce the same analysis share a key
+    if row.get("ingredients_image"):
+        return "image:" + row["ingredients_image"]
+    ingredients = row.get("ingredients") or ""
+    if isinstance(ingredients, list):
+        ingredients = ", ".join(ingredients)
+    return "text:" + " ".join(ingredients.lower().split())
+
+
+class IngestService:
+    # Bulk catalogue imports. Jobs and their items live in MongoDB, so a job can be
+    # resumed after a crash: every item's outcome is saved on the item as soon as it is
+    # known, so resuming only runs the pipeline for items that never finished, and products
+    # are written with upserts so a chunk that was written but not yet marked done does not
+    # create duplicates. A job that stops on an error is marked failed; retry_failed resumes it.
+    def __init__(
+        self,
+        jobs_collection,
+        items_collection,
+        products_collection,
+        build_document: Callable[[Dict, Optional[bytes]], Awaitable[Dict]],
+        work_dir: str,
+        concurrency: int = 4,
+        chunk_size: int = 100,
+        max_attempts: int = 5,
+        facets=None,  # FacetSummaries kept in step with the upserted products
+    ):
+        self.jobs = jobs_collection
+        self.items = items_collection
+        self.products = products_collection
+        self.build_document = build_document
+        self.work_dir = work_dir
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.facets = facets
+        self._running: Dict[str, asyncio.Task] = {}
+        self.processed = registry.counter("ingest.items.processed")
+        self.failed = registry.counter("ingest.items.failed")
+        self.deduplicated = registry.counter("ingest.items.deduplicated")
+        self.chunk_timer = registry.timer("ingest.chunk")
+        os.makedirs(work_dir, exist_ok=True)
+
+    async def ensure_indexes(self) -> None:
+        await self.items.create_index([("job_id", 1), ("status", 1), ("index", 1)])
+
+    def archive_path(self, job_id: str) -> str:
+        return os.path.join(self.work_dir, f"{job_id}.zip")
+
+    async def create_job(self, rows: List[Dict], archive_file=None) -> str:
+        job_id = uuid.uuid4().hex
+        if archive_file is not None:
+            # Persist the archive so the job can be resumed by another process
+            def save():
+                with open(self.archive_path(job_id), "wb") as f:
+                    shutil.copyfileobj(archive_file, f)
+            await asyncio.to_thread(save)
+
+        now = datetime.utcnow()
+        await self.jobs.insert_one({
+            "_id": job_id,
+            "status": QUEUED,
+            "total": len(rows),
+            "has_archive": archive_file is not None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        for start in range(0, len(rows), self.chunk_size):
+            await self.items.insert_many([
+                {"_id": f"{job_id}:{index}", "job_id": job_id, "index": index, "row": row, "status": PENDING}
+                for index, row in enumerate(rows[start:start + self.chunk_size], start=start)
+            ], ordered=False)
+        self.start(job_id)
+        return job_id
+
+    def start(self, job_id: str) -> None:
+        if job_id not in self._running:
+            task = asyncio.create_task(self._run(job_id))
+            self._running[job_id] = task
+            task.add_done_callback(lambda _: self._running.pop(job_id, None))
+
+    async def resume_incomplete(self) -> None:
+        async for job in self.jobs.find({"status": {"$in": [QUEUED, RUNNING]}}, {"_id": 1}):
+            self.start(job["_id"])
+
+    async def retry_failed(self, job_id: str) -> None:
+        await self.items.update_many({"job_id": job_id, "status": FAILED}, {"$set": {"status": PENDING}, "$unset": {"error": ""}})
+        await self.jobs.update_one(
+            {"_id": job_id}, {"$set": {"status": QUEUED, "updated_at": datetime.utcnow()}, "$unset": {"error": ""}}
+        )
+        self.start(job_id)
+
+    async def status(self, job_id: str) -> Optional[Dict]:
+        job = await self.jobs.find_one({"_id": job_id})
+        if job is None:
+            return None
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        async for group in self.items.aggregate([
+            {"$match": {"job_id": job_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ]):
+            counts[group["_id"]] = group["count"]
+        job["job_id"] = job.pop("_id")
+        job["counts"] = counts
+        return job
+
+    async def list_items(self, job_id: str, status: Optional[str], page: int, limit: int) -> List[Dict]:
+        query = {"job_id": job_id}
+        if status:
+            query["status"] = status
+        cursor = self.items.find(query, {"row": 0, "result": 0}).sort("index", 1).skip(limit * (page - 1)).limit(limit)
+        return [item async for item in cursor]
+
+    async def _run(self, job_id: str) -> None:
+        # Everything logged while the job runs carries the job id as its trace id
+        trace_id_var.set(job_id)
+        await self.jobs.update_one({"_id": job_id}, {"$set": {"status": RUNNING, "updated_at": datetime.utcnow()}})
+        job = await self.jobs.find_one({"_id": job_id})
+        archive = None
+        try:
+            if job.get("has_archive"):
+                archive = zipfile.ZipFile(self.archive_path(job_id))
+            while True:
+                chunk = [item async for item in self.items.find(
+                    {"job_id": job_id, "status": PENDING}
+                ).sort("index", 1).limit(self.chunk_size)]
+                if not chunk:
+                    break
+                with self.chunk_timer.time():
+                    await self._process_chunk(chunk, archive)
+            await self.jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": COMPLETED, "updated_at": datetime.utcnow(), "completed_at": datetime.utcnow()}},
+            )
+        except Exception as e:
+            # Finished items keep their outcome, so retry_failed resumes without redoing them
+            logger.exception("Ingest job %s failed: %s", job_id, e)
+            await self.jobs.update_one({"_id": job_id}, {"$set": {"status": FAILED, "error": str(e), "updated_at": datetime.utcnow()}})
+        finally:
+            if archive is not None:
+                archive.close()
+
+    async def _process_chunk(self, chunk: List[Dict], archive: Optional[zipfile.ZipFile]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, Dict] = {}
+
+        async def process(item: Dict) -> None:
+            if "result" in item:
+                # Finished before an interruption; only its writes are left
+                results[item["_id"]] = item["result"]
+                return
+            async with semaphore:
+                results[item["_id"]] = await self._process_item(item["row"], archive)
+            await self.items.update_one({"_id": item["_id"]}, {"$set": {"result": results[item["_id"]]}})
+
+        # Only the first row of each identical ingredient list (or image) runs the pipeline
+        # up front; the duplicates run after it and are served by the analysis caches.
+        first_by_key: Dict[str, Dict] = {}
+        duplicates = []
+        for item in chunk:
+            key = dedupe_key(item["row"])
+            if key in first_by_key:
+                duplicates.append(item)
+            else:
+                first_by_key[key] = item
+        self.deduplicated.inc(len(duplicates))
+        await asyncio.gather(*[process(item) for item in first_by_key.values()])
+        await asyncio.gather(*[process(item) for item in duplicates])
+
+        # One bulk upsert for the products, then one bulk status update for the items
+        product_ops = []
+        written: Dict[tuple, Dict] = {}
+        for item in chunk:
+            document = results[item["_id"]].get("document")
+            if document is not None:
+                key = {field: document[field] for field in ("product_name", "brand_name", "product_qty")}
+                product_ops.append(UpdateOne(key, {"$set": document}, upsert=True))
+                written[tuple(key.values())] = document  # Later rows for the same product win
+        if product_ops:
+            replaced = []
+            if self.facets is not None:
+                # Versions the upserts overwrite are taken out of the facet summaries
+                keys = [dict(zip(("product_name", "brand_name", "product_qty"), key)) for key in written]
+                replaced = await self.products.find({"$or": keys}, {field: 1 for field in SUMMARY_FIELDS}).to_list(None)
+            with registry.timer("db.products.bulk_upsert").time():
+                await self.products.bulk_write(product_ops, ordered=False)
+            if self.facets is not None:
+                await self.facets.record(added=written.values(), removed=replaced)
+
+        item_ops = []
+        for item in chunk:
+            result = results[item["_id"]]
+            if "error" in result:
+                self.failed.inc()
+                item_ops.append(UpdateOne(
+                    {"_id": item["_id"]}, {"$set": {"status": FAILED, "error": result["error"]}, "$unset": {"result": ""}}
+                ))
+            else:
+                self.processed.inc()
+                item_ops.append(UpdateOne({"_id": item["_id"]}, {"$set": {"status": DONE}, "$unset": {"result": ""}}))
+        await self.items.bulk_write(item_ops, ordered=False)
+        await self.jobs.update_one({"_id": chunk[0]["job_id"]}, {"$set": {"updated_at": datetime.utcnow()}})
+
+    async def _process_item(self, row: Dict, archive: Optional[zipfile.ZipFile]) -> Dict:
+        attempt = 0
+        while True:
+            try:
+                image_bytes = None
+                if row.get("ingredients_image"):
+                    if archive is None:
+                        raise ValueError("Manifest references an image but no archive was uploaded.")
+                    image_bytes = await asyncio.to_thread(archive.read, row["ingredients_image"])
+                return {"document": await self.build_document(row, image_bytes)}
+            except Exception as e:
+                attempt += 1
+                # Back off while the OCR pool or the LLM is saturated
+                if getattr(e, "status_code", None) == 503 and attempt < self.max_attempts:
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                    continue
+                return {"error": str(getattr(e, "detail", e))}
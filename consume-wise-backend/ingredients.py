@@ -0,0 +1,388 @@
+# consume-wise-backend/ingredients.py
+#
+# Local ingredient knowledge base. Common ingredients and additives (sugars, fats, flours,
+# E-numbers, ...) are classified from ingredients.json without an LLM call: each entry is
+# harmful, neutral or beneficial, with allergen and diet flags. Aliases are matched over
+# normalized tokens with an Aho-Corasick automaton (leftmost longest match wins), and OCR
+# misspellings are corrected against the alias vocabulary at edit distance 1. Absence claims
+# ("sugar free", "no added sugar") name an ingredient without it being in the product.
+
+import re
+import json
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+CLASSES = ("harmful", "neutral", "beneficial")
+DIETS = ["Vegan", "Vegetarian", "Keto", "Gluten-Free", "Dairy-Free"]
+MACRONUTRIENTS = ("Carbohydrates", "Proteins", "Fats", "Fiber")
+MICRONUTRIENTS = ("Vitamins", "Minerals")
+
+# Sections local_analysis() produces; everything else needs the LLM
+LOCAL_SECTIONS = [
+    "NutritionalAnalysis", "ProcessingLevel", "HarmfulIngredients", "DietCompliance", "DiabetesAllergenFriendly",
+]
+
+# Shortest vocabulary word the fuzzy matcher corrects to (shorter words have too many
+# neighbours); a token may be one letter shorter than that, e.g. "sugr" -> "sugar"
+FUZZY_MIN_LENGTH = 5
+
+# Label words that are not ingredients: a segment made only of these is not "unknown"
+STOPWORDS = {
+    "ingredients", "ingredient", "contains", "contain", "may", "traces", "trace", "of", "and", "or", "with",
+    "added", "permitted", "class", "ii", "in", "as", "from", "the", "a", "for", "made", "allergen", "allergens",
+    "information", "advice", "see", "bold", "processed", "facility", "also", "handles", "other", "products",
+    "emulsifier", "emulsifiers", "stabilizer", "stabilizers", "stabiliser", "stabilisers", "thickener",
+    "thickeners", "thickening", "agent", "agents", "acidity", "regulator", "regulators", "acidulant",
+    "antioxidant", "antioxidants", "preservative", "preservatives", "colour", "colours", "color", "colors",
+    "enhancer", "enhancers", "sweetener", "sweeteners", "humectant", "humectants", "firming", "glazing",
+    "improver", "improvers", "treatment", "sequestrant", "sequestrants", "ins", "e", "approx", "min", "max", "g", "mg", "ml", "kg",
+    "natural", "organic", "pure", "fresh", "dried", "extract", "powder", "preparation",
+}
+
+# Claims that an ingredient is absent: "no added sugar", "without palm oil", "free from
+# gluten", "sugar free"; the ingredient they name is not in the product
+NEGATIONS = {"no", "non", "without", "zero", "nil"}
+NEGATION_FILLERS = {"added", "artificial"}  # Words allowed between a negation and the ingredient
+
+# Functional classes that are followed by bare INS numbers, e.g. "Emulsifiers (322, 471)"
+_INS_CONTEXT = re.compile(
+    r"\b(?:emulsifiers?|stabili[sz]ers?|thickeners?|acidity regulators?|antioxidants?|preservatives?|"
+    r"colou?rs?|flavou?r enhancers?|sweeteners?|raising agents?|leavening agents?|anti ?caking agents?|"
+    r"humectants?|firming agents?|glazing agents?|gelling agents?|flour treatment agents?)"
+    r"\s*[:\-]?\s*(\([^)]*\)|\[[^\]]*\]|\d{3,4}[a-z]?)"
+)
+_PERCENT = re.compile(r"\d+(?:[.,]\d+)?\s*%")
+# Sub-codes such as 500(ii) classify like their parent additive
+_ROMAN_SUFFIX = re.compile(r"(\d{3,4}[a-z]?)\s*\(\s*(?:i{1,3}|iv|v|vi)\s*\)")
+_E_NUMBER = re.compile(r"\b(?:e|ins)\s*[-.]?\s*(\d{3,4}[a-z]?)\b")
+_BARE_NUMBER = re.compile(r"\b(\d{3,4}[a-z]?)\b")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_RAW_TOKEN = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+_INS_CODE = re.compile(r"\d{3,4}[a-z]?")
+# An amount with a unit, as in the nutrition table rows "Total Sugars 12 g" or "Energy 450 kcal"
+_QUANTITY = re.compile(r"\b\d+(?:[.,]\d+)?\s*(?:g|mg|mcg|kcal|kj)\b")
+_SEGMENT = re.compile(r"[,;()\[\]{}\n:]|\.(?!\d)|\s-\s")
+
+
+def _mark_ins_numbers(match: re.Match) -> str:
+    return match.group(0)[:match.start(1) - match.start(0)] + _BARE_NUMBER.sub(r"e\1", match.group(1))
+
+
+def normalize(text: str) -> str:
+    # Lowercase, drop percentages and spell every E/INS number as "e322"
+    text = _PERCENT.sub(" ", text.lower().replace("&", " and "))
+    text = _ROMAN_SUFFIX.sub(r"\1", text)
+    text = _INS_CONTEXT.sub(_mark_ins_numbers, text)
+    return _E_NUMBER.sub(r"e\1", text)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(normalize(text))
+
+
+def split_segments(text: str) -> List[str]:
+    # One segment per listed ingredient; sub-ingredients in parentheses are segments too
+    return [segment for segment in _SEGMENT.split(normalize(text)) if segment.strip()]
+
+
+def token_spans(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    # Tokens of an OCR line with their character offsets; "E 102" and "INS 102" become "e102"
+    tokens, spans = [], []
+    for match in _RAW_TOKEN.finditer(text):
+        token = match.group(0).lower()
+        if tokens and tokens[-1] in ("e", "ins") and _INS_CODE.fullmatch(token):
+            tokens[-1] = "e" + token
+            spans[-1] = (spans[-1][0], match.end())
+        else:
+            tokens.append(token)
+            spans.append(match.span())
+    return tokens, spans
+
+
+class TermAutomaton:
+    # Aho-Corasick automaton over token sequences: one pass over a line finds every term,
+    # whatever the number of terms
+    def __init__(self, terms: Iterable[Tuple[Sequence[str], Any]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Any]]] = [[]]  # (term length, value) ending at a node
+        for tokens, value in terms:
+            node = 0
+            for token in tokens:
+                child = self.goto[node].get(token)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][token] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = child
+            if tokens and not self.output[node]:  # The first value given for a term wins
+                self.output[node].append((len(tokens), value))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def search(self, tokens: Sequence[str]) -> List[Tuple[int, int, Any]]:
+        # Every (start, end, value) occurrence, overlapping ones included
+        found = []
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(token, 0)
+            for length, value in self.output[node]:
+                found.append((position + 1 - length, position + 1, value))
+        return found
+
+
+def negated(tokens: Sequence[str], start: int, end: int) -> bool:
+    # Whether tokens[start:end] is named by an absence claim
+    if end < len(tokens) and tokens[end] == "free":
+        return True
+    position = start - 1
+    while position >= 0 and tokens[position] in NEGATION_FILLERS:
+        position -= 1
+    return position >= 0 and (
+        tokens[position] in NEGATIONS or (tokens[position] == "from" and position > 0 and tokens[position - 1] == "free")
+    )
+
+
+def leftmost_longest(matches: List[Tuple[int, int, Any]], priority=None) -> List[Tuple[int, int, Any]]:
+    # Non-overlapping matches, preferring earlier, then longer, then higher-priority ones
+    ranked = sorted(matches, key=lambda m: (m[0], m[0] - m[1], -(priority(m[2]) if priority else 0)))
+    selected, end = [], 0
+    for match in ranked:
+        if match[0] >= end:
+            selected.append(match)
+            end = match[1]
+    return selected
+
+
+def _deletes(word: str) -> Set[str]:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    # One substitution, insertion, deletion or adjacent transposition
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diffs) <= 1 or (
+            len(diffs) == 2 and diffs[1] == diffs[0] + 1 and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+        )
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class IngredientIndex:
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        # Automaton over every alias; the value of a term is its entry index, and the
+        # first entry listing an alias owns it
+        terms = []
+        for position, entry in enumerate(entries):
+            if entry.get("class") not in CLASSES:
+                raise ValueError(f"Ingredient {entry.get('name')!r} has an invalid class.")
+            for alias in [entry["name"], *entry.get("aliases", [])]:
+                terms.append((tokenize(alias), position))
+        self.automaton = TermAutomaton(terms)
+        self.vocabulary: Set[str] = {token for tokens, _ in terms for token in tokens}
+        # Symmetric-delete index for fuzzy correction: deletion variant -> vocabulary words
+        self.deletes: Dict[str, Set[str]] = {}
+        for word in self.vocabulary:
+            if len(word) >= FUZZY_MIN_LENGTH and word.isalpha():
+                for variant in _deletes(word) | {word}:
+                    self.deletes.setdefault(variant, set()).add(word)
+        self.correct = lru_cache(maxsize=65536)(self._correct)
+
+    @classmethod
+    def load(cls, path: str) -> "IngredientIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _correct(self, token: str) -> str:
+        # Closest vocabulary word within one edit, or the token itself
+        if token in self.vocabulary or len(token) < FUZZY_MIN_LENGTH - 1 or not token.isalpha():
+            return token
+        candidates = set(self.deletes.get(token, ()))
+        for variant in _deletes(token):
+            candidates.update(self.deletes.get(variant, ()))
+        matches = sorted(word for word in candidates if _within_one_edit(token, word))
+        return matches[0] if matches else token
+
+    def _find(self, tokens: List[str]) -> List[Tuple[int, int, int]]:
+        # Leftmost longest alias matches: (start, end, entry index), non-overlapping
+        return leftmost_longest(self.automaton.search([self.correct(token) for token in tokens]))
+
+    def _match_tokens(self, tokens: List[str]) -> List[Tuple[int, int, int]]:
+        # The matches without the ones an absence claim names ("sugar free")
+        return [match for match in self._find(tokens) if not negated(tokens, match[0], match[1])]
+
+    def match(self, text: str) -> List[Dict]:
+        # Every known ingredient in `text`, with the words that matched it
+        tokens = tokenize(text)
+        return [
+            {"entry": self.entries[position], "text": " ".join(tokens[start:end])}
+            for start, end, position in self._match_tokens(tokens)
+        ]
+
+    def classify(self, ingredients: List[str]) -> Tuple[List[Dict], List[str]]:
+        # Matches for an ingredient list, plus the words the index knows nothing about: a
+        # whole segment, or the unmatched runs of a partly matched one ("milk chocolate"
+        # gives Milk and "chocolate"). The list is re-joined so "Emulsifiers (322, 471)"
+        # keeps its INS context; nutrition table rows are skipped.
+        matches, unknown = [], []
+        for segment in split_segments(", ".join(ingredients)):
+            if _QUANTITY.search(segment):
+                continue
+            tokens = _TOKEN.findall(segment)
+            found = self._find(tokens)
+            if not found:
+                if any(_unknown_word(token) for token in tokens):
+                    unknown.append(segment.strip())
+                continue
+            matches.extend(
+                {"entry": self.entries[position], "text": " ".join(tokens[start:end])}
+                for start, end, position in found if not negated(tokens, start, end)
+            )
+            boundaries = [(0, 0)] + [(start, end) for start, end, _ in found] + [(len(tokens), len(tokens))]
+            for (_, gap_start), (gap_end, _) in zip(boundaries, boundaries[1:]):
+                gap = tokens[gap_start:gap_end]
+                if any(_unknown_word(token) for token in gap):
+                    unknown.append(" ".join(gap))
+        return matches, unknown
+
+
+def _unknown_word(token: str) -> bool:
+    # A word that could name an ingredient the index doesn't know
+    return (
+        not token.isdigit() and len(token) > 1 and token not in STOPWORDS
+        and token not in NEGATIONS and token not in NEGATION_FILLERS and token != "free"
+    )
+
+
+def _unique_entries(matches: List[Dict]) -> List[Tuple[Dict, str]]:
+    seen, entries = set(), []
+    for match in matches:
+        if match["entry"]["name"] not in seen:
+            seen.add(match["entry"]["name"])
+            entries.append((match["entry"], match["text"]))
+    return entries
+
+
+def local_analysis(matches: List[Dict]) -> Dict:
+    # Deterministic analysis sections (same shape as the LLM's) from index matches
+    entries = _unique_entries(matches)
+    macronutrients = {name: {"Good": [], "Bad": []} for name in MACRONUTRIENTS}
+    macronutrients["Fiber"] = {"Good": []}
+    micronutrients = {name: {"Good": [], "Deficient": []} for name in MICRONUTRIENTS}
+    risks, benefits, harmful, processed, allergens = [], [], [], [], []
+    non_compliant: Dict[str, List[str]] = {}
+    glycemic = []
+    for entry, text in entries:
+        item = f"{entry['name']} - {entry['reason']}"
+        nutrient = entry.get("nutrient")
+        group = micronutrients.get(nutrient) or macronutrients.get(nutrient)
+        if entry["class"] == "harmful":
+            harmful.append({"Ingredient": text, "Reason": entry["reason"]})
+            risks.append(item)
+            if group is not None and "Bad" in group:
+                group["Bad"].append(item)
+        elif entry["class"] == "beneficial":
+            benefits.append(item)
+            if group is not None:
+                group["Good"].append(item)
+        if entry.get("processed"):
+            processed.append(entry["name"])
+        if entry.get("glycemic"):
+            glycemic.append(entry["name"])
+        for allergen in entry.get("allergens", []):
+            if allergen not in allergens:
+                allergens.append(allergen)
+        for diet in entry.get("diets", []):
+            non_compliant.setdefault(diet, []).append(entry["name"])
+
+    level = "High" if len(processed) >= 3 else "Medium" if processed else "Low"
+    unsuitable = [f"raises blood sugar ({', '.join(glycemic)})"] if glycemic else []
+    if allergens:
+        unsuitable.append(f"contains {', '.join(allergens)}")
+    return {
+        "NutritionalAnalysis": {
+            "serving_size": None,
+            "Macronutrients": macronutrients,
+            "Micronutrients": micronutrients,
+            "HealthRisks": risks,
+            "HealthBenefits": benefits,
+        },
+        "ProcessingLevel": {
+            "Description": f"{len(processed)} processed ingredients or additives.",
+            "Level": level,
+            "Good": [] if processed else ["No additives or refined ingredients"],
+            "Bad": processed,
+        },
+        "HarmfulIngredients": harmful,
+        "DietCompliance": {
+            "CompliantDiets": [diet for diet in DIETS if diet not in non_compliant],
+            "NonCompliantDiets": [diet for diet in DIETS if diet in non_compliant],
+            "Reasons": " ".join(f"Not {diet}: {', '.join(names)}." for diet, names in non_compliant.items()),
+        },
+        "DiabetesAllergenFriendly": {
+            "IsSuitable": not unsuitable,
+            "Reasons": "; ".join(unsuitable).capitalize() if unsuitable else "No added sugars or common allergens.",
+            "Allergens": allergens,
+        },
+    }
+
+
+def _merge(local, remote):
+    if isinstance(local, dict) and isinstance(remote, dict):
+        return {key: _merge(local.get(key), remote.get(key)) for key in [*local, *[k for k in remote if k not in local]]}
+    if isinstance(local, list) and isinstance(remote, list):
+        return local + [item for item in remote if item not in local]
+    if local is None or local == "":
+        return remote
+    return local
+
+
+def merge_analysis(local: Dict, remote: Dict) -> Dict:
+    # Local sections for the known ingredients + LLM sections for the unknown ones
+    merged = _merge(local, remote)
+    levels = ["Low", "Medium", "High"]
+    local_level = local.get("ProcessingLevel", {}).get("Level")
+    remote_level = remote.get("ProcessingLevel", {}).get("Level")
+    if local_level in levels and remote_level in levels:
+        merged["ProcessingLevel"]["Level"] = levels[max(levels.index(local_level), levels.index(remote_level))]
+    if "HarmfulIngredients" in merged:
+        seen, harmful = set(), []
+        for item in merged["HarmfulIngredients"]:
+            name = " ".join(str(item.get("Ingredient", "")).lower().split())
+            if name not in seen:
+                seen.add(name)
+                harmful.append(item)
+        merged["HarmfulIngredients"] = harmful
+    if "DietCompliance" in local and "DietCompliance" in remote:
+        # Only the LLM saw the unknown ingredients, so only it can vouch for a diet
+        non_compliant = merged["DietCompliance"]["NonCompliantDiets"]
+        merged["DietCompliance"]["CompliantDiets"] = [
+            diet for diet in remote["DietCompliance"].get("CompliantDiets", []) if diet not in non_compliant
+        ]
+    if "DiabetesAllergenFriendly" in local and "DiabetesAllergenFriendly" in remote:
+        merged["DiabetesAllergenFriendly"]["IsSuitable"] = bool(
+            local["DiabetesAllergenFriendly"].get("IsSuitable") and remote["DiabetesAllergenFriendly"].get("IsSuitable")
+        )
+    return merged
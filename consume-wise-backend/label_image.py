@@ -0,0 +1,86 @@
+# consume-wise-backend/label_image.py
+
+import hashlib
+import mmap
+import threading
+from typing import Optional
+
+import numpy as np
+
+from metrics import registry
+from preprocess import decode_image
+
+
+class ImageTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Uploaded image is too large. Max size is {max_bytes // (1024 * 1024)}MB.")
+        self.max_bytes = max_bytes
+
+
+class LabelImage:
+    # One uploaded image for the lifetime of a request. The raw bytes are a read-only
+    # view over the upload's spool (memory buffer or mmap of the temp file, never a
+    # second copy) and the decoded frame is produced at most once and shared by OCR
+    # and highlighting.
+    def __init__(self, buffer, owner=None):
+        self._buffer = buffer if isinstance(buffer, memoryview) else memoryview(buffer)
+        self._owner = owner  # Keeps the spool / mmap alive while the view is in use
+        self._size = self._buffer.nbytes
+        self._digest: Optional[str] = None
+        self._decoded: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    async def from_upload(cls, upload, max_bytes: Optional[int] = None) -> "LabelImage":
+        spool = upload.file
+        spool.seek(0, 2)
+        size = spool.tell()
+        spool.seek(0)
+        if max_bytes is not None and size > max_bytes:
+            raise ImageTooLarge(max_bytes)
+        if size == 0:
+            return cls(b"")
+
+        # Starlette uploads are SpooledTemporaryFiles: small ones live in a BytesIO,
+        # large ones have rolled over to a temp file on disk.
+        inner = getattr(spool, "_file", None)
+        if getattr(spool, "_rolled", False) and inner is not None:
+            mapped = mmap.mmap(inner.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(mapped, owner=mapped)
+        if hasattr(inner, "getbuffer"):
+            return cls(inner.getbuffer(), owner=inner)
+        return cls(await upload.read())
+
+    @property
+    def raw(self) -> memoryview:
+        return self._buffer
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.sha256(self._buffer).hexdigest()
+        return self._digest
+
+    def decoded(self) -> np.ndarray:
+        # Safe to call from worker threads; only the first caller pays for the decode
+        with self._lock:
+            if self._decoded is None:
+                with registry.timer("image.decode").time():
+                    self._decoded = decode_image(self._buffer)
+            return self._decoded
+
+    def release_buffer(self) -> None:
+        # Drop the view over the upload (and close the mmap) but keep the decoded frame
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if isinstance(self._owner, mmap.mmap):
+            self._owner.close()
+        self._owner = None
+
+    def close(self) -> None:
+        self._decoded = None
+        self.release_buffer()
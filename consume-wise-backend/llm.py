@@ -0,0 +1,229 @@
+# consume-wise-backend/llm.py
+
+import json
+import random
+import asyncio
+from typing import AsyncIterator, Dict, Optional
+
+from metrics import registry
+
+# Canned analysis returned by the fake backend (shape matches the analysis prompt)
+FAKE_ANALYSIS = {
+    "NutritionalAnalysis": {
+        "serving_size": "30 g",
+        "Macronutrients": {
+            "Carbohydrates": {"Good": [], "Bad": ["Sugar - added sugar"]},
+            "Proteins": {"Good": [], "Bad": []},
+            "Fats": {"Good": [], "Bad": ["Palm Oil - high in saturated fat"]},
+            "Fiber": {"Good": []},
+        },
+        "Micronutrients": {
+            "Vitamins": {"Good": [], "Deficient": []},
+            "Minerals": {"Good": [], "Deficient": []},
+        },
+        "HealthRisks": ["Excess sugar intake"],
+        "HealthBenefits": [],
+    },
+    "ProcessingLevel": {"Description": "Processed snack.", "Level": "Medium", "Good": [], "Bad": []},
+    "HarmfulIngredients": [{"Ingredient": "Palm Oil", "Reason": "High in saturated fat"}],
+    "DietCompliance": {"CompliantDiets": ["Vegetarian"], "NonCompliantDiets": ["Keto"], "Reasons": ""},
+    "DiabetesAllergenFriendly": {"IsSuitable": False, "Reasons": "Contains added sugar", "Allergens": []},
+    "SustainabilityAndEthics": {"Sustainability": "", "EthicalConcerns": ""},
+    "RecommendedAlternatives": [],
+    "RegulatoryCompliance": {"FSSAI": "true", "FDA": "true", "EFSA": "true", "OtherRegions": ""},
+    "MisleadingClaims": [],
+    "AlternativeHomeMadeProcedure": {"Ingredients": [], "Steps": []},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough count for backends that do not report usage (about 4 characters per token)
+    return -(-len(text) // 4)
+
+
+class LLMBackend:
+    # A backend turns one prompt into one completion; it holds no conversation state.
+    # `generation_config` overrides the backend defaults for one call, and token usage is
+    # reported by filling in `usage` ({"prompt_tokens": n, "output_tokens": n}).
+    async def generate(self, prompt: str, generation_config: Optional[Dict] = None, usage: Optional[Dict] = None) -> str:
+        raise NotImplementedError
+
+    async def stream(
+        self, prompt: str, generation_config: Optional[Dict] = None, usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        # Backends without native streaming deliver the whole completion as one chunk
+        yield await self.generate(prompt, generation_config, usage)
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, api_key: str, model_name: str, generation_config: Dict):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
+
+    @staticmethod
+    def _record_usage(response, usage: Optional[Dict]) -> None:
+        metadata = getattr(response, "usage_metadata", None)
+        if usage is not None and metadata is not None:
+            usage["prompt_tokens"] = metadata.prompt_token_count
+            usage["output_tokens"] = metadata.candidates_token_count
+
+    async def generate(self, prompt: str, generation_config: Optional[Dict] = None, usage: Optional[Dict] = None) -> str:
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        self._record_usage(response, usage)
+        return response.text
+
+    async def stream(
+        self, prompt: str, generation_config: Optional[Dict] = None, usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config, stream=True)
+        async for chunk in response:
+            # The final chunk carries the usage totals for the whole call
+            self._record_usage(chunk, usage)
+            yield chunk.text
+
+
+class FakeBackend(LLMBackend):
+    # Local stand-in for tests and benchmarks: fixed latency, canned response, no network
+    def __init__(
+        self,
+        response_text: Optional[str] = None,
+        latency_seconds: float = 0.0,
+        jitter_seconds: float = 0.0,
+        stream_chunks: int = 8,
+    ):
+        self.response_text = response_text
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.stream_chunks = stream_chunks
+
+    def _delay(self) -> float:
+        return self.latency_seconds + random.uniform(0, self.jitter_seconds)
+
+    def _respond(self, prompt: str, generation_config: Optional[Dict], usage: Optional[Dict]) -> str:
+        text = self.response_text
+        if text is None:
+            # Answer only the sections a response schema asks for, like the real model
+            schema = (generation_config or {}).get("response_schema") or {}
+            sections = schema.get("properties") or FAKE_ANALYSIS
+            text = json.dumps({name: FAKE_ANALYSIS[name] for name in sections if name in FAKE_ANALYSIS})
+        if usage is not None:
+            usage["prompt_tokens"] = estimate_tokens(prompt)
+            usage["output_tokens"] = estimate_tokens(text)
+        return text
+
+    async def generate(self, prompt: str, generation_config: Optional[Dict] = None, usage: Optional[Dict] = None) -> str:
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._respond(prompt, generation_config, usage)
+
+    async def stream(
+        self, prompt: str, generation_config: Optional[Dict] = None, usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        # Spread the same total latency evenly over the chunks
+        text = self._respond(prompt, generation_config, usage)
+        delay = self._delay() / self.stream_chunks
+        size = -(-len(text) // self.stream_chunks)
+        for start in range(0, len(text), size):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text[start:start + size]
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google.api_core errors carry the HTTP status in `code`
+    return getattr(error, "code", None) in (429, 500, 502, 503, 504)
+
+
+class LLMClient:
+    # Independent calls with a concurrency cap, per-call timeout and jittered exponential backoff
+    def __init__(
+        self,
+        backend: LLMBackend,
+        max_concurrency: int = 8,
+        timeout_seconds: float = 60,
+        max_retries: int = 2,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8,
+    ):
+        self.backend = backend
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.call_timer = registry.timer("llm.call")
+        self.retries = registry.counter("llm.retries")
+        self.timeouts = registry.counter("llm.timeouts")
+        self.failures = registry.counter("llm.failures")
+
+    def _record_tokens(self, label: str, usage: Dict) -> None:
+        registry.counter(f"llm.calls.{label}").inc()
+        registry.counter(f"llm.tokens.prompt.{label}").inc(usage.get("prompt_tokens") or 0)
+        registry.counter(f"llm.tokens.output.{label}").inc(usage.get("output_tokens") or 0)
+
+    async def generate(self, prompt: str, generation_config: Optional[Dict] = None, label: str = "default") -> str:
+        # `label` groups calls for the per-profile token and latency metrics
+        attempt = 0
+        while True:
+            try:
+                # The slot is held only for the call itself, not while backing off
+                async with self._semaphore:
+                    usage: Dict = {}
+                    with self.call_timer.time(), registry.timer(f"llm.call.{label}").time():
+                        text = await asyncio.wait_for(
+                            self.backend.generate(prompt, generation_config, usage), self.timeout_seconds
+                        )
+                    self._record_tokens(label, usage)
+                    return text
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts.inc()
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.failures.inc()
+                    raise
+                # Full jitter: sleep a random amount up to the exponential cap
+                delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+                attempt += 1
+                self.retries.inc()
+                await asyncio.sleep(delay)
+
+    async def stream(
+        self, prompt: str, generation_config: Optional[Dict] = None, label: str = "default"
+    ) -> AsyncIterator[str]:
+        # Same limits as generate(); the timeout bounds the whole stream. A failed call is
+        # only retried if nothing has been yielded yet, so callers never see duplicate text.
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._semaphore:
+                    usage: Dict = {}
+                    with self.call_timer.time(), registry.timer(f"llm.call.{label}").time():
+                        loop = asyncio.get_running_loop()
+                        deadline = loop.time() + self.timeout_seconds
+                        chunks = self.backend.stream(prompt, generation_config, usage).__aiter__()
+                        while True:
+                            remaining = deadline - loop.time()
+                            if remaining <= 0:
+                                raise asyncio.TimeoutError()
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                            except StopAsyncIteration:
+                                self._record_tokens(label, usage)
+                                return
+                            started = True
+                            yield chunk
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts.inc()
+                if started or attempt >= self.max_retries or not is_retryable(e):
+                    self.failures.inc()
+                    raise
+                delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+                attempt += 1
+                self.retries.inc()
+                await asyncio.sleep(delay)
@@ -0,0 +1,56 @@
+# consume-wise-backend/logs.py
+#
+# Leveled logging that never blocks the event loop: records are put on an in-memory
+# queue by a QueueHandler and written to stderr by a QueueListener thread. Every record
+# carries the trace id of the request (or ingest job) it was logged from.
+
+import sys
+import uuid
+import queue
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"
+
+# Set per request by the trace middleware; "-" outside of any request
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class TraceIdFilter(logging.Filter):
+    # Runs in the thread that emits the record, so it sees that request's context
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def configure_logging(level: str = "INFO") -> None:
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    # Flushes whatever is still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
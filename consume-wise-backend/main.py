@@ -2,26 +2,68 @@
 
 import os
 import io
-import re
 import json
 import base64
-from typing import List, Dict, Optional
+import uuid
+import asyncio
+import time
+import hashlib
+import logging
+import tempfile
+from typing import List, Dict, Optional, Tuple
 
 import cv2
 import numpy as np
 from PIL import Image
-from paddleocr import PaddleOCR
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from bson.errors import InvalidId
 from pydantic import BaseModel, Field, validator
 
-import google.generativeai as genai
+from artifacts import ArtifactStore, etag_matches
+from analyze_jobs import AnalyzeJobService, CallbackRejected, IdempotencyConflict, public_job
+from ingest import IngestService, parse_manifest
+from facets import FACET_SORTS, FACETS, FacetSummaries
+from rescore import Rescorer
+from catalog import (
+    COUNT_MODES, PRODUCT_VIEWS, SEARCH_MODES, SORT_KEYS, InvalidCursor, backfill_search_fields,
+    build_search_query, decode_cursor, encode_cursor, ensure_product_indexes, keyset_filter,
+    parse_fields, product_projection, search_fields, sort_spec,
+)
+from cache import AnalysisCache, LRUCache, MongoCacheTier, image_cache_key, text_cache_key
+from llm import FakeBackend, GeminiBackend, LLMClient
+from metrics import registry
+from singleflight import SingleFlight
+from ocr_engines import ENGINES as OCR_ENGINES, create_engine
+from ocr_pool import OCRPool, OCRPoolSaturated
+from label_image import ImageTooLarge, LabelImage
+from preprocess import map_items_back, preprocess
+from streaming import SectionParser, format_event
+from structured_output import ANALYSIS_RESPONSE_SCHEMA, FAILED, parse_json_object, validate_analysis
+from ingredients import IngredientIndex, local_analysis, merge_analysis
+from highlight import highlight_boxes
+from scoring import calculate_health_score, generate_overall_review
+from barcode import detect_barcodes, normalize_barcode
+from profiles import (
+    ALL_SECTIONS, PROFILES, build_prompt, max_output_tokens, profile_label, resolve_sections,
+    response_schema, sections_variant,
+)
+from logs import configure_logging, new_trace_id, stop_logging, trace_id_var
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Leveled logging through a background thread; X-Request-ID trace ids on every request
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+TRACE_IDS = os.getenv("TRACE_IDS", "true").lower() == "true"
+configure_logging(LOG_LEVEL)
+logger = logging.getLogger("consume_wise")
+
 # Initialize FastAPI app
 app = FastAPI()
 
@@ -33,6 +75,20 @@ origins = [
     # Add your production frontend URL here, e.g., "https://yourdomain.com"
 ]
 
+@app.middleware("http")
+async def assign_trace_id(request: Request, call_next):
+    if not TRACE_IDS:
+        return await call_next(request)
+    # Reuse the caller's id so logs can be joined across services
+    trace_id = request.headers.get("X-Request-ID") or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    try:
+        response = await call_next(request)
+    finally:
+        trace_id_var.reset(token)
+    response.headers["X-Request-ID"] = trace_id
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -41,14 +97,96 @@ app.add_middleware(
     allow_headers=["*"],  # Adjust as needed for security
 )
 
-# Initialize PaddleOCR with GPU support
-ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=True)
+# OCR runs in a pool of worker processes, each holding its own engine (see ocr_engines.py):
+# "paddle", "paddle-fast" (no angle classifier), "tesseract" or "onnx"
+OCR_ENGINE = os.getenv("OCR_ENGINE", "paddle")
+OCR_LANG = os.getenv("OCR_LANG", "en")
+OCR_USE_GPU = os.getenv("OCR_USE_GPU", "false").lower() == "true"  # Paddle engines only
+if OCR_ENGINE not in OCR_ENGINES:
+    raise ValueError(f"OCR_ENGINE must be one of {', '.join(OCR_ENGINES)}.")
+OCR_ENGINE_OPTIONS = {"lang": OCR_LANG, **({"use_gpu": OCR_USE_GPU} if OCR_ENGINE.startswith("paddle") else {})}
+# Building an engine loads no model, so bad options (e.g. an unsupported OCR_LANG) fail at startup
+create_engine(OCR_ENGINE, **OCR_ENGINE_OPTIONS)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "16"))  # Jobs allowed to wait beyond the busy workers
+OCR_RETRY_AFTER_SECONDS = int(os.getenv("OCR_RETRY_AFTER_SECONDS", "2"))
+# Spawn workers and load models at startup; otherwise on the first OCR request
+OCR_WARMUP = os.getenv("OCR_WARMUP", "true").lower() == "true"
+# Micro-batching: wait up to OCR_BATCH_WINDOW_MS for up to OCR_BATCH_MAX_SIZE images (0 disables)
+OCR_BATCH_WINDOW_MS = float(os.getenv("OCR_BATCH_WINDOW_MS", "15"))
+OCR_BATCH_MAX_SIZE = int(os.getenv("OCR_BATCH_MAX_SIZE", "8"))
+# Pre-processing before OCR: downscale, crop to the text area, straighten small skews
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+OCR_MAX_LONG_EDGE = int(os.getenv("OCR_MAX_LONG_EDGE", "1600"))
+OCR_CROP_TO_TEXT = os.getenv("OCR_CROP_TO_TEXT", "true").lower() == "true"
+OCR_DESKEW = os.getenv("OCR_DESKEW", "true").lower() == "true"
+
+OCR_PREPROCESS_OPTIONS = {
+    "max_long_edge": OCR_MAX_LONG_EDGE,
+    "crop_to_text": OCR_CROP_TO_TEXT,
+    "deskew": OCR_DESKEW,
+}
+
+# Upload limits (uploads are spooled by Starlette and only ever viewed, not copied)
+ANALYZE_MAX_UPLOAD_BYTES = int(os.getenv("ANALYZE_MAX_UPLOAD_MB", "10")) * 1024 * 1024
+ADD_PRODUCT_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+ocr_pool = OCRPool(
+    workers=OCR_WORKERS,
+    max_queue=OCR_QUEUE_SIZE,
+    engine=OCR_ENGINE,
+    engine_options=OCR_ENGINE_OPTIONS,
+    retry_after=OCR_RETRY_AFTER_SECONDS,
+    batch_window_seconds=OCR_BATCH_WINDOW_MS / 1000,
+    batch_max_size=OCR_BATCH_MAX_SIZE,
+    preload=OCR_WARMUP,
+)
+
+# Highlighted images: "inline" base64 JSON (default), or stored as artifacts and served
+# by GET /artifacts/{id} ("url"), or sent as a second part of a multipart response
+HIGHLIGHT_IMAGE_FORMAT = os.getenv("HIGHLIGHT_IMAGE_FORMAT", "jpg").lower()  # "jpg" or "webp"
+HIGHLIGHT_IMAGE_QUALITY = int(os.getenv("HIGHLIGHT_IMAGE_QUALITY", "85"))
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "consume-wise-artifacts"))
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", "3600"))
+IMAGE_MODES = ("inline", "url", "multipart")
+
+artifact_store = ArtifactStore(ARTIFACT_DIR, ttl_seconds=ARTIFACT_TTL_SECONDS)
+
+# LLM backend: "gemini" for production, "fake" for tests and benchmarks (no network)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+# JSON mode: the model must answer with JSON matching ANALYSIS_RESPONSE_SCHEMA
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() == "true"
+# Sections /analyze asks for by default (clients override with ?profile= or ?sections=)
+# and sections /add_product and ingest store; the rest are fetched on demand
+ANALYZE_PROFILE = os.getenv("ANALYZE_PROFILE", "full")
+PRODUCT_PROFILE = os.getenv("PRODUCT_PROFILE", "product")
+for profile_name in (ANALYZE_PROFILE, PRODUCT_PROFILE):
+    if profile_name not in PROFILES:
+        raise ValueError(f"Analysis profiles must be one of {', '.join(PROFILES)}.")
+
+# Local ingredient index: known ingredients are scored without an LLM call, and the LLM
+# only sees the ingredients the index does not know (see ingredients.py)
+INGREDIENT_INDEX_PATH = os.getenv(
+    "INGREDIENT_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingredients.json")
+)
+LOCAL_SCORING = os.getenv("LOCAL_SCORING", "true").lower() == "true"
+# Photos showing the barcode / QR code of a catalogued product can be answered from the
+# catalog before OCR runs, for requests that ask for it with barcode_lookup=true (see barcode.py)
+BARCODE_LOOKUP = os.getenv("BARCODE_LOOKUP", "true").lower() == "true"
+index_load_start = time.perf_counter()
+ingredient_index = IngredientIndex.load(INGREDIENT_INDEX_PATH)
+logger.info(
+    "Loaded %d ingredients in %.1f ms", len(ingredient_index.entries), (time.perf_counter() - index_load_start) * 1000
+)
 
 # Configure the AI API client with the API key from environment variables
 GENAI_API_KEY = os.getenv('GENAI_API_KEY')
-if not GENAI_API_KEY:
+if LLM_BACKEND == "gemini" and not GENAI_API_KEY:
     raise ValueError("GENAI_API_KEY is not set in the environment variables.")
-genai.configure(api_key=GENAI_API_KEY)
 
 # Define the generation settings for the Gemini model
 generation_config = {
@@ -58,16 +196,27 @@ generation_config = {
     "max_output_tokens": 8192,
     "response_mime_type": "text/plain",
 }
-
-# Create the generative model
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=generation_config
+if LLM_JSON_MODE:
+    generation_config["response_mime_type"] = "application/json"
+    generation_config["response_schema"] = ANALYSIS_RESPONSE_SCHEMA
+
+# Every analysis is an independent generate_content call; no chat history is kept
+if LLM_BACKEND == "fake":
+    llm_backend = FakeBackend(latency_seconds=LLM_FAKE_LATENCY_MS / 1000)
+else:
+    llm_backend = GeminiBackend(
+        api_key=GENAI_API_KEY,
+        model_name="gemini-1.5-flash",
+        generation_config=generation_config
+    )
+
+llm_client = LLMClient(
+    llm_backend,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    timeout_seconds=LLM_TIMEOUT_SECONDS,
+    max_retries=LLM_MAX_RETRIES,
 )
 
-# Start a chat session with the model
-chat_session = model.start_chat(history=[])
-
 # MongoDB Configuration
 MONGODB_URI = os.getenv("MONGODB_URI")
 if not MONGODB_URI:
@@ -76,6 +225,58 @@ if not MONGODB_URI:
 client = AsyncIOMotorClient(MONGODB_URI)
 db = client["consume_wise_db"]
 products_collection = db["products"]
+analysis_cache_collection = db["analysis_cache"]
+
+# Analysis cache configuration
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_SHARED = os.getenv("CACHE_SHARED", "false").lower() == "true"  # Enable the MongoDB-backed tier
+CACHE_SHARED_TTL_SECONDS = float(os.getenv("CACHE_SHARED_TTL_SECONDS", str(24 * 3600)))
+
+def build_cache(name: str) -> AnalysisCache:
+    local = LRUCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS)
+    shared = MongoCacheTier(analysis_cache_collection, ttl_seconds=CACHE_SHARED_TTL_SECONDS) if CACHE_SHARED else None
+    return AnalysisCache(name, local, shared)
+
+# Image hash -> OCR detected items, and normalized text -> parsed analysis
+ocr_cache = build_cache("ocr")
+analysis_cache = build_cache("analysis")
+
+# Concurrent cache misses for the same image / text share one OCR run / LLM call
+ocr_flight = SingleFlight("ocr")
+analysis_flight = SingleFlight("analysis")
+
+# Filtered product counts for count=estimate (query -> count), refreshed after a short TTL
+PRODUCT_COUNT_CACHE_TTL_SECONDS = float(os.getenv("PRODUCT_COUNT_CACHE_TTL_SECONDS", "60"))
+product_count_cache = LRUCache(max_entries=1024, max_bytes=1024 * 1024, ttl_seconds=PRODUCT_COUNT_CACHE_TTL_SECONDS)
+
+# Per-facet summaries (count, average health score, highly processed) for GET /facets,
+# updated as products are added or ingested (see facets.py)
+facet_summaries = FacetSummaries(db["product_facets"], products_collection)
+
+# Re-scoring stored products after the weights in scoring.py change (see rescore.py)
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "1000"))
+rescorer = Rescorer(products_collection, db["rescore_checkpoints"], facet_summaries, batch_size=RESCORE_BATCH_SIZE)
+rescore_lock = asyncio.Lock()
+
+# Bulk ingestion jobs (see ingest.py)
+INGEST_DIR = os.getenv("INGEST_DIR", os.path.join(tempfile.gettempdir(), "consume-wise-ingest"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "100"))
+ingest_jobs_collection = db["ingest_jobs"]
+ingest_items_collection = db["ingest_items"]
+
+# Asynchronous /analyze jobs (see analyze_jobs.py)
+ANALYZE_JOBS_DIR = os.getenv("ANALYZE_JOBS_DIR", os.path.join(tempfile.gettempdir(), "consume-wise-analyze-jobs"))
+ANALYZE_JOBS_CONCURRENCY = int(os.getenv("ANALYZE_JOBS_CONCURRENCY", "2"))
+ANALYZE_JOBS_TTL_SECONDS = float(os.getenv("ANALYZE_JOBS_TTL_SECONDS", str(24 * 3600)))
+ANALYZE_JOBS_MAX_WAIT_SECONDS = float(os.getenv("ANALYZE_JOBS_MAX_WAIT_SECONDS", "30"))  # Long-poll cap
+ANALYZE_JOBS_WEBHOOK_SECRET = os.getenv("ANALYZE_JOBS_WEBHOOK_SECRET")  # Signs callback bodies when set
+# Comma-separated hosts callbacks may go to (internal ones included); unset allows any
+# host that resolves to public addresses only
+ANALYZE_JOBS_CALLBACK_HOSTS = [host.strip() for host in os.getenv("ANALYZE_JOBS_CALLBACK_HOSTS", "").split(",") if host.strip()]
+analyze_jobs_collection = db["analyze_jobs"]
 
 # Pydantic Models
 
@@ -107,9 +308,11 @@ class Product(BaseModel):
     ingredients: List[str] = Field(..., example=["Water", "Almonds", "Sea Salt"])
     nutritional_info: Optional[NutritionalInfo] = None
     proprietary_claims: Optional[List[ProprietaryClaim]] = None
-    analysis: Optional[Dict] = None  # Stores the full analysis JSON
+    analysis: Optional[Dict] = None  # Stores the analysis JSON (the sections listed below)
+    analysis_sections: Optional[List[str]] = None  # Sections present in `analysis`
     health_score: Optional[HealthScore] = None
     image_url: Optional[str] = None  # URL to the uploaded image
+    barcode: Optional[str] = Field(None, example="5901234123457")  # Canonical GTIN (see barcode.py)
     purpose: Optional[str] = Field(None, example="Nutritional")  # New Field
     frequency: Optional[str] = Field(None, example="Daily")  # New Field
 
@@ -124,177 +327,241 @@ class Product(BaseModel):
 def normalize_text(text: str) -> str:
     return ' '.join(text.lower().split())
 
-def extract_text_with_coords(image_bytes: bytes) -> List[Dict]:
-    try:
-        if not image_bytes:
-            print("No image data provided.")
+def analysis_id(extracted_text: str) -> str:
+    # Stable handle for the follow-up section requests of one analyzed text
+    return hashlib.sha256(normalize_text(extracted_text).encode("utf-8")).hexdigest()
+
+def analysis_generation_config(sections: List[str]) -> Dict:
+    # Per-call overrides: the output budget and response schema cover only the requested sections
+    config = {**generation_config, "max_output_tokens": max_output_tokens(sections)}
+    if LLM_JSON_MODE:
+        config["response_schema"] = response_schema(sections)
+    return config
+
+async def analyze_detected_items(extracted_text: str, sections: List[str] = ALL_SECTIONS) -> str:
+    # Send the prompt to the AI as a standalone request
+    with registry.timer("llm.prompt_build").time():
+        prompt = build_prompt(extracted_text, sections)
+    return await llm_client.generate(prompt, analysis_generation_config(sections), label=profile_label(sections))
+
+def parse_analysis_response(analysis_response: str, sections: List[str] = ALL_SECTIONS) -> Dict:
+    # Tolerates fences, surrounding prose and truncation; the result always has the
+    # canonical analysis shape (see structured_output.py), or is {} if nothing was usable
+    analysis, outcome = parse_json_object(analysis_response)
+    registry.counter(f"analysis.parse.{outcome}").inc()
+    if outcome == FAILED:
+        registry.counter("analysis.parse_failures").inc()
+        logger.warning("No usable JSON object found in the analysis response.")
+        logger.debug("Raw analysis response:\n%s", analysis_response)
+        return {}
+    analysis, dropped = validate_analysis(analysis, sections)
+    if dropped:
+        items = sum(1 for name in dropped if name.endswith("]"))
+        registry.counter("analysis.validation.dropped_sections").inc(len(dropped) - items)
+        registry.counter("analysis.validation.dropped_items").inc(items)
+        logger.warning("Dropped invalid analysis sections and items: %s", ", ".join(dropped))
+    return analysis
+
+def prepare_ocr_input(image: np.ndarray):
+    # Shrink the decoded frame before it is sent to a worker
+    if not OCR_PREPROCESS:
+        return image, np.eye(3)
+    with registry.timer("ocr.preprocess").time():
+        processed, transform = preprocess(image, **OCR_PREPROCESS_OPTIONS)
+    registry.counter("ocr.preprocess.input_pixels").inc(image.shape[0] * image.shape[1])
+    registry.counter("ocr.preprocess.output_pixels").inc(processed.shape[0] * processed.shape[1])
+    return processed, transform
+
+async def get_detected_items(label_image: LabelImage) -> List[Dict]:
+    # Identical uploads skip OCR entirely
+    key = image_cache_key(label_image.digest())
+    detected_items = await ocr_cache.get(key)
+    if detected_items is None:
+        # Decode once (shared with highlighting). The shared OCR call is handed the frame,
+        # not the LabelImage: the caller that started it may leave and close its image
+        # while other callers still wait on the call.
+        try:
+            image = await run_in_threadpool(label_image.decoded)
+        except ValueError as e:
+            logger.warning("Error during OCR: %s", e)
             return []
-        # Convert bytes to NumPy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        # Decode image from NumPy array
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if image is None:
-            raise ValueError("Image decoding failed.")
-
-        # Perform OCR on the image
-        result = ocr.ocr(image, cls=True)
-
-        # Extract text and coordinates
-        detected_items = []
-        for res in result:
-            for line in res:
-                text = line[1][0]  # Extract the text content
-                coords = line[0]    # Coordinates of the bounding box
-                detected_items.append({'text': text, 'coords': coords})
-
-        return detected_items
-    except Exception as e:
-        print(f"Error during OCR: {e}")
-        return []
-
-def analyze_detected_items(extracted_text: str) -> str:
-    analysis_prompt = f"""
-You are a nutrition expert. Analyze the following product details extracted from a food label:
-
-{extracted_text}
-
-Provide the analysis split into the following sections, using JSON format:
-
-{{
-  "NutritionalAnalysis": {{
-    "serving_size": "Specify the serving size here",
-    "Macronutrients": {{
-      "Carbohydrates": {{
-        "Good": ["List of healthy carbohydrate sources with reasons"],
-        "Bad": ["List of unhealthy carbohydrates like added sugars with reasons"]
-      }},
-      "Proteins": {{
-        "Good": ["List of high-quality proteins with reasons"],
-        "Bad": ["List of low-quality or harmful proteins with reasons"]
-      }},
-      "Fats": {{
-        "Good": ["List of healthy fats (e.g., omega-3, unsaturated fats) with reasons"],
-        "Bad": ["List of unhealthy fats (e.g., trans fats, saturated fats) with reasons"]
-      }},
-      "Fiber": {{
-        "Good": ["List of good fiber sources and their benefits"]
-      }}
-    }},
-    "Micronutrients": {{
-      "Vitamins": {{
-        "Good": ["List of vitamins that are beneficial and in appropriate amounts"],
-        "Deficient": ["Vitamins that are lacking or insufficient in the product"]
-      }},
-      "Minerals": {{
-        "Good": ["List of minerals that are beneficial and in appropriate amounts"],
-        "Deficient": ["Minerals that are lacking or insufficient in the product"]
-      }}
-    }},
-    "HealthRisks": ["Summarize potential health risks from overconsumption of specific nutrients or ingredients"],
-    "HealthBenefits": ["Summarize potential health benefits of the product based on its composition"]
-  }},
-  "ProcessingLevel": {{
-    "Description": "Describe how processed this product is and any nutrient deficiencies.",
-    "Level": "Low/Medium/High",
-    "Good": ["Positive aspects of processing, if any (e.g., fortified with vitamins)"],
-    "Bad": ["Negative aspects of processing (e.g., artificial additives, preservatives)"]
-  }},
-  "HarmfulIngredients": [
-    {{
-      "Ingredient": "Name of the harmful ingredient",
-      "Reason": "Why it is harmful"
-    }},
-    ...
-  ],
-  "DietCompliance": {{
-    "CompliantDiets": ["List of diets the product complies with (e.g., vegan, keto, paleo)"],
-    "NonCompliantDiets": ["List of diets the product does not comply with"],
-    "Reasons": "Explanation for compliance or non-compliance with specific diets"
-  }},
-  "DiabetesAllergenFriendly": {{
-    "IsSuitable": true/false,
-    "Reasons": "Why it is or isn't suitable",
-    "Allergens": ["List of allergens present"]
-  }},
-  "SustainabilityAndEthics": {{
-    "Sustainability": "Describe whether the ingredients are sustainably sourced (e.g., palm oil, fish)",
-    "EthicalConcerns": "Highlight any ethical concerns with the product ingredients (e.g., animal products, labor conditions)"
-  }},
-  "RecommendedAlternatives": ["Suggest healthier or more sustainable alternatives to harmful ingredients"],
-  "RegulatoryCompliance": {{
-    "FSSAI": "Is this product compliant with India FSSAI regulations? true/false",
-    "FDA": "Is this product compliant with US FDA regulations? true/false",
-    "EFSA": "Is this product compliant with EU EFSA regulations? true/false",
-    "OtherRegions": "Mention any other regional compliance issues"
-  }},
-  "MisleadingClaims": [
-    {{
-      "Claim": "Name of the misleading claim",
-      "Reason": "Why it is misleading"
-    }},
-    ...
-  ],
-  "AlternativeHomeMadeProcedure": {{
-    "Ingredients": ["List of required ingredients with measurements"],
-    "Steps": ["Detailed step-by-step procedure to make the homemade product"]
-  }}
-}}
-
-**Important Instructions:**
-
-- Provide the result in **JSON format only**.
-- Do **not** include any explanations, code snippets, disclaimers, or additional text.
-- Do **not** include code fences (e.g., ```).
-- Ensure the JSON is properly formatted and valid.
-- For the "MisleadingClaims" section, provide each claim as an object with "Claim" and "Reason" keys.
-- **Always include the "serving_size" field under "NutritionalAnalysis".**
-"""
-
-    # Send the message to the AI
-    response = chat_session.send_message(analysis_prompt)
-
-    # Return the AI's response
-    return response.text
-
-def parse_analysis_response(analysis_response: str) -> Dict:
+        detected_items = await ocr_flight.do(key, lambda: run_ocr(image, key))
+    return detected_items
+
+async def run_ocr(image: np.ndarray, key: str) -> List[Dict]:
+    image, transform = await run_in_threadpool(prepare_ocr_input, image)
     try:
-        # Use regex to extract the JSON object
-        match = re.search(r'\{.*\}', analysis_response, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-            # Parse the JSON
-            analysis = json.loads(json_str)
-            # Ensure 'serving_size' is present
-            if 'NutritionalAnalysis' in analysis:
-                if 'serving_size' not in analysis['NutritionalAnalysis']:
-                    analysis['NutritionalAnalysis']['serving_size'] = None
-            return analysis
-        else:
-            print("No valid JSON object found in the response.")
-            print("Raw Analysis Response:\n", analysis_response)
-            return {}
-    except json.JSONDecodeError as e:
-        print("Failed to parse the analysis response as JSON.")
-        print(f"Error: {e}")
-        print("Raw Analysis Response:\n", analysis_response)
+        detected_items = await ocr_pool.extract(image)
+    except OCRPoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is busy. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    # Boxes are reported in the coordinates of the original upload
+    detected_items = map_items_back(detected_items, transform)
+    if detected_items:
+        await ocr_cache.set(key, detected_items)
+    return detected_items
+
+def detect_label_barcodes(label_image: LabelImage) -> List[str]:
+    try:
+        image = label_image.decoded()
+    except ValueError:
+        return []  # Undecodable uploads are reported by the OCR stage
+    with registry.timer("barcode.detect").time():
+        return detect_barcodes(image)
+
+async def find_product_by_barcode(label_image: LabelImage) -> Optional[Dict]:
+    # The catalogued product whose barcode / QR code is in the photo, or None
+    codes = await run_in_threadpool(detect_label_barcodes, label_image)
+    if not codes:
+        registry.counter("barcode.none").inc()
+        return None
+    with registry.timer("db.products.barcode_lookup").time():
+        product = await products_collection.find_one(
+            {"barcode": {"$in": codes}},
+            {
+                "product_name": 1, "brand_name": 1, "barcode": 1, "ingredients": 1, "analysis": 1,
+                "analysis_sections": 1, "health_score": 1,
+            },
+        )
+    registry.counter("barcode.hits" if product else "barcode.misses").inc()
+    return product
+
+async def product_sections(document: Dict, sections: List[str]) -> Dict:
+    # The requested analysis sections of a stored product; the ones it was stored without
+    # are generated once from its ingredients and saved back onto the product
+    stored = document.get("analysis") or {}
+    missing = [name for name in sections if name not in stored]
+    if missing:
+        generated = await get_analysis(', '.join(document.get("ingredients") or []), missing)
+        if not generated:
+            raise HTTPException(status_code=500, detail="Analysis failed.")
+        with registry.timer("db.products.update").time():
+            await products_collection.update_one(
+                {"_id": document["_id"]},
+                {
+                    "$set": {f"analysis.{name}": data for name, data in generated.items()},
+                    "$addToSet": {"analysis_sections": {"$each": list(generated)}},
+                },
+            )
+        stored = {**stored, **generated}
+    return {name: stored[name] for name in sections if name in stored}
+
+async def run_catalog_analysis(
+    label_image: LabelImage, image_mode: str, sections: List[str]
+) -> Optional[Tuple[Dict, Dict, bytes, str]]:
+    # run_analysis for a photo of a catalogued product's barcode: the same result (the
+    # requested sections, lazy-section info and an image per image_mode) from the stored
+    # analysis, without OCR. The image is the photo itself, as there are no OCR lines to
+    # box. None when no catalogued product is in the photo.
+    product = await find_product_by_barcode(label_image)
+    if product is None or not product.get("ingredients"):
+        return None
+    analysis = await product_sections(product, sections)
+    # The product's ingredient list is the source text of lazy sections by analysis id
+    extracted_text = ', '.join(product["ingredients"])
+    await analysis_cache.set("src:" + analysis_id(extracted_text), extracted_text)
+    lazy = {
+        "source": "catalog",
+        "product_id": str(product["_id"]),
+        "product_name": product.get("product_name"),
+        "brand_name": product.get("brand_name"),
+        "barcode": product.get("barcode"),
+        "health_score": product.get("health_score"),
+        "analysis_id": analysis_id(extracted_text),
+        "sections": sections,
+        "lazy_sections": [name for name in ALL_SECTIONS if name not in sections],
+    }
+    image_format, quality = highlight_format(image_mode)
+    image_bytes = await run_in_threadpool(lambda: encode_image(label_image.decoded(), image_format, quality))
+    return analysis, lazy, image_bytes, image_format
+
+async def get_cached_analysis(extracted_text: str, sections: List[str]) -> Optional[Dict]:
+    # A cached full analysis also answers any subset of its sections
+    normalized = normalize_text(extracted_text)
+    analysis = await analysis_cache.get(text_cache_key(normalized, sections_variant(sections)))
+    if analysis is None and sections != ALL_SECTIONS:
+        full = await analysis_cache.get(text_cache_key(normalized))
+        if full is not None:
+            analysis = {name: full[name] for name in sections if name in full}
+    return analysis
+
+async def set_cached_analysis(extracted_text: str, sections: List[str], analysis: Dict) -> None:
+    # The source text is kept too, so lazy sections can be requested by analysis id later
+    await analysis_cache.set(text_cache_key(normalize_text(extracted_text), sections_variant(sections)), analysis)
+    await analysis_cache.set("src:" + analysis_id(extracted_text), extracted_text)
+
+async def get_analysis(extracted_text: str, sections: List[str] = ALL_SECTIONS) -> Dict:
+    # Identical ingredient text (after normalization) skips the LLM call and parsing
+    analysis = await get_cached_analysis(extracted_text, sections)
+    if analysis is None:
+        key = text_cache_key(normalize_text(extracted_text), sections_variant(sections))
+        analysis = await analysis_flight.do(key, lambda: generate_analysis(extracted_text, sections))
+    return analysis
+
+async def generate_analysis(extracted_text: str, sections: List[str]) -> Dict:
+    analysis_response = await analyze_detected_items(extracted_text, sections)
+    with registry.timer("analysis.parse").time():
+        analysis = parse_analysis_response(analysis_response, sections)
+    if analysis:
+        await set_cached_analysis(extracted_text, sections, analysis)
+    return analysis
+
+async def get_product_analysis(ingredients_list: List[str], sections: List[str]) -> Dict:
+    # Known ingredients are analyzed from the local index; the LLM is called only for the
+    # ingredients it does not know. Sections the index cannot produce (claims, recipes, ...)
+    # are left to /products/{id}/sections unless there are unknown ingredients anyway.
+    extracted_text = ', '.join(ingredients_list)
+    if not LOCAL_SCORING:
+        return await get_analysis(extracted_text, sections)
+    with registry.timer("ingredients.classify").time():
+        matches, unknown = ingredient_index.classify(ingredients_list)
+        analysis = {name: data for name, data in local_analysis(matches).items() if name in sections}
+    registry.counter("ingredients.known").inc(len(matches))
+    registry.counter("ingredients.unknown").inc(len(unknown))
+    if not unknown:
+        registry.counter("analysis.local.complete").inc()
+        return validate_analysis(analysis, list(analysis))[0]
+    registry.counter("analysis.local.partial").inc()
+    remote = await get_analysis(', '.join(unknown), sections)
+    if not remote:
         return {}
+    return merge_analysis(validate_analysis(analysis, list(analysis))[0], remote)
 
-def highlight_image(image_bytes: bytes, detected_items: List[Dict], analysis: Dict) -> bytes:
+def parse_sections(profile: Optional[str], names: Optional[str]) -> List[str]:
+    try:
+        return resolve_sections(profile, names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def encode_image(image: np.ndarray, image_format: str = "jpg", quality: int = 95) -> bytes:
+    if image_format == "webp":
+        _, buffer = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+def highlight_image(
+    label_image: LabelImage,
+    detected_items: List[Dict],
+    analysis: Dict,
+    image_format: str = "jpg",
+    quality: int = 95
+) -> bytes:
     try:
-        if not image_bytes:
+        if not label_image.size:
             raise ValueError("No image data provided for highlighting.")
-        # Convert bytes data to a NumPy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        # Decode image from NumPy array
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise ValueError("Image decoding failed.")
-
-        # Get list of harmful ingredients from analysis
+        # Reuse the frame decoded for OCR; highlighting is its last user, so draw in place
+        image = label_image.decoded()
+
+        # Harmful ingredients from the analysis plus everything the local ingredient index
+        # knows, located inside each OCR line (see highlight.py)
         harmful_ingredients = analysis.get("HarmfulIngredients", [])
-        harmful_texts = [normalize_text(item['Ingredient']) for item in harmful_ingredients]
+        harmful_texts = [item['Ingredient'] for item in harmful_ingredients if isinstance(item, dict) and item.get('Ingredient')]
+        with registry.timer("highlight.match").time():
+            boxes = highlight_boxes(detected_items, harmful_texts, ingredient_index)
 
         # Define colors (BGR format for OpenCV)
         colors = {
@@ -303,145 +570,529 @@ def highlight_image(image_bytes: bytes, detected_items: List[Dict], analysis: Di
             'beneficial': (0, 255, 0)      # Green
         }
 
-        # Draw bounding boxes
-        for item in detected_items:
-            text = normalize_text(item['text'])
-            coords = item['coords']
-
-            if text in harmful_texts:
-                color = colors['harmful']
-            else:
-                color = colors['neutral']  # You can enhance this logic as needed
-
-            # Coordinates are in the format [[x1, y1], [x2, y2], [x3, y3], [x4, y4]]
-            pts = np.array(coords, np.int32)
-            pts = pts.reshape((-1, 1, 2))
-            cv2.polylines(image, [pts], isClosed=True, color=color, thickness=2)
-
-        # Optionally, highlight beneficial ingredients in green
-        # Implement similar logic if needed
+        # One polylines call per color; harmful boxes are drawn last so they stay on top
+        for name in ('neutral', 'beneficial', 'harmful'):
+            if boxes[name]:
+                cv2.polylines(image, boxes[name], isClosed=True, color=colors[name], thickness=2)
 
         # Encode the image back to bytes
-        _, buffer = cv2.imencode('.jpg', image)
-        highlighted_image_bytes = buffer.tobytes()
-
-        return highlighted_image_bytes
+        return encode_image(image, image_format, quality)
 
     except Exception as e:
-        print(f"Error in highlight_image: {e}")
+        logger.error("Error in highlight_image: %s", e)
         raise e
 
-def calculate_health_score(analysis: Dict) -> int:
-    # Start with a perfect health score of 100
-    health_score = 100
+# API Endpoints
 
-    # Deduct points for bad macronutrients and micronutrients
-    bad_macronutrients = analysis.get("NutritionalAnalysis", {}).get("Macronutrients", {})
-    bad_nutrients_count = sum(len(bad_macronutrients.get(nutrient, {}).get("Bad", [])) for nutrient in ["Carbohydrates", "Proteins", "Fats", "Fiber"])
-    health_score -= bad_nutrients_count * 5  # Deduct 5 points per bad nutrient
+@app.on_event("startup")
+async def create_product_indexes():
+    try:
+        await ensure_product_indexes(products_collection)
+        updated = await backfill_search_fields(products_collection)
+        if updated:
+            logger.info("Backfilled search fields on %d products.", updated)
+    except Exception as e:
+        logger.error("Could not create product indexes: %s", e)
 
-    # Deduct points for harmful ingredients
-    harmful_ingredients = analysis.get("HarmfulIngredients", [])
-    health_score -= len(harmful_ingredients) * 10  # Deduct 10 points per harmful ingredient
+@app.on_event("startup")
+async def prepare_facet_summaries():
+    try:
+        await facet_summaries.ensure_indexes()
+        # First start with an existing catalogue: build the summaries once
+        if await facet_summaries.is_empty() and await products_collection.find_one({}, {"_id": 1}):
+            count = await facet_summaries.rebuild()
+            logger.info("Built %d facet summaries.", count)
+    except Exception as e:
+        logger.error("Could not prepare facet summaries: %s", e)
+
+@app.on_event("startup")
+async def create_cache_indexes():
+    if CACHE_SHARED:
+        await MongoCacheTier(analysis_cache_collection).ensure_indexes()
+
+@app.on_event("startup")
+async def start_ocr_pool():
+    if OCR_WARMUP:
+        asyncio.create_task(ocr_pool.warmup())
+
+@app.on_event("shutdown")
+async def stop_ocr_pool():
+    await ocr_pool.close()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    stop_logging()
+
+@app.get("/stats")
+async def get_stats():
+    return registry.snapshot()
+
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus scrape endpoint: the same numbers as /stats, timers as histograms
+    return Response(content=registry.prometheus(), media_type="text/plain; version=0.0.4")
+
+def multipart_response(analysis: Dict, image_bytes: bytes, media_type: str) -> Response:
+    # multipart/mixed: the analysis as a JSON part followed by the raw highlighted image
+    boundary = uuid.uuid4().hex
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json\r\nContent-Disposition: inline; name=\"analysis\"\r\n\r\n".encode(),
+        json.dumps(analysis).encode("utf-8"),
+        f"\r\n--{boundary}\r\nContent-Type: {media_type}\r\nContent-Disposition: inline; name=\"highlighted_image\"\r\n\r\n".encode(),
+        image_bytes,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
 
-    # Deduct points for high processing level
-    processing_level = analysis.get("ProcessingLevel", {}).get("Level", "Unknown").lower()
-    if processing_level == "high":
-        health_score -= 15
-    elif processing_level == "medium":
-        health_score -= 5
+@app.post("/analyze")
+async def analyze_image(
+    request: Request,
+    file: UploadFile = File(...),
+    image_mode: str = "inline",
+    profile: Optional[str] = None,
+    sections: Optional[str] = None,  # Comma-separated section names; overrides the profile
+    barcode_lookup: bool = False  # True answers photos of a catalogued product's barcode from the catalog
+):
+    label_image = None
+    try:
+        if image_mode not in IMAGE_MODES:
+            raise HTTPException(status_code=400, detail=f"image_mode must be one of {', '.join(IMAGE_MODES)}.")
+        requested = parse_sections(profile or ANALYZE_PROFILE, sections)
 
-    # Deduct points for non-compliance with diets
-    non_compliant_diets = analysis.get("DietCompliance", {}).get("NonCompliantDiets", [])
-    health_score -= len(non_compliant_diets) * 5  # Deduct 5 points per non-compliant diet
+        # View the uploaded bytes in place; decoding happens once, on first use
+        label_image = await LabelImage.from_upload(file, max_bytes=ANALYZE_MAX_UPLOAD_BYTES)
 
-    # Ensure the score doesn't go below 0
-    health_score = max(health_score, 0)
+        if not label_image.size:
+            raise HTTPException(status_code=400, detail="Uploaded image is empty.")
 
-    return health_score
+        # A catalogued product's barcode is answered from the catalog with the same response
+        # (marked "source": "catalog")
+        result = None
+        if BARCODE_LOOKUP and barcode_lookup:
+            result = await run_catalog_analysis(label_image, image_mode, requested)
+        analysis, lazy, highlighted_image_bytes, image_format = (
+            result or await run_analysis(label_image, image_mode, requested)
+        )
 
-def generate_overall_review(analysis: Dict, health_score: int) -> str:
-    review = []
+        if image_mode == "url":
+            artifact_id = await run_in_threadpool(artifact_store.put, highlighted_image_bytes, image_format)
+            return {
+                "analysis": analysis,
+                **lazy,
+                "highlighted_image_id": artifact_id,
+                "highlighted_image_url": str(request.url_for("get_artifact", artifact_id=artifact_id))
+            }
+        if image_mode == "multipart":
+            media_type = "image/webp" if image_format == "webp" else "image/jpeg"
+            response = multipart_response(analysis, highlighted_image_bytes, media_type)
+            response.headers["X-Analysis-Id"] = lazy["analysis_id"]
+            if "source" in lazy:
+                response.headers["X-Analysis-Source"] = lazy["source"]
+            return response
 
-    # Review based on health score
-    if health_score > 80:
-        review.append("This product is generally healthy and well-balanced.")
-    elif health_score > 50:
-        review.append("This product is moderately healthy but has some areas of concern.")
-    else:
-        review.append("This product is not healthy and contains many harmful ingredients or nutrients.")
-
-    # Review based on processing level
-    processing_level = analysis.get("ProcessingLevel", {}).get("Level", "Unknown").lower()
-    if processing_level == "high":
-        review.append("It is highly processed, which can negatively impact health.")
-    elif processing_level == "medium":
-        review.append("It is moderately processed.")
-    elif processing_level == "low":
-        review.append("It is minimally processed.")
-
-    # Review based on harmful ingredients
-    harmful_ingredients = analysis.get("HarmfulIngredients", [])
-    if harmful_ingredients:
-        review.append("Contains harmful ingredients that could pose health risks.")
-    else:
-        review.append("No harmful ingredients detected.")
+        # Encode highlighted image to base64 for frontend
+        with registry.timer("image.base64_encode").time():
+            highlighted_image_base64 = base64.b64encode(highlighted_image_bytes).decode('utf-8')
 
-    # Review based on diet compliance
-    compliant_diets = analysis.get("DietCompliance", {}).get("CompliantDiets", [])
-    non_compliant_diets = analysis.get("DietCompliance", {}).get("NonCompliantDiets", [])
-    if compliant_diets:
-        review.append(f"Complies with the following diets: {', '.join(compliant_diets)}.")
-    if non_compliant_diets:
-        review.append(f"Does not comply with the following diets: {', '.join(non_compliant_diets)}.")
+        return {
+            "analysis": analysis,
+            **lazy,
+            "highlighted_image": highlighted_image_base64
+        }
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.exception("Error in /analyze endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+    finally:
+        if label_image is not None:
+            label_image.close()
+
+async def run_analysis(label_image: LabelImage, image_mode: str, sections: List[str]) -> Tuple[Dict, Dict, bytes, str]:
+    # The /analyze pipeline, shared with analyze jobs: returns the analysis, its lazy-section
+    # info, the highlighted image and that image's format
+    # Extract text with coordinates
+    detected_items = await get_detected_items(label_image)
+
+    if not detected_items:
+        raise HTTPException(status_code=400, detail="No text detected in the image.")
+
+    # Prepare extracted text for analysis
+    extracted_texts = [item['text'] for item in detected_items]
+    extracted_text = '\n'.join(extracted_texts)
+
+    # Analyze the extracted text using AI (cached on the normalized text)
+    analysis = await get_analysis(extracted_text, sections)
+
+    if not analysis:
+        raise HTTPException(status_code=500, detail="Analysis failed.")
+
+    # Sections left out can be fetched later from /analysis/{analysis_id}/sections
+    lazy = {
+        "analysis_id": analysis_id(extracted_text),
+        "sections": sections,
+        "lazy_sections": [name for name in ALL_SECTIONS if name not in sections],
+    }
+
+    # Highlight the image based on analysis (OpenCV work stays off the event loop)
+    image_format, quality = highlight_format(image_mode)
+    with registry.timer("highlight.execution").time():
+        highlighted_image_bytes = await run_in_threadpool(
+            highlight_image, label_image, detected_items, analysis, image_format, quality
+        )
+    return analysis, lazy, highlighted_image_bytes, image_format
+
+def highlight_format(image_mode: str) -> Tuple[str, int]:
+    # Inline images stay JPEG because clients build a data:image/jpeg URL from them
+    if image_mode == "inline":
+        return "jpg", 95
+    return HIGHLIGHT_IMAGE_FORMAT, HIGHLIGHT_IMAGE_QUALITY
+
+async def run_analyze_job(image_bytes: bytes, options: Dict) -> Dict:
+    # One queued /analyze/jobs submission; the result is stored on the job document.
+    # Artifact URLs are relative and live for ARTIFACT_TTL_SECONDS, not for the job TTL.
+    label_image = LabelImage(image_bytes)
+    try:
+        result = None
+        if BARCODE_LOOKUP and options.get("barcode_lookup"):
+            result = await run_catalog_analysis(label_image, options["image_mode"], options["sections"])
+        analysis, lazy, highlighted_image_bytes, image_format = result or await run_analysis(
+            label_image, options["image_mode"], options["sections"]
+        )
+    finally:
+        label_image.close()
+    if options["image_mode"] == "url":
+        artifact_id = await run_in_threadpool(artifact_store.put, highlighted_image_bytes, image_format)
+        return {
+            "analysis": analysis,
+            **lazy,
+            "highlighted_image_id": artifact_id,
+            "highlighted_image_url": app.url_path_for("get_artifact", artifact_id=artifact_id),
+        }
+    with registry.timer("image.base64_encode").time():
+        highlighted_image_base64 = base64.b64encode(highlighted_image_bytes).decode('utf-8')
+    return {"analysis": analysis, **lazy, "highlighted_image": highlighted_image_base64}
+
+analyze_job_service = AnalyzeJobService(
+    analyze_jobs_collection,
+    run_analyze_job,
+    work_dir=ANALYZE_JOBS_DIR,
+    concurrency=ANALYZE_JOBS_CONCURRENCY,
+    ttl_seconds=ANALYZE_JOBS_TTL_SECONDS,
+    webhook_secret=ANALYZE_JOBS_WEBHOOK_SECRET,
+    callback_hosts=ANALYZE_JOBS_CALLBACK_HOSTS,
+)
 
-    return " ".join(review)
+@app.on_event("startup")
+async def start_analyze_jobs():
+    analyze_job_service.start()
+    try:
+        await analyze_job_service.ensure_indexes()
+        await analyze_job_service.resume_incomplete()
+    except Exception as e:
+        logger.error("Could not resume analyze jobs: %s", e)
+
+@app.on_event("shutdown")
+async def stop_analyze_jobs():
+    await analyze_job_service.stop()
+
+@app.post("/analyze/jobs", status_code=202)
+async def submit_analyze_job(
+    request: Request,
+    file: UploadFile = File(...),
+    image_mode: str = "url",
+    profile: Optional[str] = None,
+    sections: Optional[str] = None,
+    barcode_lookup: bool = False,
+    callback_url: Optional[str] = Form(None)  # Receives the finished job as a JSON POST
+):
+    # Asynchronous /analyze: answers with a job id at once; poll GET /analyze/jobs/{job_id}
+    # (optionally with ?wait= to long-poll) or pass a callback_url. Retries that send the
+    # same Idempotency-Key header get the original job back.
+    if image_mode not in ("url", "inline"):
+        raise HTTPException(status_code=400, detail="image_mode must be one of url, inline.")
+    requested = parse_sections(profile or ANALYZE_PROFILE, sections)
 
-# API Endpoints
+    try:
+        label_image = await LabelImage.from_upload(file, max_bytes=ANALYZE_MAX_UPLOAD_BYTES)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        if not label_image.size:
+            raise HTTPException(status_code=400, detail="Uploaded image is empty.")
+        image_bytes = bytes(label_image.raw)
+    finally:
+        label_image.close()
 
-@app.post("/analyze")
-async def analyze_image(file: UploadFile = File(...)):
     try:
-        # Read image bytes
-        image_bytes = await file.read()
+        job = await analyze_job_service.submit(
+            image_bytes,
+            {"image_mode": image_mode, "sections": requested, "barcode_lookup": barcode_lookup},
+            idempotency_key=request.headers.get("idempotency-key"),
+            callback_url=callback_url,
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CallbackRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /analyze/jobs endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+    return {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "status_url": app.url_path_for("get_analyze_job", job_id=job["_id"]),
+    }
+
+@app.get("/analyze/jobs/{job_id}")
+async def get_analyze_job(job_id: str, wait: float = 0):
+    # wait > 0 long-polls: the response is sent as soon as the job finishes, or after
+    # `wait` seconds (capped by ANALYZE_JOBS_MAX_WAIT_SECONDS) with the current status
+    wait = max(0.0, min(wait, ANALYZE_JOBS_MAX_WAIT_SECONDS))
+    job = await analyze_job_service.get(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analyze job not found or expired.")
+    return public_job(job)
+
+async def analysis_events(
+    request: Request,
+    label_image: LabelImage,
+    detected_items: List[Dict],
+    image_mode: str,
+    sections: List[str]
+):
+    # Events for /analyze/stream: OCR text first, then each analysis section as soon as
+    # the model has finished generating it, then the highlighted image.
+    try:
+        extracted_texts = [item['text'] for item in detected_items]
+        yield {"event": "ocr", "detected_text": extracted_texts}
 
-        if not image_bytes:
+        extracted_text = '\n'.join(extracted_texts)
+        analysis = await get_cached_analysis(extracted_text, sections)
+        emitted = set()
+        if analysis is None:
+            parser = SectionParser()
+            chunks = []
+            prompt = build_prompt(extracted_text, sections)
+            config = analysis_generation_config(sections)
+            async for chunk in llm_client.stream(prompt, config, label=profile_label(sections)):
+                chunks.append(chunk)
+                for name, data in parser.feed(chunk):
+                    if name not in sections:
+                        continue
+                    # Same shape as /analyze and the cache; a section that fails validation
+                    # is left to the full parse below
+                    section, dropped = validate_analysis({name: data}, [name])
+                    if name in dropped:
+                        continue
+                    emitted.add(name)
+                    yield {"event": "section", "name": name, "data": section[name]}
+            analysis = parse_analysis_response(''.join(chunks), sections)
+            if not analysis:
+                yield {"event": "error", "detail": "Analysis failed."}
+                return
+            await set_cached_analysis(extracted_text, sections, analysis)
+
+        # Cache hits, and anything the incremental parser could not split out
+        for name, data in analysis.items():
+            if name not in emitted:
+                yield {"event": "section", "name": name, "data": data}
+
+        image_format, quality = highlight_format(image_mode)
+        with registry.timer("highlight.execution").time():
+            highlighted_image_bytes = await run_in_threadpool(
+                highlight_image, label_image, detected_items, analysis, image_format, quality
+            )
+        if image_mode == "url":
+            artifact_id = await run_in_threadpool(artifact_store.put, highlighted_image_bytes, image_format)
+            yield {
+                "event": "highlight",
+                "highlighted_image_id": artifact_id,
+                "highlighted_image_url": str(request.url_for("get_artifact", artifact_id=artifact_id))
+            }
+        else:
+            with registry.timer("image.base64_encode").time():
+                highlighted_image_base64 = base64.b64encode(highlighted_image_bytes).decode('utf-8')
+            yield {"event": "highlight", "highlighted_image": highlighted_image_base64}
+        yield {
+            "event": "done",
+            "analysis_id": analysis_id(extracted_text),
+            "lazy_sections": [name for name in ALL_SECTIONS if name not in sections],
+        }
+    except Exception as e:
+        logger.exception("Error in /analyze/stream: %s", e)
+        yield {"event": "error", "detail": "Internal Server Error."}
+    finally:
+        label_image.close()
+
+@app.post("/analyze/stream")
+async def analyze_image_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    image_mode: str = "inline",
+    format: str = "ndjson",
+    profile: Optional[str] = None,
+    sections: Optional[str] = None
+):
+    # Progressive variant of /analyze, as NDJSON (default) or Server-Sent Events (format=sse)
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be one of ndjson, sse.")
+    if image_mode not in ("inline", "url"):
+        raise HTTPException(status_code=400, detail="image_mode must be one of inline, url.")
+    requested = parse_sections(profile or ANALYZE_PROFILE, sections)
+
+    label_image = None
+    try:
+        label_image = await LabelImage.from_upload(file, max_bytes=ANALYZE_MAX_UPLOAD_BYTES)
+        if not label_image.size:
             raise HTTPException(status_code=400, detail="Uploaded image is empty.")
 
-        # Extract text with coordinates
-        detected_items = extract_text_with_coords(image_bytes)
-
+        # OCR runs before the stream opens so saturation and empty results keep their status codes
+        detected_items = await get_detected_items(label_image)
         if not detected_items:
             raise HTTPException(status_code=400, detail="No text detected in the image.")
 
-        # Prepare extracted text for analysis
-        extracted_texts = [item['text'] for item in detected_items]
-        extracted_text = '\n'.join(extracted_texts)
-
-        # Analyze the extracted text using AI
-        analysis_response = analyze_detected_items(extracted_text)
-
-        # Parse the analysis response
-        analysis = parse_analysis_response(analysis_response)
-
-        if not analysis:
-            raise HTTPException(status_code=500, detail="Analysis failed.")
-
-        # Highlight the image based on analysis
-        highlighted_image_bytes = highlight_image(image_bytes, detected_items, analysis)
-
-        # Encode highlighted image to base64 for frontend
-        highlighted_image_base64 = base64.b64encode(highlighted_image_bytes).decode('utf-8')
-
-        return {
-            "analysis": analysis,
-            "highlighted_image": highlighted_image_base64
-        }
-    except HTTPException as he:
-        raise he
+        # Keep only the decoded frame: the upload may be closed before the stream finishes
+        await run_in_threadpool(label_image.decoded)
+        label_image.release_buffer()
+    except ImageTooLarge as e:
+        label_image = None
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        if label_image is not None:
+            label_image.close()
+        raise
+
+    async def body():
+        async for event in analysis_events(request, label_image, detected_items, image_mode, requested):
+            yield format_event(event, format)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/analysis/{analysis_id}/sections")
+async def get_analysis_sections(analysis_id: str, names: Optional[str] = None, profile: Optional[str] = None):
+    # Lazy follow-up for /analyze: generates only the requested sections of an earlier analysis
+    requested = parse_sections(profile or "full", names)
+    extracted_text = await analysis_cache.get("src:" + analysis_id)
+    if extracted_text is None:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired. Analyze the image again.")
+    try:
+        analysis = await get_analysis(extracted_text, requested)
     except Exception as e:
-        print(f"Error in /analyze endpoint: {e}")
+        logger.exception("Error in /analysis/{analysis_id}/sections endpoint: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error.")
+    if not analysis:
+        raise HTTPException(status_code=500, detail="Analysis failed.")
+    return {"analysis_id": analysis_id, "analysis": analysis}
+
+@app.get("/ingredients/score")
+async def score_ingredients(ingredients: str):
+    # LLM-free score for a comma-separated ingredient list, from the local index only.
+    # `unknown` lists what the index could not classify (the score ignores those).
+    ingredients_list = [ing.strip() for ing in ingredients.split(",") if ing.strip()]
+    if not ingredients_list:
+        raise HTTPException(status_code=400, detail="ingredients is required.")
+    with registry.timer("ingredients.classify").time():
+        matches, unknown = ingredient_index.classify(ingredients_list)
+        analysis = local_analysis(matches)
+    score = calculate_health_score(analysis)
+    return {
+        "health_score": {"score": score, "review": generate_overall_review(analysis, score)},
+        "ingredients": [
+            {
+                "text": match["text"],
+                "name": match["entry"]["name"],
+                "class": match["entry"]["class"],
+                "reason": match["entry"]["reason"],
+                "allergens": match["entry"].get("allergens", []),
+                "non_compliant_diets": match["entry"].get("diets", []),
+            }
+            for match in matches
+        ],
+        "unknown": unknown,
+        "complete": not unknown,
+        "analysis": analysis,
+    }
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found or expired.")
+    path, media_type = artifact
+
+    # Artifacts are content-addressed, so the id is a strong validator
+    etag = f'"{artifact_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={artifact_store.remaining_ttl(path)}, immutable",
+    }
+    if etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+async def build_product(
+    product_name: str,
+    product_qty: str,
+    brand_name: str,
+    weightage: float,
+    weight_unit: str,
+    product_category: str,
+    ingredients_list: List[str],
+    purpose: Optional[str] = None,
+    frequency: Optional[str] = None,
+    barcode: Optional[str] = None
+) -> Product:
+    # Analyze known ingredients locally and the rest with Gemini API (cached on the
+    # normalized text). Only the sections of the product profile are generated; the rest
+    # are filled in by /products/{id}/sections.
+    product_sections = PROFILES[PRODUCT_PROFILE]
+    analysis = await get_product_analysis(ingredients_list, product_sections)
+
+    if not analysis:
+        raise HTTPException(status_code=500, detail="Failed to analyze ingredients with Gemini API.")
+
+    # Calculate health score
+    health_score_value = calculate_health_score(analysis)
+    overall_review = generate_overall_review(analysis, health_score_value)
+
+    health_score = HealthScore(
+        score=health_score_value,
+        review=overall_review
+    )
+
+    # Extract proprietary claims from analysis
+    misleading_claims = analysis.get("MisleadingClaims", [])
+    proprietary_claims = [ProprietaryClaim(claim=item['Claim'], reason=item.get('Reason')) for item in misleading_claims]
+
+    # Handle image storage (Optional)
+    # For simplicity, we're not storing images. If needed, implement image storage and set image_url accordingly.
+
+    # Create Product instance
+    return Product(
+        product_name=product_name,
+        product_qty=product_qty,
+        brand_name=brand_name,
+        weightage=weightage,
+        weight_unit=weight_unit,
+        product_category=product_category,
+        ingredients=ingredients_list,
+        nutritional_info=analysis.get("NutritionalAnalysis"),
+        proprietary_claims=proprietary_claims if proprietary_claims else None,
+        analysis=analysis,  # Store the analysis
+        analysis_sections=[name for name in product_sections if name in analysis],
+        health_score=health_score,
+        image_url=None,  # Placeholder, can be updated if storing images
+        purpose=purpose,  # New Field
+        frequency=frequency,  # New Field
+        barcode=barcode
+    )
 
 @app.post("/add_product")
 async def add_product(
@@ -454,20 +1105,24 @@ async def add_product(
     ingredients: Optional[str] = Form(None),  # If manual input
     ingredients_image: Optional[UploadFile] = File(None),  # If image upload
     purpose: Optional[str] = Form(None),  # New Field
-    frequency: Optional[str] = Form(None)  # New Field
+    frequency: Optional[str] = Form(None),  # New Field
+    barcode: Optional[str] = Form(None)  # EAN/UPC digits or GS1 QR payload; else read from the image
 ):
     try:
         # Log received data
-        print(f"Received product_name: {product_name}")
-        print(f"Received product_qty: {product_qty}")
-        print(f"Received brand_name: {brand_name}")
-        print(f"Received weightage: {weightage}")
-        print(f"Received weight_unit: {weight_unit}")
-        print(f"Received product_category: {product_category}")
-        print(f"Received ingredients: {ingredients}")
-        print(f"Received ingredients_image: {ingredients_image.filename if ingredients_image else 'None'}")
-        print(f"Received purpose: {purpose}")
-        print(f"Received frequency: {frequency}")
+        logger.debug(
+            "Received product: name=%s qty=%s brand=%s weightage=%s unit=%s category=%s "
+            "ingredients=%s image=%s purpose=%s frequency=%s",
+            product_name, product_qty, brand_name, weightage, weight_unit, product_category, ingredients,
+            ingredients_image.filename if ingredients_image else None, purpose, frequency,
+        )
+
+        if barcode:
+            code = normalize_barcode(barcode)
+            if code is None:
+                raise HTTPException(status_code=400, detail="barcode is not a valid EAN/UPC/GTIN.")
+        else:
+            code = None
 
         # Handle ingredients
         if ingredients_image and ingredients_image.filename:
@@ -475,19 +1130,20 @@ async def add_product(
             if not ingredients_image.content_type.startswith('image/'):
                 raise HTTPException(status_code=400, detail="Uploaded file is not an image.")
 
-            # Optionally, validate file size (e.g., max 5MB)
-            contents = await ingredients_image.read()
-            if len(contents) > 5 * 1024 * 1024:
-                raise HTTPException(status_code=400, detail="Uploaded image is too large. Max size is 5MB.")
-
-            # Reset the file pointer after reading
-            ingredients_image.file.seek(0)
-
-            # Read image bytes
-            image_bytes = await ingredients_image.read()
-            if not image_bytes:
-                raise HTTPException(status_code=400, detail="Uploaded ingredients image is empty.")
-            detected_items = extract_text_with_coords(image_bytes)
+            # Validate file size (max 5MB) from the spooled upload without reading it
+            try:
+                label_image = await LabelImage.from_upload(ingredients_image, max_bytes=ADD_PRODUCT_MAX_UPLOAD_BYTES)
+            except ImageTooLarge as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            try:
+                if not label_image.size:
+                    raise HTTPException(status_code=400, detail="Uploaded ingredients image is empty.")
+                if code is None and BARCODE_LOOKUP:
+                    codes = await run_in_threadpool(detect_label_barcodes, label_image)
+                    code = codes[0] if codes else None
+                detected_items = await get_detected_items(label_image)
+            finally:
+                label_image.close()
             if not detected_items:
                 raise HTTPException(status_code=400, detail="No text detected in the ingredients image.")
             ingredients_list = [item['text'] for item in detected_items]
@@ -497,62 +1153,217 @@ async def add_product(
         else:
             raise HTTPException(status_code=400, detail="Ingredients are required either via manual input or image upload.")
 
-        # Prepare extracted text for Gemini API
-        extracted_text = ', '.join(ingredients_list)
-
-        # Analyze with Gemini API
-        analysis_response = analyze_detected_items(extracted_text)
-
-        # Parse the analysis response
-        analysis = parse_analysis_response(analysis_response)
-
-        if not analysis:
-            raise HTTPException(status_code=500, detail="Failed to analyze ingredients with Gemini API.")
-
-        # Calculate health score
-        health_score_value = calculate_health_score(analysis)
-        overall_review = generate_overall_review(analysis, health_score_value)
-
-        health_score = HealthScore(
-            score=health_score_value,
-            review=overall_review
-        )
-
-        # Extract proprietary claims from analysis
-        misleading_claims = analysis.get("MisleadingClaims", [])
-        proprietary_claims = [ProprietaryClaim(claim=item['Claim'], reason=item.get('Reason')) for item in misleading_claims]
-
-        # Handle image storage (Optional)
-        # For simplicity, we're not storing images. If needed, implement image storage and set image_url accordingly.
-
-        # Create Product instance
-        product = Product(
+        product = await build_product(
             product_name=product_name,
             product_qty=product_qty,
             brand_name=brand_name,
             weightage=weightage,
             weight_unit=weight_unit,
             product_category=product_category,
-            ingredients=ingredients_list,
-            nutritional_info=analysis.get("NutritionalAnalysis"),
-            proprietary_claims=proprietary_claims if proprietary_claims else None,
-            analysis=analysis,  # Store the full analysis
-            health_score=health_score,
-            image_url=None,  # Placeholder, can be updated if storing images
-            purpose=purpose,  # New Field
-            frequency=frequency  # New Field
+            ingredients_list=ingredients_list,
+            purpose=purpose,
+            frequency=frequency,
+            barcode=code
         )
 
         # Insert into MongoDB
-        result = await products_collection.insert_one(product.dict())
+        document = product.dict()
+        document.update(search_fields(document))  # Token fields for index-backed name search
+        with registry.timer("db.products.insert").time():
+            result = await products_collection.insert_one(document)
+        try:
+            await facet_summaries.record(added=[document])
+        except Exception as e:
+            # The product is stored; POST /facets/rebuild repairs the summaries
+            logger.error("Could not update facet summaries: %s", e)
 
         return {"message": "Product added successfully", "product_id": str(result.inserted_id)}
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error in /add_product endpoint: {e}")
+        logger.exception("Error in /add_product endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+async def build_ingest_document(row: Dict, image_bytes: Optional[bytes]) -> Dict:
+    # One manifest row -> one product document, using the same pipeline as /add_product
+    for field in ("product_name", "product_qty", "brand_name", "weightage", "weight_unit", "product_category"):
+        if not row.get(field):
+            raise ValueError(f"Missing required field: {field}")
+    code = None
+    if row.get("barcode"):
+        code = normalize_barcode(str(row["barcode"]))
+        if code is None:
+            raise ValueError("barcode is not a valid EAN/UPC/GTIN.")
+
+    if image_bytes:
+        label_image = LabelImage(image_bytes)
+        try:
+            if code is None and BARCODE_LOOKUP:
+                codes = await run_in_threadpool(detect_label_barcodes, label_image)
+                code = codes[0] if codes else None
+            detected_items = await get_detected_items(label_image)
+        finally:
+            label_image.close()
+        if not detected_items:
+            raise ValueError("No text detected in the ingredients image.")
+        ingredients_list = [item['text'] for item in detected_items]
+    elif row.get("ingredients"):
+        ingredients = row["ingredients"]
+        if isinstance(ingredients, str):
+            ingredients = ingredients.split(",")
+        ingredients_list = [ing.strip() for ing in ingredients]
+    else:
+        raise ValueError("Ingredients are required either via manual input or image upload.")
+
+    product = await build_product(
+        product_name=row["product_name"],
+        product_qty=row["product_qty"],
+        brand_name=row["brand_name"],
+        weightage=float(row["weightage"]),
+        weight_unit=row["weight_unit"],
+        product_category=row["product_category"],
+        ingredients_list=ingredients_list,
+        purpose=row.get("purpose"),
+        frequency=row.get("frequency"),
+        barcode=code
+    )
+    document = product.dict()
+    document.update(search_fields(document))
+    return document
+
+ingest_service = IngestService(
+    ingest_jobs_collection,
+    ingest_items_collection,
+    products_collection,
+    build_ingest_document,
+    work_dir=INGEST_DIR,
+    concurrency=INGEST_CONCURRENCY,
+    chunk_size=INGEST_CHUNK_SIZE,
+    facets=facet_summaries,
+)
+
+@app.on_event("startup")
+async def resume_ingest_jobs():
+    try:
+        await ingest_service.ensure_indexes()
+        await ingest_service.resume_incomplete()
+    except Exception as e:
+        logger.error("Could not resume ingest jobs: %s", e)
+
+@app.post("/ingest/jobs", status_code=202)
+async def create_ingest_job(
+    manifest: UploadFile = File(...),  # CSV (with header) or JSONL, same fields as /add_product
+    images: Optional[UploadFile] = File(None),  # Optional zip of ingredient images
+    manifest_format: Optional[str] = Form(None)  # "csv" or "jsonl"; guessed from the file name if omitted
+):
+    try:
+        if not manifest_format:
+            manifest_format = "jsonl" if (manifest.filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+        if manifest_format not in ("csv", "jsonl"):
+            raise HTTPException(status_code=400, detail="manifest_format must be either 'csv' or 'jsonl'.")
+        try:
+            rows = parse_manifest(await manifest.read(), manifest_format)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=f"Could not parse manifest: {e}")
+        if not rows:
+            raise HTTPException(status_code=400, detail="Manifest is empty.")
+
+        archive_file = images.file if images and images.filename else None
+        job_id = await ingest_service.create_job(rows, archive_file)
+        return {"job_id": job_id, "total": len(rows), "status_url": f"/ingest/jobs/{job_id}"}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.exception("Error in /ingest/jobs endpoint: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error.")
 
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = await ingest_service.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found.")
+    return job
+
+@app.get("/ingest/jobs/{job_id}/items")
+async def get_ingest_job_items(job_id: str, status: Optional[str] = None, page: int = 1, limit: int = 100):
+    return {"job_id": job_id, "page": page, "items": await ingest_service.list_items(job_id, status, page, limit)}
+
+@app.post("/ingest/jobs/{job_id}/retry_failed")
+async def retry_ingest_job(job_id: str):
+    if await ingest_service.status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found.")
+    await ingest_service.retry_failed(job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+def resolve_projection(view: str, fields: Optional[str], sort_key: str = "_id") -> Dict:
+    if view not in PRODUCT_VIEWS:
+        raise HTTPException(status_code=400, detail=f"view must be one of {', '.join(PRODUCT_VIEWS)}.")
+    try:
+        return product_projection(view, parse_fields(fields), sort_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/products/{product_id}")
+async def get_product(product_id: str, view: str = "full", fields: Optional[str] = None):
+    # One product by id, including the full stored analysis that listings leave out
+    projection = resolve_projection(view, fields)
+    try:
+        object_id = ObjectId(product_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    try:
+        with registry.timer("db.products.find_one").time():
+            document = await products_collection.find_one({"_id": object_id}, projection)
+    except Exception as e:
+        logger.exception("Error in /products/{product_id} endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+    if document is None:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    document["_id"] = str(document["_id"])
+    return document
+
+@app.get("/products/{product_id}/sections")
+async def get_product_sections(product_id: str, names: Optional[str] = None, profile: Optional[str] = None):
+    # Analysis sections of a stored product (see product_sections)
+    requested = parse_sections(profile or "full", names)
+    try:
+        object_id = ObjectId(product_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    try:
+        with registry.timer("db.products.find_one").time():
+            document = await products_collection.find_one(
+                {"_id": object_id}, {"ingredients": 1, "analysis": 1, "analysis_sections": 1}
+            )
+        if document is None:
+            raise HTTPException(status_code=404, detail="Product not found.")
+        return {"product_id": product_id, "analysis": await product_sections(document, requested)}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.exception("Error in /products/{product_id}/sections endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+async def count_products(query: Dict, count_mode: str) -> Optional[int]:
+    with registry.timer("db.products.count").time():
+        return await _count_products(query, count_mode)
+
+async def _count_products(query: Dict, count_mode: str) -> Optional[int]:
+    if count_mode == "none":
+        return None
+    if count_mode == "estimate":
+        if not query:
+            # Collection metadata, no scan at all
+            return await products_collection.estimated_document_count()
+        key = json.dumps(query, sort_keys=True, default=str)
+        cached = product_count_cache.get(key)
+        if cached is not None:
+            return cached
+        total_count = await products_collection.count_documents(query)
+        product_count_cache.set(key, total_count)
+        return total_count
+    return await products_collection.count_documents(query)
+
 @app.get("/get_products")
 async def get_products(
     product_name: Optional[str] = None,
@@ -561,48 +1372,135 @@ async def get_products(
     purpose: Optional[str] = None,  # New Filter
     frequency: Optional[str] = None,  # New Filter
     page: int = 1,
-    limit: int = 10
+    limit: int = 10,
+    search_mode: str = "regex",  # "regex" (substring scan), "prefix" (indexed word prefixes) or "text" (full-text)
+    cursor: Optional[str] = None,  # next_cursor from the previous page; takes precedence over page
+    sort: str = "_id",  # "_id" or "product_name"
+    count: str = "exact",  # "exact", "estimate" (fast, possibly stale) or "none"
+    view: str = "full",  # "summary", "card" or "full"; see PRODUCT_VIEWS
+    fields: Optional[str] = None  # Comma-separated field names; overrides view
 ):
     try:
-        query = {}
-        if product_name:
-            # Case-insensitive search for product name
-            query["product_name"] = {"$regex": product_name, "$options": "i"}
-        if brand_name:
-            # Case-insensitive search for brand name
-            query["brand_name"] = {"$regex": brand_name, "$options": "i"}
-        if product_category:
-            # Exact match for category
-            query["product_category"] = product_category
-        if purpose:
-            # Exact match for purpose
-            query["purpose"] = purpose
-        if frequency:
-            # Exact match for frequency
-            query["frequency"] = frequency
-
-        # Pagination
-        skips = limit * (page - 1)
-        cursor = products_collection.find(query).skip(skips).limit(limit)
-        results = []
-        async for document in cursor:
-            document["_id"] = str(document["_id"])  # Convert ObjectId to string
-            results.append(document)
+        if search_mode not in SEARCH_MODES:
+            raise HTTPException(status_code=400, detail=f"search_mode must be one of {', '.join(SEARCH_MODES)}.")
+        if sort not in SORT_KEYS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}.")
+        if count not in COUNT_MODES:
+            raise HTTPException(status_code=400, detail=f"count must be one of {', '.join(COUNT_MODES)}.")
+        if page < 1 or not 1 <= limit <= 100:
+            raise HTTPException(status_code=400, detail="page must be >= 1 and limit between 1 and 100.")
+        projection = resolve_projection(view, fields, sort)
+
+        # Name and brand searches go through indexed token fields or the text index
+        query = build_search_query(
+            product_name=product_name,
+            brand_name=brand_name,
+            product_category=product_category,
+            purpose=purpose,
+            frequency=frequency,
+            search_mode=search_mode,
+        )
 
-        # Get total count for pagination
-        total_count = await products_collection.count_documents(query)
+        # Pagination: keyset when a cursor is given (cost independent of depth), skip otherwise.
+        # One extra document is fetched to know whether there is a next page.
+        if "$text" in query:
+            if cursor:
+                # textScore cannot be range-filtered, so full-text results only page by number
+                raise HTTPException(status_code=400, detail="cursor is not supported with search_mode=text; use page.")
+            # Best full-text matches first
+            find = products_collection.find(query, {**projection, "score": {"$meta": "textScore"}})
+            find = find.sort([("score", {"$meta": "textScore"})]).skip(limit * (page - 1))
+        elif cursor:
+            try:
+                position = decode_cursor(cursor, sort)
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            find = products_collection.find({"$and": [query, keyset_filter(sort, position)]}, projection).sort(sort_spec(sort))
+        else:
+            find = products_collection.find(query, projection).sort(sort_spec(sort)).skip(limit * (page - 1))
+
+        async def fetch_page() -> List[Dict]:
+            with registry.timer("db.products.find").time():
+                return [document async for document in find.limit(limit + 1)]
+
+        # The page and the count are independent queries, so run them together
+        documents, total_count = await asyncio.gather(fetch_page(), count_products(query, count))
+
+        has_more = len(documents) > limit
+        documents = documents[:limit]
+        next_cursor = None
+        if has_more and "$text" not in query:
+            next_cursor = encode_cursor(sort, documents[-1])
+        for document in documents:
+            document["_id"] = str(document["_id"])  # Convert ObjectId to string
 
         return {
-            "page": page,
+            "page": None if cursor else page,
             "limit": limit,
-            "total_pages": (total_count + limit - 1) // limit,
+            "total_pages": None if total_count is None else (total_count + limit - 1) // limit,
             "total_products": total_count,
-            "products": results
+            "count_is_estimate": count == "estimate",
+            "next_cursor": next_cursor,
+            "products": documents
         }
+    except HTTPException as he:
+        raise he
     except Exception as e:
-        print(f"Error in /get_products endpoint: {e}")
+        logger.exception("Error in /get_products endpoint: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error.")
 
+@app.get("/facets")
+async def get_facets(
+    facets: Optional[str] = None,  # Comma-separated facet names; default is every facet
+    limit: int = 20,  # Values per facet
+    sort: str = "count"  # "count" (most products first) or "value"
+):
+    # Catalogue dashboard numbers from the precomputed summaries: product count, average
+    # health score and highly processed count, in total and per value of each facet
+    names = [name.strip() for name in facets.split(",") if name.strip()] if facets else list(FACETS)
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown facets: {', '.join(unknown)}.")
+    if sort not in FACET_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(FACET_SORTS)}.")
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500.")
+    try:
+        return await facet_summaries.get(names, limit, sort)
+    except Exception as e:
+        logger.exception("Error in /facets endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+@app.post("/facets/rebuild")
+async def rebuild_facets():
+    # Recomputes every summary from the products collection in one aggregation
+    try:
+        count = await facet_summaries.rebuild()
+    except Exception as e:
+        logger.exception("Error in /facets/rebuild endpoint: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+    return {"message": "Facet summaries rebuilt", "summaries": count}
+
+@app.post("/products/rescore")
+async def rescore_products(
+    dry_run: bool = False,  # Report the changes (with a diff of up to diff_limit products) without writing
+    restart: bool = False,  # Start over instead of resuming an unfinished run (dry runs have their own)
+    max_documents: int = 10000,  # Products per call; call again until `done` (the checkpoint carries on)
+    diff_limit: int = 50
+):
+    # Recomputes health_score for stored products from their stored analysis; the bulk
+    # run over a large catalogue is `python rescore.py`
+    if max_documents < 1 or not 0 <= diff_limit <= 1000:
+        raise HTTPException(status_code=400, detail="max_documents must be >= 1 and diff_limit between 0 and 1000.")
+    if rescore_lock.locked():
+        raise HTTPException(status_code=409, detail="A re-scoring run is already in progress.")
+    async with rescore_lock:
+        try:
+            return await rescorer.run(dry_run=dry_run, resume=not restart, max_documents=max_documents, diff_limit=diff_limit)
+        except Exception as e:
+            logger.exception("Error in /products/rescore endpoint: %s", e)
+            raise HTTPException(status_code=500, detail="Internal Server Error.")
+
 # Optional: Serve Static Files (e.g., images)
 # Uncomment and configure if you decide to store images locally
 
@@ -0,0 +1,158 @@
+# consume-wise-backend/metrics.py
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence
+
+# Upper bounds (seconds) of the latency histogram buckets; spans sub-ms parsing to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    def __init__(self, name: str):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Gauge:
+    def __init__(self, name: str):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value: int) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Timer:
+    # Keeps a running count / total / max of observed durations (in seconds), plus a
+    # cumulative-bucket histogram for the Prometheus exposition
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.bucket_counts[index] += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+    def cumulative_counts(self) -> List[int]:
+        with self._lock:
+            counts = list(self.bucket_counts)
+        for index in range(1, len(counts)):
+            counts[index] += counts[index - 1]
+        return counts
+
+
+def prometheus_name(name: str) -> str:
+    # "cache.ocr.hits.local" -> "consume_wise_cache_ocr_hits_local"
+    return "consume_wise_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class Registry:
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._timers: Dict[str, Timer] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter(name)
+            return self._counters[name]
+
+    def gauge(self, name: str) -> Gauge:
+        with self._lock:
+            if name not in self._gauges:
+                self._gauges[name] = Gauge(name)
+            return self._gauges[name]
+
+    def timer(self, name: str) -> Timer:
+        with self._lock:
+            if name not in self._timers:
+                self._timers[name] = Timer(name)
+            return self._timers[name]
+
+    def snapshot(self) -> Dict:
+        return {
+            "counters": {name: c.value for name, c in sorted(self._counters.items())},
+            "gauges": {name: g.value for name, g in sorted(self._gauges.items())},
+            "timers": {name: t.summary() for name, t in sorted(self._timers.items())},
+        }
+
+    def prometheus(self) -> str:
+        # Prometheus text exposition format (version 0.0.4)
+        lines = []
+        for name, counter in sorted(self._counters.items()):
+            metric = prometheus_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {counter.value}"]
+        for name, gauge in sorted(self._gauges.items()):
+            metric = prometheus_name(name)
+            lines += [f"# TYPE {metric} gauge", f"{metric} {gauge.value}"]
+        for name, timer in sorted(self._timers.items()):
+            metric = prometheus_name(name) + "_seconds"
+            counts = timer.cumulative_counts()
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in zip(timer.buckets, counts):
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {count}')
+            lines += [
+                f'{metric}_bucket{{le="+Inf"}} {counts[-1]}',
+                f"{metric}_sum {timer.total:.6f}",
+                f"{metric}_count {counts[-1]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the backend modules
+registry = Registry()
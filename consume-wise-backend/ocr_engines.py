@@ -0,0 +1,181 @@
+# consume-wise-backend/ocr_engines.py
+#
+# OCR engines behind one interface. Every engine returns the same detected-item format,
+#   [{'text': "Sugar, Palm Oil", 'coords': [[x, y], [x, y], [x, y], [x, y]]}, ...]
+# with the four corners clockwise from top-left in the coordinates of the input image.
+# Models are loaded on first use (or by load() from a warmup hook), never on import.
+
+from typing import Dict, List
+
+import numpy as np
+
+# Paddle language codes are the config format; other engines translate them
+TESSERACT_LANGS = {"en": "eng", "fr": "fra", "german": "deu", "hi": "hin"}
+# rapidocr-onnxruntime only bundles the Chinese recognizer, which also reads Latin text
+ONNX_LANGS = ("en", "ch")
+
+
+def _to_item(box, text: str) -> Dict:
+    return {'text': text, 'coords': [[float(x), float(y)] for x, y in box]}
+
+
+class OCREngine:
+    name = ""
+
+    def __init__(self):
+        self._model = None
+
+    def _load_model(self):
+        raise NotImplementedError
+
+    def load(self) -> None:
+        if self._model is None:
+            self._model = self._load_model()
+
+    @property
+    def model(self):
+        self.load()
+        return self._model
+
+    def extract(self, image: np.ndarray) -> List[Dict]:
+        raise NotImplementedError
+
+    def extract_batch(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        return [self.extract(image) for image in images]
+
+
+class PaddleEngine(OCREngine):
+    # PaddleOCR detection + recognition, with the optional 180-degree angle classifier
+    name = "paddle"
+
+    def __init__(self, lang: str = "en", use_gpu: bool = False, use_angle_cls: bool = True):
+        super().__init__()
+        self.options = {"lang": lang, "use_gpu": use_gpu, "use_angle_cls": use_angle_cls, "show_log": False}
+        self.use_angle_cls = use_angle_cls
+
+    def _load_model(self):
+        from paddleocr import PaddleOCR
+        return PaddleOCR(**self.options)
+
+    def extract(self, image: np.ndarray) -> List[Dict]:
+        result = self.model.ocr(image, cls=self.use_angle_cls)
+        detected_items = []
+        for res in result or []:
+            for line in res or []:
+                # line[0] is the bounding box, line[1][0] the text content
+                detected_items.append(_to_item(line[0], line[1][0]))
+        return detected_items
+
+    def extract_batch(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        # Detection still runs per image (each has its own size), but the text crops of
+        # every image are recognised together so the recognizer sees full batches.
+        ocr = self.model
+        try:
+            from tools.infer.predict_system import sorted_boxes
+            from tools.infer.utility import get_rotate_crop_image
+            detector = ocr.text_detector
+            recognizer = ocr.text_recognizer
+        except (ImportError, AttributeError):
+            # PaddleOCR build without the predictor internals: fall back to one call per image
+            return super().extract_batch(images)
+
+        all_boxes = []
+        all_crops = []
+        for image in images:
+            dt_boxes, _ = detector(image)
+            boxes = sorted_boxes(dt_boxes) if dt_boxes is not None and len(dt_boxes) else []
+            all_boxes.append(boxes)
+            all_crops.extend(get_rotate_crop_image(image, np.array(box, np.float32)) for box in boxes)
+
+        if all_crops and self.use_angle_cls:
+            all_crops, _, _ = ocr.text_classifier(all_crops)
+        rec_results, _ = recognizer(all_crops) if all_crops else ([], 0)
+
+        # Hand every image back only its own lines
+        results = []
+        offset = 0
+        for boxes in all_boxes:
+            detected_items = []
+            for box, (text, score) in zip(boxes, rec_results[offset:offset + len(boxes)]):
+                if score >= ocr.drop_score:
+                    detected_items.append(_to_item(box, text))
+            offset += len(boxes)
+            results.append(detected_items)
+        return results
+
+
+class TesseractEngine(OCREngine):
+    # Tesseract via pytesseract: no model weights in the process, lowest memory footprint.
+    # Words are grouped back into lines so items match the Paddle line granularity.
+    name = "tesseract"
+
+    def __init__(self, lang: str = "en", psm: int = 6, min_confidence: float = 40):
+        super().__init__()
+        self.lang = TESSERACT_LANGS.get(lang, lang)
+        self.config = f"--psm {psm}"
+        self.min_confidence = min_confidence
+
+    def _load_model(self):
+        import pytesseract
+        pytesseract.get_tesseract_version()  # Fails fast if the binary is missing
+        return pytesseract
+
+    def extract(self, image: np.ndarray) -> List[Dict]:
+        pytesseract = self.model
+        data = pytesseract.image_to_data(
+            image[:, :, ::-1], lang=self.lang, config=self.config, output_type=pytesseract.Output.DICT
+        )
+        lines: Dict[tuple, List[int]] = {}
+        for index, word in enumerate(data["text"]):
+            if word.strip() and float(data["conf"][index]) >= self.min_confidence:
+                key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+                lines.setdefault(key, []).append(index)
+
+        detected_items = []
+        for indices in lines.values():
+            left = min(data["left"][i] for i in indices)
+            top = min(data["top"][i] for i in indices)
+            right = max(data["left"][i] + data["width"][i] for i in indices)
+            bottom = max(data["top"][i] + data["height"][i] for i in indices)
+            text = " ".join(data["text"][i] for i in indices)
+            detected_items.append(_to_item([(left, top), (right, top), (right, bottom), (left, bottom)], text))
+        return detected_items
+
+
+class OnnxEngine(OCREngine):
+    # The PaddleOCR detection/recognition models exported to ONNX and run with onnxruntime
+    # (rapidocr-onnxruntime): same boxes as Paddle without the Paddle framework.
+    name = "onnx"
+
+    def __init__(self, lang: str = "en", use_angle_cls: bool = False):
+        super().__init__()
+        if lang not in ONNX_LANGS:
+            raise ValueError(f"The onnx OCR engine supports lang {' or '.join(ONNX_LANGS)}, not {lang!r}.")
+        self.lang = lang
+        self.use_angle_cls = use_angle_cls
+
+    def _load_model(self):
+        from rapidocr_onnxruntime import RapidOCR
+        return RapidOCR()
+
+    def extract(self, image: np.ndarray) -> List[Dict]:
+        result, _ = self.model(image, use_cls=self.use_angle_cls)
+        # Each result line is [box, text, score]
+        return [_to_item(box, text) for box, text, _ in result or []]
+
+
+# Engine names accepted by OCR_ENGINE
+ENGINES = {
+    "paddle": (PaddleEngine, {"use_angle_cls": True}),
+    "paddle-fast": (PaddleEngine, {"use_angle_cls": False}),
+    "tesseract": (TesseractEngine, {}),
+    "onnx": (OnnxEngine, {}),
+}
+
+
+def create_engine(name: str, **options) -> OCREngine:
+    # Builds the engine without loading its model
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine {name!r}; expected one of {', '.join(ENGINES)}.")
+    engine_class, defaults = ENGINES[name]
+    return engine_class(**{**defaults, **options})
@@ -0,0 +1,249 @@
+# consume-wise-backend/ocr_pool.py
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from metrics import registry
+from ocr_engines import OCREngine, create_engine
+
+logger = logging.getLogger(__name__)
+
+# OCR engine owned by the current worker process, created by the pool initializer.
+# With `preload` its model loads when the worker spawns, before the worker takes a job;
+# otherwise on the first job.
+_worker_engine: Optional[OCREngine] = None
+
+
+def _init_worker(engine_name: str, engine_options: Dict, preload: bool = False) -> None:
+    global _worker_engine
+    _worker_engine = create_engine(engine_name, **engine_options)
+    if preload:
+        try:
+            _worker_engine.load()
+        except Exception as e:
+            # An initializer that raises breaks the whole pool; the first job reports it instead
+            logger.error("Could not load the OCR model: %s", e)
+
+
+def extract_text_with_coords(image: np.ndarray) -> List[Dict]:
+    # Perform OCR on a single image
+    return _worker_engine.extract(image)
+
+
+def extract_text_batch(images: List[np.ndarray]) -> List[List[Dict]]:
+    return _worker_engine.extract_batch(images)
+
+
+def _ready() -> bool:
+    return True
+
+
+def _run_ocr_job(images: List[np.ndarray], submitted_at: float):
+    # Runs inside a pool worker on already decoded (and pre-processed) frames.
+    # Wall-clock timestamps so queue wait can be measured across processes.
+    started_at = time.time()
+    try:
+        if len(images) == 1:
+            results = [extract_text_with_coords(images[0])]
+        else:
+            results = extract_text_batch(images)
+    except Exception as e:
+        logger.error("Error during OCR: %s", e)
+        results = [[] for _ in images]
+    return results, started_at - submitted_at, time.time() - started_at
+
+
+class OCRPoolSaturated(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("OCR pool is saturated.")
+        self.retry_after = retry_after
+
+
+class OCRBatcher:
+    # Collects images from concurrent requests for up to `window_seconds` (or until
+    # `max_batch_size` images are waiting) and runs them through OCR as one batch.
+    def __init__(self, run_batch, window_seconds: float, max_batch_size: int):
+        self.run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: List[tuple] = []  # (image, future, enqueued_at)
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._dispatching: Set[asyncio.Task] = set()  # Strong references until each batch finishes
+        self.window_wait = registry.timer("ocr.batch_window_wait")
+        self.batches = registry.counter("ocr.batches")
+        self.batched_images = registry.counter("ocr.batched_images")
+        registry.gauge("ocr.batch_window_ms").set(int(window_seconds * 1000))
+        registry.gauge("ocr.batch_max_size").set(max_batch_size)
+
+    async def submit(self, image: np.ndarray) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatched)
+
+    def _dispatched(self, task: asyncio.Task) -> None:
+        self._dispatching.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("OCR batch dispatch failed: %s", task.exception(), exc_info=task.exception())
+
+    async def close(self) -> None:
+        # Fails images still waiting for their window and stops the batches in flight
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        for _, future, _ in batch:
+            if not future.done():
+                future.cancel()
+        tasks = list(self._dispatching)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            self.window_wait.observe(now - enqueued_at)
+        self.batches.inc()
+        self.batched_images.inc(len(batch))
+        try:
+            results = await self.run_batch([image for image, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.warning("OCR batch of %d images failed: %s", len(batch), e)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), detected_items in zip(batch, results):
+            # The caller may have gone away while the batch was running
+            if not future.done():
+                future.set_result(detected_items)
+
+
+class OCRPool:
+    # Process pool where every worker holds its own OCR engine (see ocr_engines.py).
+    # At most `workers + max_queue` images are admitted; the rest are rejected immediately.
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        engine: str = "paddle",
+        engine_options: Optional[Dict] = None,
+        retry_after: int = 2,
+        batch_window_seconds: float = 0.0,
+        batch_max_size: int = 1,
+        preload: bool = False,  # Load the model in every worker as it spawns
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.engine = engine
+        self.engine_options = engine_options or {}
+        self.retry_after = retry_after
+        self.preload = preload
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = registry.gauge("ocr.in_flight")
+        self.rejected = registry.counter("ocr.rejected")
+        self.queue_wait = registry.timer("ocr.queue_wait")
+        self.execution = registry.timer("ocr.execution")
+        self.restarts = registry.counter("ocr.pool_restarts")
+        self.batcher = None
+        if batch_window_seconds > 0 and batch_max_size > 1:
+            self.batcher = OCRBatcher(self._run_batch, batch_window_seconds, batch_max_size)
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.engine, self.engine_options, self.preload),
+            )
+
+    async def warmup(self) -> None:
+        # Spawn the workers before the first real request; with `preload` each one answers
+        # the ping only after its initializer loaded the model
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._executor, _ready) for _ in range(self.workers)])
+
+    async def close(self) -> None:
+        if self.batcher is not None:
+            await self.batcher.close()
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        # Replaces a pool whose worker died (OOM kill, segfault); every batch in flight on
+        # it fails at once, and only the first of them to get here starts the new pool
+        if self._executor is broken:
+            logger.error("OCR worker died; restarting the OCR pool")
+            self.restarts.inc()
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.start()
+
+    async def _run_batch(self, batch: List[np.ndarray]) -> List[List[Dict]]:
+        self.start()
+        loop = asyncio.get_running_loop()
+        # A batch that was in flight when a worker died runs once more on the new pool; if
+        # it breaks that one too (it is probably what killed the worker), it fails
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                results, wait_seconds, exec_seconds = await loop.run_in_executor(
+                    executor, _run_ocr_job, batch, time.time()
+                )
+                break
+            except BrokenProcessPool:
+                self._restart(executor)
+                if attempt == 1:
+                    raise
+        self.queue_wait.observe(max(wait_seconds, 0.0))
+        self.execution.observe(exec_seconds)
+        return results
+
+    async def extract(self, image: np.ndarray) -> List[Dict]:
+        # `image` should already be pre-processed: it is pickled to the worker process
+        if self.in_flight.value >= self.capacity:
+            self.rejected.inc()
+            raise OCRPoolSaturated(self.retry_after)
+        self.in_flight.inc()
+        try:
+            if self.batcher is not None:
+                return await self.batcher.submit(image)
+            return (await self._run_batch([image]))[0]
+        finally:
+            self.in_flight.dec()
@@ -0,0 +1,147 @@
+# consume-wise-backend/preprocess.py
+
+import io
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_SCAN_BYTES = 256 * 1024  # Orientation lives in the file header; never copy the whole upload
+
+
+def read_exif_orientation(image_bytes: bytes) -> int:
+    try:
+        # Only the header is parsed; pixel data is never decoded by PIL
+        header = io.BytesIO(bytes(image_bytes[:EXIF_SCAN_BYTES]))
+        return int(Image.open(header).getexif().get(EXIF_ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def apply_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    # Same transforms as PIL.ImageOps.exif_transpose, done with OpenCV
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.rotate(cv2.transpose(image), cv2.ROTATE_180)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    # Decode to BGR and apply the EXIF orientation explicitly, so every format
+    # (and every stage that decodes the upload) sees the same upright frame.
+    if not image_bytes:
+        raise ValueError("No image data provided.")
+    # Convert bytes to NumPy array
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    # Decode image from NumPy array
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        raise ValueError("Image decoding failed.")
+    return apply_orientation(image, read_exif_orientation(image_bytes))
+
+
+def _text_mask(gray: np.ndarray) -> np.ndarray:
+    # Cheap text-region detector: strong local gradients, joined into line-shaped blobs
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, line_kernel)
+    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+
+def _text_bounding_box(mask: np.ndarray, min_area_ratio: float) -> Tuple[int, int, int, int]:
+    height, width = mask.shape[:2]
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = min_area_ratio * height * width
+    boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_area]
+    if not boxes:
+        return 0, 0, width, height
+    x0 = min(x for x, _, _, _ in boxes)
+    y0 = min(y for _, y, _, _ in boxes)
+    x1 = max(x + w for x, _, w, _ in boxes)
+    y1 = max(y + h for _, y, _, h in boxes)
+    return x0, y0, x1, y1
+
+
+def _skew_angle(mask: np.ndarray) -> float:
+    points = cv2.findNonZero(mask)
+    if points is None or len(points) < 50:
+        return 0.0
+    angle = cv2.minAreaRect(points)[-1]
+    # OpenCV versions disagree on the range minAreaRect reports ((0, 90] or [-90, 0)), and a
+    # rectangle's angle is only defined modulo 90 anyway; fold into [-45, 45)
+    return ((angle + 45) % 90) - 45
+
+
+def preprocess(
+    image: np.ndarray,
+    max_long_edge: int = 1600,
+    crop_to_text: bool = True,
+    crop_margin: int = 16,
+    min_crop_gain: float = 0.1,
+    min_region_area_ratio: float = 0.0005,
+    deskew: bool = True,
+    max_deskew_degrees: float = 15.0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns the image to OCR and the 3x3 matrix mapping original -> processed coordinates
+    transform = np.eye(3)
+
+    # 1. Downscale so the long edge is at most max_long_edge
+    height, width = image.shape[:2]
+    scale = min(1.0, max_long_edge / float(max(height, width))) if max_long_edge else 1.0
+    if scale < 1.0:
+        image = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        transform = np.diag([scale, scale, 1.0]) @ transform
+
+    if not (crop_to_text or deskew):
+        return image, transform
+
+    height, width = image.shape[:2]
+    mask = _text_mask(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+
+    # 2. Crop to the label area when it removes a meaningful share of the frame
+    if crop_to_text:
+        x0, y0, x1, y1 = _text_bounding_box(mask, min_region_area_ratio)
+        x0, y0 = max(x0 - crop_margin, 0), max(y0 - crop_margin, 0)
+        x1, y1 = min(x1 + crop_margin, width), min(y1 + crop_margin, height)
+        if (x1 - x0) * (y1 - y0) <= (1 - min_crop_gain) * width * height:
+            image = image[y0:y1, x0:x1]
+            mask = mask[y0:y1, x0:x1]
+            transform = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=float) @ transform
+
+    # 3. Straighten small rotations of the whole text block
+    if deskew:
+        angle = _skew_angle(mask)
+        if 0.5 <= abs(angle) <= max_deskew_degrees:
+            height, width = image.shape[:2]
+            rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+            image = cv2.warpAffine(image, rotation, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            transform = np.vstack([rotation, [0, 0, 1]]) @ transform
+
+    return image, transform
+
+
+def map_items_back(detected_items: List[Dict], transform: np.ndarray) -> List[Dict]:
+    # Convert box coordinates from the processed frame back to the original image
+    if np.allclose(transform, np.eye(3)):
+        return detected_items
+    inverse = np.linalg.inv(transform)
+    for item in detected_items:
+        points = np.hstack([np.asarray(item['coords'], dtype=float), np.ones((len(item['coords']), 1))])
+        original = points @ inverse.T
+        item['coords'] = [[float(x), float(y)] for x, y in original[:, :2]]
+    return detected_items
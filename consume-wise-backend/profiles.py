@@ -0,0 +1,95 @@
+# consume-wise-backend/profiles.py
+#
+# Analysis profiles: which sections of the analysis one LLM call asks for. Output length
+# dominates generation time, so callers that only need the health score ask for the
+# sections it reads, and the expensive ones (recipes, regulation, sustainability) are
+# fetched in a follow-up call only when a client asks for them.
+
+import hashlib
+from typing import Dict, List, Optional
+
+from structured_output import ANALYSIS_RESPONSE_SCHEMA
+
+# Section -> (compact shape shown to the model, output token budget)
+SECTIONS = {
+    "NutritionalAnalysis": (
+        "{serving_size, Macronutrients: {Carbohydrates, Proteins, Fats: {Good[], Bad[]}, Fiber: {Good[]}}, "
+        "Micronutrients: {Vitamins, Minerals: {Good[], Deficient[]}}, HealthRisks[], HealthBenefits[]}",
+        1536,
+    ),
+    "ProcessingLevel": ("{Description, Level: Low|Medium|High, Good[], Bad[]}", 384),
+    "HarmfulIngredients": ("[{Ingredient: exact name as on the label, Reason}]", 512),
+    "DietCompliance": ("{CompliantDiets[], NonCompliantDiets[], Reasons}", 384),
+    "DiabetesAllergenFriendly": ("{IsSuitable: bool, Reasons, Allergens[]}", 256),
+    "SustainabilityAndEthics": ("{Sustainability, EthicalConcerns}", 512),
+    "RecommendedAlternatives": ("[healthier or more sustainable alternatives]", 384),
+    "RegulatoryCompliance": ("{FSSAI, FDA, EFSA: \"true\"|\"false\", OtherRegions}", 512),
+    "MisleadingClaims": ("[{Claim, Reason}]", 384),
+    "AlternativeHomeMadeProcedure": ("{Ingredients[] with measurements, Steps[]}", 2048),
+}
+ALL_SECTIONS = list(SECTIONS)
+
+# Everything calculate_health_score, generate_overall_review and highlight_image read
+SCORE_SECTIONS = ["NutritionalAnalysis", "ProcessingLevel", "HarmfulIngredients", "DietCompliance"]
+
+PROFILES = {
+    "score": SCORE_SECTIONS,
+    "product": SCORE_SECTIONS + ["MisleadingClaims"],  # What /add_product stores
+    "standard": SCORE_SECTIONS + ["MisleadingClaims", "DiabetesAllergenFriendly", "RecommendedAlternatives"],
+    "full": ALL_SECTIONS,
+}
+# Canonical section order, so equal section sets share cache keys and metric labels
+PROFILES = {name: [section for section in ALL_SECTIONS if section in sections] for name, sections in PROFILES.items()}
+
+MAX_OUTPUT_TOKENS = 8192
+
+
+def resolve_sections(profile: Optional[str] = None, names: Optional[str] = None) -> List[str]:
+    # A comma-separated section list wins over a profile; result is in canonical order
+    if names:
+        requested = {name.strip() for name in names.split(",") if name.strip()}
+        if not requested:
+            raise ValueError("sections must name at least one section.")
+        unknown = requested - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}.")
+    else:
+        if profile not in PROFILES:
+            raise ValueError(f"profile must be one of {', '.join(PROFILES)}.")
+        requested = set(PROFILES[profile])
+    return [name for name in ALL_SECTIONS if name in requested]
+
+
+def profile_label(sections: List[str]) -> str:
+    # Metric label: the profile name when the sections match one, otherwise "custom"
+    for name, profile_sections in PROFILES.items():
+        if sections == profile_sections:
+            return name
+    return "custom"
+
+
+def sections_variant(sections: List[str]) -> str:
+    # Cache key suffix; empty for the full analysis so existing cache entries stay valid
+    if sections == ALL_SECTIONS:
+        return ""
+    return hashlib.sha256(",".join(sections).encode("utf-8")).hexdigest()[:12]
+
+
+def max_output_tokens(sections: List[str]) -> int:
+    return min(sum(SECTIONS[name][1] for name in sections), MAX_OUTPUT_TOKENS)
+
+
+def response_schema(sections: List[str]) -> Dict:
+    properties = ANALYSIS_RESPONSE_SCHEMA["properties"]
+    return {"type": "OBJECT", "properties": {name: properties[name] for name in sections}, "required": list(sections)}
+
+
+def build_prompt(extracted_text: str, sections: List[str]) -> str:
+    shapes = "\n".join(f"- {name}: {SECTIONS[name][0]}" for name in sections)
+    return (
+        "You are a nutrition expert. Analyze this text extracted from a food label:\n\n"
+        f"{extracted_text}\n\n"
+        "Reply with one JSON object with exactly these keys (X[] is a list of short strings, "
+        "\"item - reason\" where a reason applies):\n"
+        f"{shapes}\n"
+    )
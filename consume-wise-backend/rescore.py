@@ -0,0 +1,241 @@
+# consume-wise-backend/rescore.py
+#
+# Recomputes the stored health_score of every product after the weights in scoring.py
+# change. Products are streamed in _id order, each batch is scored at once from the stored
+# analyses (one feature row per product, NumPy over the batch) and only products whose
+# score or review changed are written back, with one bulk update per batch. Writing a batch
+# overlaps with reading the next one. A checkpoint after every written batch lets an
+# interrupted run resume where it stopped; a dry run writes no products and reports a
+# diff, and keeps a checkpoint of its own so a catalogue can be dry-run in slices.
+#
+#   python rescore.py --dry-run
+#   python rescore.py [--batch-size 1000] [--restart]
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+
+from facets import SUMMARY_FIELDS
+from metrics import registry
+from scoring import feature_array, generate_overall_review, health_scores
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ID = "health_score"
+DRY_RUN_CHECKPOINT_ID = "health_score:dry_run"
+
+# What scoring reads from a product, plus the fields its facet summaries are keyed on
+ANALYSIS_FIELDS = (
+    "analysis.NutritionalAnalysis.Macronutrients", "analysis.HarmfulIngredients",
+    "analysis.ProcessingLevel", "analysis.DietCompliance",
+)
+PROJECTION = {
+    field: 1
+    for field in ANALYSIS_FIELDS + ("health_score", "product_name")
+    + tuple(field for field in SUMMARY_FIELDS if not field.startswith(("analysis.", "health_score.")))
+}
+
+
+def stored_score(document: Dict) -> int:
+    score = (document.get("health_score") or {}).get("score")
+    return score if isinstance(score, int) else -1
+
+
+class Rescorer:
+    def __init__(self, products_collection, checkpoints_collection, facets=None, batch_size: int = 1000):
+        self.products = products_collection
+        self.checkpoints = checkpoints_collection
+        self.facets = facets  # FacetSummaries kept in step with the new scores
+        self.batch_size = batch_size
+        self.scanned = registry.counter("rescore.scanned")
+        self.updated = registry.counter("rescore.updated")
+        self.batch_timer = registry.timer("rescore.batch")
+        self.write_timer = registry.timer("rescore.write")
+
+    async def run(
+        self,
+        dry_run: bool = False,
+        resume: bool = True,
+        max_documents: Optional[int] = None,
+        diff_limit: int = 50,
+    ) -> Dict:
+        # One pass over the catalogue (or the next max_documents products of it). A dry run
+        # leaves products and the real run's checkpoint untouched: it resumes from its own
+        # checkpoint, saved at the end of the call, whose "updated" counts would-be updates.
+        checkpoint_id = DRY_RUN_CHECKPOINT_ID if dry_run else CHECKPOINT_ID
+        checkpoint = None
+        if resume:
+            checkpoint = await self.checkpoints.find_one({"_id": checkpoint_id})
+            if checkpoint is not None and checkpoint.get("completed"):
+                checkpoint = None
+        if checkpoint is None:
+            now = datetime.utcnow()
+            checkpoint = {"_id": checkpoint_id, "last_id": None, "scanned": 0, "updated": 0, "completed": False,
+                          "started_at": now, "updated_at": now}
+            await self.checkpoints.replace_one({"_id": checkpoint_id}, checkpoint, upsert=True)
+        last_id = checkpoint["last_id"]
+
+        report = {
+            "dry_run": dry_run,
+            "resumed_after": str(last_id) if last_id is not None else None,
+            "scanned": 0,
+            "changed": 0,
+            "score_up": 0,
+            "score_down": 0,
+            "review_only": 0,
+        }
+        diff: List[Dict] = []
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        cursor = self.products.find(query, PROJECTION).sort("_id", ASCENDING).batch_size(self.batch_size)
+        if max_documents:
+            cursor = cursor.limit(max_documents)
+
+        start = time.perf_counter()
+        pending: Optional[asyncio.Task] = None
+        batch = []
+        last_read = None
+        try:
+            async for document in cursor:
+                batch.append(document)
+                last_read = document["_id"]
+                if len(batch) >= self.batch_size:
+                    pending = await self._process(batch, report, diff, diff_limit, dry_run, pending, start)
+                    batch = []
+            if batch:
+                pending = await self._process(batch, report, diff, diff_limit, dry_run, pending, start)
+        finally:
+            if pending is not None:
+                await pending
+        seconds = time.perf_counter() - start
+
+        done = not max_documents or report["scanned"] < max_documents
+        if not done:
+            # Exactly max_documents were read; finished if nothing follows the last of them
+            done = await self.products.find_one({"_id": {"$gt": last_read}}, {"_id": 1}) is None
+        if dry_run:
+            await self.checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {
+                    "$set": {"last_id": last_read if last_read is not None else last_id, "completed": done,
+                             "updated_at": datetime.utcnow()},
+                    "$inc": {"scanned": report["scanned"], "updated": report["changed"]},
+                },
+            )
+        else:
+            await self.checkpoints.update_one({"_id": checkpoint_id}, {"$set": {"completed": done}})
+
+        report.update({
+            "done": done,
+            "seconds": round(seconds, 3),
+            "documents_per_second": round(report["scanned"] / seconds, 1) if seconds > 0 else None,
+        })
+        if dry_run:
+            report["diff"] = diff
+        return report
+
+    async def _process(
+        self,
+        batch: List[Dict],
+        report: Dict,
+        diff: List[Dict],
+        diff_limit: int,
+        dry_run: bool,
+        pending: Optional[asyncio.Task],
+        start: float,
+    ) -> Optional[asyncio.Task]:
+        with self.batch_timer.time():
+            analyses = [document.get("analysis") or {} for document in batch]
+            scores = health_scores(feature_array(analyses))
+            old_scores = np.array([stored_score(document) for document in batch])
+            reviews = [generate_overall_review(analysis, int(score)) for analysis, score in zip(analyses, scores)]
+            review_changed = np.array([
+                review != (document.get("health_score") or {}).get("review") for document, review in zip(batch, reviews)
+            ])
+            changed = np.flatnonzero((scores != old_scores) | review_changed)
+
+        report["scanned"] += len(batch)
+        report["changed"] += len(changed)
+        report["score_up"] += int(np.count_nonzero(scores > old_scores))
+        report["score_down"] += int(np.count_nonzero(scores < old_scores))
+        report["review_only"] += int(np.count_nonzero(review_changed & (scores == old_scores)))
+        self.scanned.inc(len(batch))
+
+        if dry_run:
+            for position in changed[:max(0, diff_limit - len(diff))]:
+                document = batch[position]
+                diff.append({
+                    "product_id": str(document["_id"]),
+                    "product_name": document.get("product_name"),
+                    "old_score": int(old_scores[position]) if old_scores[position] >= 0 else None,
+                    "new_score": int(scores[position]),
+                    "old_review": (document.get("health_score") or {}).get("review"),
+                    "new_review": reviews[position],
+                })
+        else:
+            # Only one write is in flight, so checkpoints advance in order
+            if pending is not None:
+                await pending
+            rescored = [
+                {**batch[position], "health_score": {"score": int(scores[position]), "review": reviews[position]}}
+                for position in changed
+            ]
+            replaced = [batch[position] for position in changed]
+            pending = asyncio.create_task(self._write(rescored, replaced, batch[-1]["_id"], len(batch)))
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "Rescored %d products, %d changed (%.0f products/s)",
+            report["scanned"], report["changed"], report["scanned"] / elapsed if elapsed > 0 else 0,
+        )
+        return pending
+
+    async def _write(self, rescored: List[Dict], replaced: List[Dict], last_id, scanned: int) -> None:
+        if rescored:
+            operations = [
+                UpdateOne({"_id": document["_id"]}, {"$set": {"health_score": document["health_score"]}})
+                for document in rescored
+            ]
+            with self.write_timer.time():
+                await self.products.bulk_write(operations, ordered=False)
+            self.updated.inc(len(rescored))
+            if self.facets is not None:
+                await self.facets.record(added=rescored, removed=replaced)
+        await self.checkpoints.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}, "$inc": {"scanned": scanned, "updated": len(rescored)}},
+        )
+
+
+if __name__ == "__main__":
+    import os
+    import json
+    import argparse
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from facets import FacetSummaries
+
+    parser = argparse.ArgumentParser(description="Recompute stored product health scores")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an unfinished (dry) run")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-documents", type=int, default=None)
+    parser.add_argument("--diff-limit", type=int, default=50, help="Products listed in a dry-run diff")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def main():
+        db = AsyncIOMotorClient(os.environ["MONGODB_URI"])["consume_wise_db"]
+        rescorer = Rescorer(
+            db["products"], db["rescore_checkpoints"], FacetSummaries(db["product_facets"], db["products"]), args.batch_size
+        )
+        return await rescorer.run(args.dry_run, not args.restart, args.max_documents, args.diff_limit)
+
+    print(json.dumps(asyncio.run(main()), indent=2, default=str))
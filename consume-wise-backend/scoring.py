@@ -0,0 +1,121 @@
+# consume-wise-backend/scoring.py
+#
+# Health score and review of an analysis. A score is 100 minus weighted penalties on four
+# features of the analysis; calculate_health_score scores one analysis at request time and
+# health_scores scores a whole (N, 4) feature array at once for the catalogue re-scoring
+# in rescore.py. Both read the weights below, so changing a weight changes both.
+
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+SCORE_START = 100
+BAD_NUTRIENT_PENALTY = 5  # Per bad macronutrient note
+HARMFUL_INGREDIENT_PENALTY = 10  # Per harmful ingredient
+NON_COMPLIANT_DIET_PENALTY = 5  # Per non-compliant diet
+# Processing level code -> penalty; codes index PROCESSING_LEVELS
+PROCESSING_LEVELS = ("unknown", "low", "medium", "high")
+PROCESSING_PENALTIES = (0, 0, 5, 15)
+
+# Review wording thresholds
+HEALTHY_SCORE = 80
+MODERATE_SCORE = 50
+
+MACRONUTRIENTS = ("Carbohydrates", "Proteins", "Fats", "Fiber")
+# Columns of a feature array
+FEATURES = ("bad_nutrients", "harmful_ingredients", "processing_level", "non_compliant_diets")
+
+
+def _section(analysis: Dict, name: str) -> Dict:
+    section = analysis.get(name)
+    return section if isinstance(section, dict) else {}
+
+
+def _count(value) -> int:
+    return len(value) if isinstance(value, list) else 0
+
+
+def processing_level(analysis: Dict) -> str:
+    level = _section(analysis, "ProcessingLevel").get("Level")
+    return level.lower() if isinstance(level, str) else "unknown"
+
+
+def analysis_features(analysis: Dict) -> Tuple[int, int, int, int]:
+    # One row of a feature array (see FEATURES)
+    macronutrients = _section(_section(analysis, "NutritionalAnalysis"), "Macronutrients")
+    bad_nutrients = sum(
+        _count(macronutrients[nutrient].get("Bad"))
+        for nutrient in MACRONUTRIENTS
+        if isinstance(macronutrients.get(nutrient), dict)
+    )
+    level = processing_level(analysis)
+    return (
+        bad_nutrients,
+        _count(analysis.get("HarmfulIngredients")),
+        PROCESSING_LEVELS.index(level) if level in PROCESSING_LEVELS else 0,
+        _count(_section(analysis, "DietCompliance").get("NonCompliantDiets")),
+    )
+
+
+def feature_array(analyses: Iterable[Dict]) -> np.ndarray:
+    return np.array([analysis_features(analysis) for analysis in analyses], dtype=np.int32).reshape(-1, len(FEATURES))
+
+
+def health_scores(features: np.ndarray) -> np.ndarray:
+    # Scores of every row of an (N, 4) feature array
+    penalties = (
+        features[:, 0] * BAD_NUTRIENT_PENALTY
+        + features[:, 1] * HARMFUL_INGREDIENT_PENALTY
+        + np.asarray(PROCESSING_PENALTIES, dtype=np.int32)[features[:, 2]]
+        + features[:, 3] * NON_COMPLIANT_DIET_PENALTY
+    )
+    # The score doesn't go below 0
+    return np.maximum(SCORE_START - penalties, 0)
+
+
+def calculate_health_score(analysis: Dict) -> int:
+    bad_nutrients, harmful, level, non_compliant = analysis_features(analysis)
+    health_score = SCORE_START
+    health_score -= bad_nutrients * BAD_NUTRIENT_PENALTY
+    health_score -= harmful * HARMFUL_INGREDIENT_PENALTY
+    health_score -= PROCESSING_PENALTIES[level]
+    health_score -= non_compliant * NON_COMPLIANT_DIET_PENALTY
+    return max(health_score, 0)
+
+
+def generate_overall_review(analysis: Dict, health_score: int) -> str:
+    review = []
+
+    # Review based on health score
+    if health_score > HEALTHY_SCORE:
+        review.append("This product is generally healthy and well-balanced.")
+    elif health_score > MODERATE_SCORE:
+        review.append("This product is moderately healthy but has some areas of concern.")
+    else:
+        review.append("This product is not healthy and contains many harmful ingredients or nutrients.")
+
+    # Review based on processing level
+    level = processing_level(analysis)
+    if level == "high":
+        review.append("It is highly processed, which can negatively impact health.")
+    elif level == "medium":
+        review.append("It is moderately processed.")
+    elif level == "low":
+        review.append("It is minimally processed.")
+
+    # Review based on harmful ingredients
+    if analysis.get("HarmfulIngredients"):
+        review.append("Contains harmful ingredients that could pose health risks.")
+    else:
+        review.append("No harmful ingredients detected.")
+
+    # Review based on diet compliance
+    diets = _section(analysis, "DietCompliance")
+    compliant_diets = diets.get("CompliantDiets") or []
+    non_compliant_diets = diets.get("NonCompliantDiets") or []
+    if compliant_diets:
+        review.append(f"Complies with the following diets: {', '.join(compliant_diets)}.")
+    if non_compliant_diets:
+        review.append(f"Does not comply with the following diets: {', '.join(non_compliant_diets)}.")
+
+    return " ".join(review)
@@ -0,0 +1,71 @@
+# consume-wise-backend/singleflight.py
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    # Coalesces concurrent calls with the same key into one in-flight computation. The
+    # first caller starts it as a task of its own; callers arriving before it finishes
+    # wait on the same task and get the same result or exception. A waiter that goes
+    # away (client disconnect) only stops waiting, unless it was the last one: then
+    # nobody needs the result and the computation is cancelled.
+    #
+    # Results are not kept once the call finishes; the caches in front of this handle that.
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self.calls = registry.counter(f"singleflight.{name}.calls")
+        self.coalesced = registry.counter(f"singleflight.{name}.coalesced")
+        self.cancelled = registry.counter(f"singleflight.{name}.cancelled")
+        self.in_flight = registry.gauge(f"singleflight.{name}.in_flight")
+        # Share of calls that were served by another caller's computation
+        self.dedupe_ratio = registry.gauge(f"singleflight.{name}.dedupe_ratio")
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self.in_flight.inc()
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.coalesced.inc()
+            logger.debug("Joined in-flight %s call %s", self.name, key)
+        self.calls.inc()
+        self.dedupe_ratio.set(round(self.coalesced.value / self.calls.value, 4))
+
+        call.waiters += 1
+        try:
+            # shield: cancelling one waiter must not cancel the shared task
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Later callers with this key start afresh instead of joining a cancelled task
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+                self.cancelled.inc()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        self.in_flight.dec()
+        # Every waiter retrieves the exception itself; this only avoids "never retrieved"
+        # warnings for tasks whose waiters all left
+        if not call.task.cancelled():
+            call.task.exception()
@@ -0,0 +1,82 @@
+# consume-wise-backend/streaming.py
+
+import json
+from typing import Dict, List, Set, Tuple
+
+
+class SectionParser:
+    # Incrementally scans streamed model output for the top-level JSON object and
+    # returns each `"Section": value` member as soon as its value is complete, e.g.
+    # NutritionalAnalysis arrives long before AlternativeHomeMadeProcedure is generated.
+    # Text before the opening brace (code fences, stray prose) is ignored.
+    def __init__(self):
+        self._position = 0          # Number of characters of the stream already scanned
+        self._text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = None   # Offset in _text where the current member begins
+        self.finished = False
+        self.emitted: Set[str] = set()
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        if self.finished or not chunk:
+            return []
+        self._text += chunk
+        sections = []
+        text = self._text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    if char != "{":
+                        self._depth = 0
+                        continue
+                    self._member_start = index + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    sections.extend(self._close_member(text, index))
+                    self.finished = True
+                    break
+                if self._depth > 0:
+                    self._depth -= 1
+            elif char == "," and self._depth == 1:
+                sections.extend(self._close_member(text, index))
+                self._member_start = index + 1
+        self._position = len(text)
+        if self._member_start is not None:
+            # Drop everything already emitted so the buffer only holds the open member
+            self._text = text[self._member_start:]
+            self._position -= self._member_start
+            self._member_start = 0
+        return sections
+
+    def _close_member(self, text: str, end: int) -> List[Tuple[str, object]]:
+        member = text[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            parsed: Dict = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            # Malformed member: leave it for the full parse at the end of the stream
+            return []
+        self.emitted.update(parsed.keys())
+        return list(parsed.items())
+
+
+def format_event(event: Dict, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
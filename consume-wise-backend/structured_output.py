@@ -0,0 +1,388 @@
+# consume-wise-backend/structured_output.py
+#
+# Structured analysis output: the response schema sent to Gemini in JSON mode, tolerant
+# parsing of whatever text comes back (clean JSON, fenced or wrapped in prose, truncated
+# at the token limit), and validation into typed models so the scoring and highlighting
+# code always sees the same shape.
+
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, validator
+
+try:
+    import orjson
+
+    def loads(data: str) -> Any:
+        return orjson.loads(data)
+except ImportError:  # pragma: no cover - orjson is optional
+    loads = json.loads
+
+# Parse outcomes, counted as analysis.parse.<outcome>
+CLEAN = "clean"          # The whole response was one JSON object
+EXTRACTED = "extracted"  # Object found inside code fences or surrounding prose
+REPAIRED = "repaired"    # Truncated or slightly malformed output that was fixed up
+FAILED = "failed"
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+CLOSERS = {"{": "}", "[": "]"}
+
+
+def _as_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return "; ".join(_as_text(item) for item in value)
+    if isinstance(value, dict):
+        return ", ".join(_as_text(item) for item in value.values())
+    return str(value)
+
+
+def _as_text_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [_as_text(item) for item in value if item not in (None, "")]
+
+
+# Validator bodies shared by the models below
+def _text(cls, v):
+    return _as_text(v)
+
+
+def _text_list(cls, v):
+    return _as_text_list(v)
+
+
+def _section(cls, v):
+    # A null section means "nothing to report"; the field defaults apply
+    return {} if v is None else v
+
+
+class Section(BaseModel):
+    # Models accept the common ways the LLM deviates from the prompt (a string instead of
+    # a list, null instead of an empty list, booleans as text) and keep unknown keys
+    class Config:
+        extra = "allow"
+
+
+class GoodBad(Section):
+    Good: List[str] = Field(default_factory=list)
+    Bad: List[str] = Field(default_factory=list)
+
+    _lists = validator("Good", "Bad", pre=True, allow_reuse=True)(_text_list)
+
+
+class GoodDeficient(Section):
+    Good: List[str] = Field(default_factory=list)
+    Deficient: List[str] = Field(default_factory=list)
+
+    _lists = validator("Good", "Deficient", pre=True, allow_reuse=True)(_text_list)
+
+
+class MacronutrientsSection(Section):
+    Carbohydrates: GoodBad = Field(default_factory=GoodBad)
+    Proteins: GoodBad = Field(default_factory=GoodBad)
+    Fats: GoodBad = Field(default_factory=GoodBad)
+    Fiber: GoodBad = Field(default_factory=GoodBad)
+
+    _sections = validator("Carbohydrates", "Proteins", "Fats", "Fiber", pre=True, allow_reuse=True)(_section)
+
+
+class MicronutrientsSection(Section):
+    Vitamins: GoodDeficient = Field(default_factory=GoodDeficient)
+    Minerals: GoodDeficient = Field(default_factory=GoodDeficient)
+
+    _sections = validator("Vitamins", "Minerals", pre=True, allow_reuse=True)(_section)
+
+
+class NutritionalAnalysisSection(Section):
+    serving_size: Optional[str] = None
+    Macronutrients: MacronutrientsSection = Field(default_factory=MacronutrientsSection)
+    Micronutrients: MicronutrientsSection = Field(default_factory=MicronutrientsSection)
+    HealthRisks: List[str] = Field(default_factory=list)
+    HealthBenefits: List[str] = Field(default_factory=list)
+
+    _sections = validator("Macronutrients", "Micronutrients", pre=True, allow_reuse=True)(_section)
+    _lists = validator("HealthRisks", "HealthBenefits", pre=True, allow_reuse=True)(_text_list)
+
+    @validator("serving_size", pre=True)
+    def serving_size_text(cls, v):
+        return None if v is None else _as_text(v)
+
+
+class ProcessingLevelSection(Section):
+    Description: str = ""
+    Level: str = "Unknown"
+    Good: List[str] = Field(default_factory=list)
+    Bad: List[str] = Field(default_factory=list)
+
+    _texts = validator("Description", "Level", pre=True, allow_reuse=True)(_text)
+    _lists = validator("Good", "Bad", pre=True, allow_reuse=True)(_text_list)
+
+
+class HarmfulIngredient(Section):
+    Ingredient: str
+    Reason: str = ""
+
+    _texts = validator("Ingredient", "Reason", pre=True, allow_reuse=True)(_text)
+
+
+class MisleadingClaim(Section):
+    Claim: str
+    Reason: str = ""
+
+    _texts = validator("Claim", "Reason", pre=True, allow_reuse=True)(_text)
+
+
+class DietComplianceSection(Section):
+    CompliantDiets: List[str] = Field(default_factory=list)
+    NonCompliantDiets: List[str] = Field(default_factory=list)
+    Reasons: str = ""
+
+    _lists = validator("CompliantDiets", "NonCompliantDiets", pre=True, allow_reuse=True)(_text_list)
+    _texts = validator("Reasons", pre=True, allow_reuse=True)(_text)
+
+
+class DiabetesAllergenFriendlySection(Section):
+    IsSuitable: Optional[bool] = None
+    Reasons: str = ""
+    Allergens: List[str] = Field(default_factory=list)
+
+    _texts = validator("Reasons", pre=True, allow_reuse=True)(_text)
+    _lists = validator("Allergens", pre=True, allow_reuse=True)(_text_list)
+
+    @validator("IsSuitable", pre=True)
+    def suitable_flag(cls, v):
+        if isinstance(v, str):
+            return {"true": True, "yes": True, "false": False, "no": False}.get(v.strip().lower())
+        return v
+
+
+class SustainabilityAndEthicsSection(Section):
+    Sustainability: str = ""
+    EthicalConcerns: str = ""
+
+    _texts = validator("Sustainability", "EthicalConcerns", pre=True, allow_reuse=True)(_text)
+
+
+class RegulatoryComplianceSection(Section):
+    FSSAI: str = ""
+    FDA: str = ""
+    EFSA: str = ""
+    OtherRegions: str = ""
+
+    _texts = validator("FSSAI", "FDA", "EFSA", "OtherRegions", pre=True, allow_reuse=True)(_text)
+
+
+class AlternativeHomeMadeProcedureSection(Section):
+    Ingredients: List[str] = Field(default_factory=list)
+    Steps: List[str] = Field(default_factory=list)
+
+    _lists = validator("Ingredients", "Steps", pre=True, allow_reuse=True)(_text_list)
+
+
+def _named_items(key: str):
+    # ["Palm Oil"] -> [{key: "Palm Oil"}]; null -> []
+    def coerce(cls, v):
+        if v is None:
+            return []
+        if not isinstance(v, list):
+            v = [v]
+        return [item if isinstance(item, dict) else {key: _as_text(item)} for item in v]
+    return coerce
+
+
+class Analysis(Section):
+    NutritionalAnalysis: NutritionalAnalysisSection = Field(default_factory=NutritionalAnalysisSection)
+    ProcessingLevel: ProcessingLevelSection = Field(default_factory=ProcessingLevelSection)
+    HarmfulIngredients: List[HarmfulIngredient] = Field(default_factory=list)
+    DietCompliance: DietComplianceSection = Field(default_factory=DietComplianceSection)
+    DiabetesAllergenFriendly: DiabetesAllergenFriendlySection = Field(default_factory=DiabetesAllergenFriendlySection)
+    SustainabilityAndEthics: SustainabilityAndEthicsSection = Field(default_factory=SustainabilityAndEthicsSection)
+    RecommendedAlternatives: List[str] = Field(default_factory=list)
+    RegulatoryCompliance: RegulatoryComplianceSection = Field(default_factory=RegulatoryComplianceSection)
+    MisleadingClaims: List[MisleadingClaim] = Field(default_factory=list)
+    AlternativeHomeMadeProcedure: AlternativeHomeMadeProcedureSection = Field(default_factory=AlternativeHomeMadeProcedureSection)
+
+    _harmful = validator("HarmfulIngredients", pre=True, allow_reuse=True)(_named_items("Ingredient"))
+    _claims = validator("MisleadingClaims", pre=True, allow_reuse=True)(_named_items("Claim"))
+    _lists = validator("RecommendedAlternatives", pre=True, allow_reuse=True)(_text_list)
+
+    _sections = validator(
+        "NutritionalAnalysis", "ProcessingLevel", "DietCompliance", "DiabetesAllergenFriendly",
+        "SustainabilityAndEthics", "RegulatoryCompliance", "AlternativeHomeMadeProcedure",
+        pre=True, allow_reuse=True,
+    )(_section)
+
+
+# Sections that are lists of items; an invalid item is dropped on its own
+LIST_SECTIONS = ("HarmfulIngredients", "MisleadingClaims", "RecommendedAlternatives")
+
+
+def validate_analysis(data: Dict, sections: Optional[List[str]] = None) -> Tuple[Dict, List[str]]:
+    # Returns the analysis in its canonical shape plus what could not be validated, instead
+    # of rejecting the whole response: the names of sections that were reset to empty, and
+    # "Section[i]" for items left out of a list section (one harmful ingredient without a
+    # name does not cost the others). With `sections`, only those sections are returned
+    # (the ones the call asked for).
+    include = set(sections) if sections else None
+    try:
+        return Analysis.parse_obj(data).dict(include=include), []
+    except ValidationError:
+        pass
+    valid, dropped = {}, []
+    for key, value in data.items():
+        try:
+            Analysis.parse_obj({key: value})
+            valid[key] = value
+            continue
+        except ValidationError:
+            pass
+        if key not in LIST_SECTIONS or not isinstance(value, list):
+            dropped.append(key)
+            continue
+        valid[key] = []
+        for position, item in enumerate(value):
+            try:
+                Analysis.parse_obj({key: [item]})
+                valid[key].append(item)
+            except ValidationError:
+                dropped.append(f"{key}[{position}]")
+    return Analysis.parse_obj(valid).dict(include=include), dropped
+
+
+# Gemini response schema (OpenAPI subset) mirroring the Analysis model
+def _string() -> Dict:
+    return {"type": "STRING"}
+
+
+def _strings() -> Dict:
+    return {"type": "ARRAY", "items": _string()}
+
+
+def _object(**properties: Dict) -> Dict:
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+
+def _good_bad() -> Dict:
+    return _object(Good=_strings(), Bad=_strings())
+
+
+def _good_deficient() -> Dict:
+    return _object(Good=_strings(), Deficient=_strings())
+
+
+ANALYSIS_RESPONSE_SCHEMA = _object(
+    NutritionalAnalysis=_object(
+        serving_size=_string(),
+        Macronutrients=_object(Carbohydrates=_good_bad(), Proteins=_good_bad(), Fats=_good_bad(), Fiber=_good_bad()),
+        Micronutrients=_object(Vitamins=_good_deficient(), Minerals=_good_deficient()),
+        HealthRisks=_strings(),
+        HealthBenefits=_strings(),
+    ),
+    ProcessingLevel=_object(
+        Description=_string(),
+        Level={"type": "STRING", "enum": ["Low", "Medium", "High"]},
+        Good=_strings(),
+        Bad=_strings(),
+    ),
+    HarmfulIngredients={"type": "ARRAY", "items": _object(Ingredient=_string(), Reason=_string())},
+    DietCompliance=_object(CompliantDiets=_strings(), NonCompliantDiets=_strings(), Reasons=_string()),
+    DiabetesAllergenFriendly=_object(IsSuitable={"type": "BOOLEAN"}, Reasons=_string(), Allergens=_strings()),
+    SustainabilityAndEthics=_object(Sustainability=_string(), EthicalConcerns=_string()),
+    RecommendedAlternatives=_strings(),
+    RegulatoryCompliance=_object(FSSAI=_string(), FDA=_string(), EFSA=_string(), OtherRegions=_string()),
+    MisleadingClaims={"type": "ARRAY", "items": _object(Claim=_string(), Reason=_string())},
+    AlternativeHomeMadeProcedure=_object(Ingredients=_strings(), Steps=_strings()),
+)
+
+
+def _scan(text: str, start: int):
+    # Walks the object that opens at `start`. Returns (end, stack, in_string, cut_points):
+    # `end` is the index just past the matching close brace (None if the text stops first),
+    # `stack` the containers still open at the end of the text, `in_string` whether the text
+    # stops inside a string, and `cut_points` (index, open containers) for every comma,
+    # i.e. places where the text can be cut right after a complete value.
+    stack: List[str] = []
+    cut_points: List[Tuple[int, str]] = []
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return index + 1, [], False, cut_points
+        elif char == ",":
+            cut_points.append((index, "".join(stack)))
+    return None, stack, in_string, cut_points
+
+
+def _close(fragment: str, stack: str) -> str:
+    return fragment + "".join(CLOSERS[opener] for opener in reversed(stack))
+
+
+def _try_loads(text: str) -> Tuple[Optional[Dict], bool]:
+    # Returns (object or None, whether trailing commas had to be removed)
+    for candidate, fixed in ((text, False), (TRAILING_COMMA_PATTERN.sub(r"\1", text), True)):
+        try:
+            value = loads(candidate)
+        except ValueError:
+            continue
+        return (value, fixed) if isinstance(value, dict) else (None, False)
+    return None, False
+
+
+def parse_json_object(text: str, max_repair_attempts: int = 50) -> Tuple[Optional[Dict], str]:
+    # Returns (object or None, outcome)
+    text = text.strip()
+    try:
+        value = loads(text)
+        if isinstance(value, dict):
+            return value, CLEAN
+    except ValueError:
+        pass
+
+    fenced = FENCE_PATTERN.search(text)
+    if fenced and "{" in fenced.group(1):
+        text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        return None, FAILED
+
+    end, stack, in_string, cut_points = _scan(text, start)
+    if end is not None:
+        value, fixed = _try_loads(text[start:end])
+        if value is None:
+            return None, FAILED
+        return value, REPAIRED if fixed else EXTRACTED
+
+    # Truncated output: close an unterminated string and the open containers; if that is
+    # not valid (the text stopped inside a key, or after a colon), back off to the last
+    # commas, which always follow a complete value
+    fragment = text[start:] + '"' if in_string else text[start:].rstrip().rstrip(",:")
+    value, _ = _try_loads(_close(fragment, "".join(stack)))
+    if value is not None:
+        return value, REPAIRED
+    for index, open_stack in reversed(cut_points[-max_repair_attempts:]):
+        value, _ = _try_loads(_close(text[start:index], open_stack))
+        if value is not None:
+            return value, REPAIRED
+    return None, FAILED
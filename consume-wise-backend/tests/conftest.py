@@ -0,0 +1,7 @@
+# consume-wise-backend/tests/conftest.py
+
+import os
+import sys
+
+# The backend modules are flat files next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,99 @@
+# consume-wise-backend/tests/test_analyze_jobs.py
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from analyze_jobs import AnalyzeJobService, CallbackRejected, check_callback_url, post_callback
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://0.0.0.0/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://224.0.0.1/hook",
+    "ftp://93.184.216.34/hook",
+    "http:///hook",
+])
+def test_callbacks_to_internal_addresses_are_rejected(url):
+    with pytest.raises(CallbackRejected):
+        check_callback_url(url)
+
+
+def test_callbacks_to_public_addresses_are_accepted():
+    assert check_callback_url("https://93.184.216.34/hook") == "93.184.216.34"
+
+
+def test_allowlist_admits_only_its_hosts_internal_ones_included():
+    assert check_callback_url("http://127.0.0.1:9000/hook", {"127.0.0.1"}) == "127.0.0.1"
+    with pytest.raises(CallbackRejected):
+        check_callback_url("https://93.184.216.34/hook", {"127.0.0.1"})
+
+
+class RedirectingHook(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        RedirectingHook.requests.append(self.path)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(307 if self.path == "/hook" else 200)
+        self.send_header("Location", "/redirected")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def hook_server():
+    RedirectingHook.requests = []
+    server = HTTPServer(("127.0.0.1", 0), RedirectingHook)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_redirects_are_not_followed(hook_server):
+    url = f"http://127.0.0.1:{hook_server}/hook"
+    assert post_callback(url, "127.0.0.1", b"{}", {"Content-Type": "application/json"}, 5) == 307
+    assert RedirectingHook.requests == ["/hook"]
+
+
+def test_submit_rejects_internal_callbacks_and_delivery_uses_the_allowlist(tmp_path, hook_server):
+    async def run_job(image_bytes, options):
+        return {"ok": True}
+
+    async def scenario():
+        jobs = AsyncMongoMockClient()["test"]["analyze_jobs"]
+        open_service = AnalyzeJobService(jobs, run_job, work_dir=str(tmp_path))
+        open_service.start()
+        with pytest.raises(CallbackRejected):
+            await open_service.submit(b"image", {}, callback_url=f"http://127.0.0.1:{hook_server}/done")
+        await open_service.stop()
+
+        service = AnalyzeJobService(jobs, run_job, work_dir=str(tmp_path), callback_hosts=["127.0.0.1"])
+        service.start()
+        job = await service.submit(b"image", {}, callback_url=f"http://127.0.0.1:{hook_server}/done")
+        for _ in range(200):
+            finished = await jobs.find_one({"_id": job["_id"]})
+            if "callback_delivered_at" in finished:
+                break
+            await asyncio.sleep(0.01)
+        await service.stop()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert finished["status"] == "completed"
+    assert "callback_delivered_at" in finished
+    assert RedirectingHook.requests == ["/done"]
@@ -0,0 +1,55 @@
+# consume-wise-backend/tests/test_artifacts.py
+
+import os
+import time
+
+import pytest
+
+from artifacts import ArtifactStore, etag_matches
+
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    ('"abc.jpg"', True),
+    ('W/"abc.jpg"', True),
+    ('"other.jpg", "abc.jpg"', True),
+    ("*", True),
+    ('"other.jpg"', False),
+    ("abc.jpg", False),
+    ("", False),
+])
+def test_if_none_match(if_none_match, matches):
+    assert etag_matches('"abc.jpg"', if_none_match) is matches
+
+
+def test_the_id_is_a_stable_content_hash(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = store.put(b"image bytes", "jpg")
+    assert store.put(b"image bytes", "jpg") == artifact_id
+    assert store.put(b"other bytes", "jpg") != artifact_id
+    path, media_type = store.get(artifact_id)
+    assert media_type == "image/jpeg"
+    with open(path, "rb") as f:
+        assert f.read() == b"image bytes"
+    assert store.get("../" + artifact_id) is None
+
+
+def test_artifacts_expire_after_their_ttl(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl_seconds=60, purge_interval_seconds=0)
+    artifact_id = store.put(b"image bytes", "webp")
+    path, _ = store.get(artifact_id)
+    assert 0 < store.remaining_ttl(path) <= 60
+
+    stale = time.time() - 61
+    os.utime(path, (stale, stale))
+    assert store.get(artifact_id) is None
+    assert store.remaining_ttl(path) == 0
+
+    # Storing the same bytes again refreshes the TTL
+    assert store.put(b"image bytes", "webp") == artifact_id
+    assert store.get(artifact_id) is not None
+
+    os.utime(path, (stale, stale))
+    expired = store.expired.value
+    store.purge_expired()
+    assert not os.path.exists(path)
+    assert store.expired.value - expired == 1
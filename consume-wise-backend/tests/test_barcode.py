@@ -0,0 +1,45 @@
+# consume-wise-backend/tests/test_barcode.py
+
+import pytest
+
+from barcode import normalize_barcode
+
+
+@pytest.mark.parametrize("value, expected", [
+    # EAN-13 and EAN-8 are already canonical
+    ("4006381333931", "4006381333931"),
+    ("8901234567890", "8901234567890"),
+    ("96385074", "96385074"),
+    # UPC-A gains a leading zero to become EAN-13
+    ("036000291452", "0036000291452"),
+    # GTIN-14 with a zero indicator digit drops it; other indicators are kept
+    ("00036000291452", "0036000291452"),
+    ("10036000291459", "10036000291459"),
+    # Printed separators and surrounding whitespace
+    (" 4006381 333931 ", "4006381333931"),
+    ("0-36000-29145-2", "0036000291452"),
+    # GS1 QR payloads
+    ("https://id.gs1.org/01/00036000291452/10/ABC", "0036000291452"),
+    ("(01)04006381333931(17)261231", "4006381333931"),
+    ("0104006381333931", "4006381333931"),
+])
+def test_valid_codes_normalize_to_one_gtin(value, expected):
+    assert normalize_barcode(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    # Bad check digits
+    "4006381333932",
+    "036000291453",
+    "96385075",
+    "10036000291450",
+    # Wrong lengths and non-GTIN content
+    "4006381",
+    "40063813339310",
+    "400638133393A",
+    "https://example.com/product/4006381333931",
+    "",
+    None,
+])
+def test_invalid_codes_are_rejected(value):
+    assert normalize_barcode(value) is None
@@ -0,0 +1,94 @@
+# consume-wise-backend/tests/test_cache.py
+
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+import cache
+from cache import AnalysisCache, LRUCache, MongoCacheTier
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    lru = LRUCache(ttl_seconds=10)
+    lru.set("a", "value")
+    clock.now += 9
+    assert lru.get("a") == "value"
+    clock.now += 2
+    assert lru.get("a") is None
+    assert len(lru) == 0 and lru.current_bytes == 0
+
+
+def test_byte_budget_evicts_least_recently_used_first():
+    lru = LRUCache(max_entries=100, max_bytes=10, sizeof=len)
+    lru.set("a", "xxxx")
+    lru.set("b", "xxxx")
+    assert lru.get("a") == "xxxx"  # "b" is now the least recently used
+    lru.set("c", "xxxx")
+    assert lru.get("b") is None
+    assert lru.get("a") == "xxxx" and lru.get("c") == "xxxx"
+    assert lru.current_bytes == 8
+
+
+def test_entry_count_bound_and_replacing_a_key():
+    lru = LRUCache(max_entries=2, sizeof=len)
+    lru.set("a", "1")
+    lru.set("b", "22")
+    lru.set("b", "333")
+    assert lru.current_bytes == 4
+    lru.set("c", "4")
+    assert lru.get("a") is None and len(lru) == 2
+
+
+def test_oversized_values_are_not_cached_and_evict_nothing():
+    lru = LRUCache(max_bytes=10, sizeof=len)
+    lru.set("a", "small")
+    lru.set("big", "x" * 11)
+    assert lru.get("big") is None
+    assert lru.get("a") == "small"
+
+
+def test_shared_tier_hits_are_promoted_to_the_local_lru():
+    async def scenario():
+        collection = AsyncMongoMockClient()["test"]["analysis_cache"]
+        writer = AnalysisCache("test_writer", LRUCache(), MongoCacheTier(collection))
+        reader = AnalysisCache("test_reader", LRUCache(), MongoCacheTier(collection))
+        await writer.set("key", {"analysis": 1})
+        first = await reader.get("key")
+        await collection.delete_many({})
+        # Served by the reader's own LRU now that the shared copy is gone
+        second = await reader.get("key")
+        return reader, first, second
+
+    reader, first, second = asyncio.run(scenario())
+    assert first == second == {"analysis": 1}
+    assert reader.shared_hits.value == 1 and reader.local_hits.value == 1
+
+
+def test_expired_shared_entries_and_shared_failures_are_misses():
+    class Unavailable:
+        async def get(self, key):
+            raise ConnectionError("down")
+
+        async def set(self, key, value):
+            raise ConnectionError("down")
+
+    async def scenario():
+        collection = AsyncMongoMockClient()["test"]["analysis_cache"]
+        await collection.insert_one({"_id": "old", "value": 1, "expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        expired = await AnalysisCache("test_expired", LRUCache(), MongoCacheTier(collection)).get("old")
+        broken = AnalysisCache("test_broken", LRUCache(), Unavailable())
+        await broken.set("key", 2)  # The local write still happens
+        return expired, await broken.get("key"), await broken.get("other")
+
+    assert asyncio.run(scenario()) == (None, 2, None)
@@ -0,0 +1,139 @@
+# consume-wise-backend/tests/test_catalog.py
+
+import asyncio
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from catalog import (
+    PRODUCT_INDEXES, InvalidCursor, build_search_query, decode_cursor, encode_cursor, ensure_product_indexes,
+    keyset_filter, plan_stages, product_projection, search_fields, sort_spec,
+)
+
+PRODUCTS = [
+    ("Organic Almond Milk", "Nature's Best", "Beverages"),
+    ("Almond Butter", "Nutty Co", "Spreads"),
+    ("Oat Milk", "Nature's Best", "Beverages"),
+    ("Milk Chocolate", "Cocoa World", "Snacks"),
+    ("Dark Chocolate Almonds", "Cocoa World", "Snacks"),
+]
+
+
+def products_collection():
+    async def setup():
+        collection = AsyncMongoMockClient()["test"]["products"]
+        await ensure_product_indexes(collection)
+        documents = [
+            {"product_name": name, "brand_name": brand, "product_category": category}
+            for name, brand, category in PRODUCTS
+        ]
+        for document in documents:
+            document.update(search_fields(document))
+        await collection.insert_many(documents)
+        return collection
+    return asyncio.run(setup())
+
+
+def names(collection, query, sort_key="_id"):
+    async def find():
+        return [doc["product_name"] async for doc in collection.find(query).sort(sort_spec(sort_key))]
+    return asyncio.run(find())
+
+
+def test_prefix_mode_matches_word_prefixes_in_any_order():
+    collection = products_collection()
+    assert names(collection, build_search_query(product_name="alm", search_mode="prefix")) == [
+        "Organic Almond Milk", "Almond Butter", "Dark Chocolate Almonds",
+    ]
+    assert names(collection, build_search_query(product_name="milk alm", search_mode="prefix")) == ["Organic Almond Milk"]
+    assert names(collection, build_search_query(brand_name="nature's", search_mode="prefix")) == [
+        "Organic Almond Milk", "Oat Milk",
+    ]
+    # Prefixes are anchored: "ilk" is inside "milk" but starts no word
+    assert names(collection, build_search_query(product_name="ilk", search_mode="prefix")) == []
+
+
+def test_prefix_mode_uses_token_fields_with_anchored_case_sensitive_regexes():
+    query = build_search_query(product_name="Almond Mi", search_mode="prefix")
+    assert query == {"$and": [
+        {"product_name_tokens": {"$regex": "^almond"}},
+        {"product_name_tokens": {"$regex": "^mi"}},
+    ]}
+
+
+def test_prefix_mode_escapes_regex_characters():
+    query = build_search_query(product_name="c++", search_mode="prefix")
+    assert query["$and"][0]["product_name_tokens"]["$regex"] == "^c"
+
+
+def test_text_mode_builds_one_text_search_over_name_and_brand():
+    query = build_search_query(product_name="almond", brand_name="nature", product_category="Beverages", search_mode="text")
+    assert query == {"$text": {"$search": "almond nature"}, "product_category": "Beverages"}
+    assert build_search_query(search_mode="text") == {}
+
+
+def test_regex_mode_is_the_default_substring_search():
+    collection = products_collection()
+    query = build_search_query(product_name="ILK")
+    assert query == build_search_query(product_name="ILK", search_mode="regex")
+    assert query == {"$and": [{"product_name": {"$regex": "ILK", "$options": "i"}}]}
+    assert names(collection, query) == ["Organic Almond Milk", "Oat Milk", "Milk Chocolate"]
+
+
+def test_exact_filters_are_combined_with_name_search():
+    collection = products_collection()
+    query = build_search_query(product_name="milk", product_category="Beverages")
+    assert names(collection, query) == ["Organic Almond Milk", "Oat Milk"]
+
+
+@pytest.mark.parametrize("sort_key", ["_id", "product_name"])
+def test_keyset_pages_cover_every_product_once(sort_key):
+    collection = products_collection()
+
+    async def page_through():
+        seen, query = [], {}
+        while True:
+            page = [doc async for doc in collection.find(query).sort(sort_spec(sort_key)).limit(2)]
+            seen.extend(doc["product_name"] for doc in page)
+            if len(page) < 2:
+                return seen
+            position = decode_cursor(encode_cursor(sort_key, page[-1]), sort_key)
+            query = keyset_filter(sort_key, position)
+
+    assert asyncio.run(page_through()) == names(collection, {}, sort_key)
+
+
+def test_cursor_round_trip_and_rejection():
+    document = {"_id": ObjectId(), "product_name": "Oat Milk"}
+    cursor = encode_cursor("product_name", document)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "product_name") == {"s": "product_name", "id": document["_id"], "v": "Oat Milk"}
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "_id")  # Issued for another sort order
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "_id")
+
+
+def test_index_specs_are_created_and_cover_the_searches():
+    collection = products_collection()
+    indexes = asyncio.run(collection.index_information())
+    for keys, options in PRODUCT_INDEXES:
+        assert options["name"] in indexes
+        if not any(direction == "text" for _, direction in keys):
+            assert indexes[options["name"]]["key"] == keys
+    # Every exact filter, token field and keyset order leads some index
+    leading = {keys[0][0] for keys, _ in PRODUCT_INDEXES}
+    assert {"product_category", "product_name_tokens", "brand_name_tokens", "product_name"} <= leading
+    text_fields = {field for keys, _ in PRODUCT_INDEXES for field, direction in keys if direction == "text"}
+    assert text_fields == {"product_name", "brand_name"}
+
+
+def test_projection_views_keep_the_sort_key():
+    assert product_projection("summary", sort_key="product_name")["product_name"] == 1
+    assert product_projection("full") == {"product_name_tokens": 0, "brand_name_tokens": 0}
+
+
+def test_plan_stages_flattens_nested_plans():
+    plan = {"stage": "FETCH", "inputStage": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "IXSCAN"}]}}
+    assert plan_stages(plan) == ["FETCH", "OR", "IXSCAN", "IXSCAN"]
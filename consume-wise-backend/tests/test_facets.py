@@ -0,0 +1,64 @@
+# consume-wise-backend/tests/test_facets.py
+
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from facets import FacetSummaries
+
+
+def product(name, category, brand, level, score):
+    document = {
+        "_id": name,
+        "product_category": category,
+        "brand_name": brand,
+        "purpose": "Snack",
+        "analysis": {"ProcessingLevel": {"Level": level}},
+    }
+    if score is not None:
+        document["health_score"] = {"score": score}
+    return document
+
+
+async def snapshot(summaries):
+    # Live summaries only; record() leaves zeroed documents that rebuild() deletes
+    return {
+        summary["_id"]: {key: summary[key] for key in ("count", "scored", "score_sum", "highly_processed")}
+        async for summary in summaries.find({"count": {"$gt": 0}})
+    }
+
+
+def test_incremental_bookkeeping_matches_a_rebuild():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        products = db["products"]
+        facets = FacetSummaries(db["facet_summaries"], products)
+
+        originals = [
+            product("chips", "Snacks", "Crunchy", "High", 30),
+            product("oats", "Cereal", "Morning", "Low", 80),
+            product("bar", "Snacks", "Morning", "Medium", None),
+        ]
+        await products.insert_many(originals)
+        await facets.record(added=originals)
+
+        # Re-analysis moves "chips" to another brand and level, so its old summaries go down
+        replacement = product("chips", "Snacks", "Salty", "Medium", 45)
+        await products.replace_one({"_id": "chips"}, replacement)
+        await facets.record(added=[replacement], removed=[originals[0]])
+
+        incremental = await snapshot(facets.summaries)
+        zeroed = await facets.summaries.find_one({"_id": "brand_name:Crunchy"})
+        await facets.rebuild()
+        return incremental, zeroed, await snapshot(facets.summaries), await facets.get(["brand_name"])
+
+    incremental, zeroed, rebuilt, view = asyncio.run(scenario())
+    assert incremental == rebuilt
+    assert zeroed["count"] == 0 and zeroed["score_sum"] == 0
+    assert incremental["total:total"] == {"count": 3, "scored": 2, "score_sum": 125, "highly_processed": 0}
+    assert incremental["product_category:Snacks"]["count"] == 2
+    assert view["total"] == {"count": 3, "avg_health_score": 62.5, "highly_processed": 0}
+    assert view["facets"]["brand_name"] == [
+        {"value": "Morning", "count": 2, "avg_health_score": 80.0, "highly_processed": 0},
+        {"value": "Salty", "count": 1, "avg_health_score": 45.0, "highly_processed": 0},
+    ]
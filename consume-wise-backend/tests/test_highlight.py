@@ -0,0 +1,60 @@
+# consume-wise-backend/tests/test_highlight.py
+
+import os
+
+import numpy as np
+
+from highlight import highlight_boxes, sub_quads
+from ingredients import IngredientIndex
+
+INDEX = IngredientIndex.load(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingredients.json"))
+
+# 100 x 20 axis-aligned line, corners ordered top-left, top-right, bottom-right, bottom-left
+LINE = [[0, 0], [100, 0], [100, 20], [0, 20]]
+
+
+def corners(polygon):
+    return polygon.reshape(-1, 2).tolist()
+
+
+def test_sub_quads_interpolates_along_both_edges():
+    # A slanted quad: the bottom edge is shifted right by 10
+    quads = np.array([[[0, 0], [100, 0], [110, 20], [10, 20]]], dtype=np.float64)
+    assert sub_quads(quads, np.array([0.25]), np.array([0.5])).tolist() == [
+        [[25, 0], [50, 0], [60, 20], [35, 20]]
+    ]
+    assert sub_quads(quads, np.array([0.0]), np.array([1.0])).tolist() == [quads[0].tolist()]
+
+
+def test_sub_quads_handles_several_quads_at_once():
+    quads = np.array([LINE, [[0, 30], [50, 30], [50, 40], [0, 40]]], dtype=np.float64)
+    result = sub_quads(quads, np.array([0.5, 0.0]), np.array([1.0, 0.2]))
+    assert result.dtype == np.int32
+    assert result.tolist() == [
+        [[50, 0], [100, 0], [100, 20], [50, 20]],
+        [[0, 30], [10, 30], [10, 40], [0, 40]],
+    ]
+
+
+def test_each_term_gets_the_box_of_its_characters():
+    # "Oats" is characters 0-4 and "Sugar" 5-10 of a 10 character line
+    boxes = highlight_boxes([{"text": "Oats Sugar", "coords": LINE}], [], INDEX)
+    assert [corners(box) for box in boxes["beneficial"]] == [[[0, 0], [40, 0], [40, 20], [0, 20]]]
+    assert [corners(box) for box in boxes["harmful"]] == [[[50, 0], [100, 0], [100, 20], [50, 20]]]
+    assert boxes["neutral"] == []
+
+
+def test_reported_terms_lines_without_terms_and_polygons():
+    items = [
+        {"text": "Emulsifier", "coords": LINE},
+        {"text": "Batch 12", "coords": [[0, 30], [100, 30], [100, 50], [0, 50]]},
+        {"text": "Sugar", "coords": [[0, 60], [50, 60], [60, 70], [50, 80], [0, 80]]},
+    ]
+    boxes = highlight_boxes(items, ["emulsifier"], INDEX)
+    # Non-quad polygons cannot be sliced and keep their shape; they are added before the quads
+    assert corners(boxes["harmful"][0]) == items[2]["coords"]
+    # A harmful term reported by the LLM is highlighted even though the index does not know it
+    assert corners(boxes["harmful"][1]) == LINE
+    # A line with no terms is outlined whole as neutral
+    assert [corners(box) for box in boxes["neutral"]] == [[[0, 30], [100, 30], [100, 50], [0, 50]]]
+    assert len(boxes["harmful"]) == 2 and boxes["beneficial"] == []
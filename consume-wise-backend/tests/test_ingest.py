@@ -0,0 +1,80 @@
+# consume-wise-backend/tests/test_ingest.py
+
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from ingest import COMPLETED, DONE, FAILED, IngestService
+
+
+def rows(count):
+    return [
+        {"product_name": f"P{index}", "product_qty": "1", "brand_name": "Acme", "ingredients": f"Sugar {index}"}
+        for index in range(count)
+    ]
+
+
+def service(tmp_path, build_document, db=None):
+    db = db or AsyncMongoMockClient()["test"]
+    return IngestService(
+        db["ingest_jobs"], db["ingest_items"], db["products"], build_document,
+        work_dir=str(tmp_path), chunk_size=4, max_attempts=1,
+    )
+
+
+async def wait_for(ingest, job_id):
+    while job_id in ingest._running:
+        await asyncio.sleep(0.01)
+    return await ingest.status(job_id)
+
+
+def test_job_writes_products_and_marks_items(tmp_path):
+    async def build_document(row, image_bytes):
+        if row["product_name"] == "P3":
+            raise ValueError("bad row")
+        return dict(row)
+
+    async def scenario():
+        ingest = service(tmp_path, build_document)
+        job = await wait_for(ingest, await ingest.create_job(rows(6)))
+        return job, await ingest.products.count_documents({})
+
+    job, products = asyncio.run(scenario())
+    assert job["status"] == COMPLETED
+    assert job["counts"] == {"pending": 0, DONE: 5, FAILED: 1}
+    assert products == 5
+
+
+def test_resume_after_a_crash_does_not_rebuild_finished_items(tmp_path):
+    built = []
+
+    async def build_document(row, image_bytes):
+        built.append(row["product_name"])
+        return dict(row)
+
+    async def scenario():
+        ingest = service(tmp_path, build_document)
+        bulk_write = ingest.products.bulk_write
+        calls = []
+
+        async def crash_once(operations, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("connection lost")
+            return await bulk_write(operations, **kwargs)
+
+        ingest.products.bulk_write = crash_once
+        job_id = await ingest.create_job(rows(6))
+        failed = await wait_for(ingest, job_id)
+        await ingest.retry_failed(job_id)
+        resumed = await wait_for(ingest, job_id)
+        return failed, resumed, await ingest.products.count_documents({})
+
+    failed, resumed, products = asyncio.run(scenario())
+    # The failing job says why instead of staying queued
+    assert failed["status"] == FAILED and "connection lost" in failed["error"]
+    assert resumed["status"] == COMPLETED and "error" not in resumed
+    assert resumed["counts"][DONE] == 6
+    assert products == 6
+    # The four items of the interrupted chunk were built once
+    assert sorted(built) == [f"P{index}" for index in range(6)]
@@ -0,0 +1,58 @@
+# consume-wise-backend/tests/test_ingredients.py
+
+import os
+
+import pytest
+
+from ingredients import IngredientIndex, local_analysis
+
+INDEX = IngredientIndex.load(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingredients.json"))
+
+
+def classify(*ingredients):
+    matches, unknown = INDEX.classify(list(ingredients))
+    return [match["entry"]["name"] for match in matches], unknown
+
+
+@pytest.mark.parametrize("claim", [
+    "Sugar free", "sugar-free", "No added sugar", "no artificial sugar", "without sugar", "Free from sugar",
+])
+def test_absence_claims_do_not_match_the_ingredient(claim):
+    assert classify(claim) == ([], [])
+
+
+def test_absence_claims_only_negate_their_own_ingredient():
+    assert classify("gluten free oats", "sugar") == (["Oats", "Sugar"], [])
+    analysis = local_analysis(INDEX.classify(["sugar free", "gluten free"])[0])
+    assert analysis["HarmfulIngredients"] == []
+    assert analysis["DietCompliance"]["NonCompliantDiets"] == []
+
+
+def test_unmatched_words_of_a_partly_matched_segment_are_unknown():
+    assert classify("milk chocolate") == (["Milk"], ["chocolate"])
+    assert classify("sugar, dragon fruit powder, salt") == (["Sugar", "Fruit", "Salt"], ["dragon"])
+    # Label boilerplate around a match is not an ingredient
+    assert classify("Contains added sugar") == (["Sugar"], [])
+
+
+def test_multi_word_aliases_win_over_their_words():
+    names, unknown = classify("almond milk")
+    assert (names, unknown) == (["Almond Milk"], [])
+    analysis = local_analysis(INDEX.classify(["almond milk"])[0])
+    assert analysis["DiabetesAllergenFriendly"]["Allergens"] == ["tree nuts"]
+    assert "Vegan" in analysis["DietCompliance"]["CompliantDiets"]
+    assert classify("cocoa butter")[0] == ["Cocoa Butter"]
+
+
+@pytest.mark.parametrize("row", ["Total Sugars 12 g", "Energy 450 kcal", "Sodium 120mg", "Fat 3.5 g"])
+def test_nutrition_rows_are_skipped(row):
+    assert classify(row) == ([], [])
+
+
+def test_ingredient_lists_still_classify():
+    names, unknown = classify(
+        "Wheat Flour, Sugar, Palm Oil, Cocoa Solids, Raising Agents (503(ii), 500(ii)), Salt, Emulsifier (Soy Lecithin)"
+    )
+    assert names[:4] == ["Refined Wheat Flour", "Sugar", "Palm Oil", "Cocoa"]
+    assert "Lecithin" in names and "Salt" in names
+    assert unknown == []
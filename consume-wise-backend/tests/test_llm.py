@@ -0,0 +1,98 @@
+# consume-wise-backend/tests/test_llm.py
+
+import asyncio
+
+import pytest
+
+import llm
+from llm import LLMBackend, LLMClient
+
+
+class Flaky(LLMBackend):
+    # Fails with a retryable error `failures` times, then answers
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def generate(self, prompt, generation_config=None, usage=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+class Slow(LLMBackend):
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.active = 0
+        self.peak = 0
+
+    async def generate(self, prompt, generation_config=None, usage=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.seconds)
+        finally:
+            self.active -= 1
+        return "ok"
+
+
+def jitter_bounds(monkeypatch):
+    # Record each backoff cap and skip the actual wait
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return 0
+
+    monkeypatch.setattr(llm.random, "uniform", uniform)
+    return bounds
+
+
+def test_retryable_failures_back_off_with_jitter_then_succeed(monkeypatch):
+    bounds = jitter_bounds(monkeypatch)
+    backend = Flaky(2, ConnectionError("reset"))
+    client = LLMClient(backend, max_retries=2, backoff_base_seconds=0.5, backoff_max_seconds=0.75)
+    retries = client.retries.value
+    assert asyncio.run(client.generate("prompt")) == "ok"
+    assert backend.calls == 3
+    assert client.retries.value - retries == 2
+    # Exponential cap (0.5, then 1.0) clipped at backoff_max_seconds
+    assert bounds == [(0, 0.5), (0, 0.75)]
+
+
+def test_non_retryable_errors_and_exhausted_retries_raise(monkeypatch):
+    jitter_bounds(monkeypatch)
+    backend = Flaky(1, ValueError("bad request"))
+    with pytest.raises(ValueError):
+        asyncio.run(LLMClient(backend).generate("prompt"))
+    assert backend.calls == 1
+
+    backend = Flaky(5, ConnectionError("reset"))
+    client = LLMClient(backend, max_retries=2)
+    failures = client.failures.value
+    with pytest.raises(ConnectionError):
+        asyncio.run(client.generate("prompt"))
+    assert backend.calls == 3
+    assert client.failures.value - failures == 1
+
+
+def test_each_attempt_is_bounded_by_the_timeout(monkeypatch):
+    jitter_bounds(monkeypatch)
+    client = LLMClient(Slow(5), timeout_seconds=0.05, max_retries=1)
+    timeouts = client.timeouts.value
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.generate("prompt"))
+    assert client.timeouts.value - timeouts == 2
+
+
+def test_concurrent_calls_stay_within_the_limit():
+    backend = Slow(0.02)
+    client = LLMClient(backend, max_concurrency=3)
+
+    async def scenario():
+        return await asyncio.gather(*(client.generate(f"prompt {i}") for i in range(10)))
+
+    assert asyncio.run(scenario()) == ["ok"] * 10
+    assert backend.peak == 3
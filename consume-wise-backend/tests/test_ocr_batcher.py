@@ -0,0 +1,59 @@
+# consume-wise-backend/tests/test_ocr_batcher.py
+
+import asyncio
+
+import pytest
+
+from ocr_pool import OCRBatcher
+
+
+def test_batch_results_fan_out_and_dispatch_tasks_are_released():
+    async def run_batch(images):
+        await asyncio.sleep(0.01)
+        return [[{"text": str(image)}] for image in images]
+
+    async def scenario():
+        batcher = OCRBatcher(run_batch, window_seconds=0.01, max_batch_size=4)
+        results = await asyncio.gather(*[batcher.submit(index) for index in range(3)])
+        await asyncio.sleep(0)
+        return results, batcher._dispatching
+
+    results, dispatching = asyncio.run(scenario())
+    assert results == [[{"text": "0"}], [{"text": "1"}], [{"text": "2"}]]
+    assert not dispatching
+
+
+def test_batch_failure_reaches_every_caller():
+    async def run_batch(images):
+        raise RuntimeError("engine crashed")
+
+    async def scenario():
+        batcher = OCRBatcher(run_batch, window_seconds=0.01, max_batch_size=2)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_close_cancels_batches_in_flight_and_waiting_images():
+    started = []
+
+    async def run_batch(images):
+        started.append(images)
+        await asyncio.sleep(10)
+
+    async def scenario():
+        batcher = OCRBatcher(run_batch, window_seconds=5, max_batch_size=2)
+        in_flight = [asyncio.ensure_future(batcher.submit(index)) for index in range(2)]
+        waiting = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0.01)
+        assert len(batcher._dispatching) == 1
+        await batcher.close()
+        assert not batcher._dispatching
+        # Nobody is left waiting forever
+        for future in in_flight + [waiting]:
+            with pytest.raises(asyncio.CancelledError):
+                await future
+
+    asyncio.run(scenario())
+    assert started == [[0, 1]]
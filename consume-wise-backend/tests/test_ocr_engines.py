@@ -0,0 +1,19 @@
+# consume-wise-backend/tests/test_ocr_engines.py
+
+import pytest
+
+from ocr_engines import OnnxEngine, create_engine
+
+
+def test_onnx_engine_rejects_languages_it_has_no_model_for():
+    assert create_engine("onnx", lang="en").lang == "en"
+    assert create_engine("onnx", lang="ch").lang == "ch"
+    with pytest.raises(ValueError, match="'fr'"):
+        create_engine("onnx", lang="fr")
+    with pytest.raises(ValueError):
+        OnnxEngine(lang="hi")
+
+
+def test_unknown_engines_are_rejected():
+    with pytest.raises(ValueError, match="Unknown OCR engine"):
+        create_engine("easyocr")
@@ -0,0 +1,49 @@
+# consume-wise-backend/tests/test_ocr_pool.py
+
+import asyncio
+import os
+import signal
+
+import numpy as np
+
+from ocr_pool import OCRPool
+
+
+def test_pool_restarts_after_a_worker_dies_and_reruns_the_batch():
+    # No OCR engine is needed: a failing engine still answers every image with []
+    pool = OCRPool(workers=1, max_queue=4, engine="tesseract")
+
+    restarts = pool.restarts.value
+
+    async def scenario():
+        await pool.warmup()
+        broken = pool._executor
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        await asyncio.sleep(0.5)
+        first = await pool.extract(np.zeros((8, 8, 3), dtype=np.uint8))
+        second = await pool.extract(np.zeros((8, 8, 3), dtype=np.uint8))
+        return broken, first, second
+
+    try:
+        broken, first, second = asyncio.run(scenario())
+        assert first == [] and second == []
+        assert pool._executor is not broken
+        assert pool.restarts.value == restarts + 1
+    finally:
+        pool.shutdown()
+
+
+def test_a_model_that_fails_to_preload_does_not_break_the_pool():
+    pool = OCRPool(workers=2, max_queue=4, engine="tesseract", preload=True)
+    restarts = pool.restarts.value
+
+    async def scenario():
+        await pool.warmup()
+        return await pool.extract(np.zeros((8, 8, 3), dtype=np.uint8))
+
+    try:
+        assert asyncio.run(scenario()) == []
+        assert pool.restarts.value == restarts
+    finally:
+        pool.shutdown()
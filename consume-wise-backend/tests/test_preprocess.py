@@ -0,0 +1,52 @@
+# consume-wise-backend/tests/test_preprocess.py
+
+import cv2
+import numpy as np
+import pytest
+
+from preprocess import _skew_angle, _text_mask, map_items_back, preprocess
+
+
+def synthetic_label(angle: float = 0.0) -> np.ndarray:
+    # Dark text lines on a light card, rotated by `angle` degrees (counter-clockwise)
+    image = np.full((700, 900, 3), 235, np.uint8)
+    for row in range(8):
+        cv2.putText(image, "INGREDIENTS: SUGAR, COCOA BUTTER, MILK", (80, 180 + row * 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (20, 20, 20), 2)
+    if angle:
+        rotation = cv2.getRotationMatrix2D((450, 350), angle, 1.0)
+        image = cv2.warpAffine(image, rotation, (900, 700), borderValue=(235, 235, 235))
+    return image
+
+
+def residual_skew(image: np.ndarray) -> float:
+    return _skew_angle(_text_mask(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)))
+
+
+@pytest.mark.parametrize("angle", [8.0, -8.0, 4.0, -4.0])
+def test_deskew_straightens_both_directions(angle):
+    skewed = synthetic_label(angle)
+    assert abs(residual_skew(skewed)) > 3
+    processed, _ = preprocess(skewed, crop_to_text=False)
+    assert abs(residual_skew(processed)) < 1.5
+
+
+def test_straight_label_is_not_rotated():
+    image = synthetic_label()
+    processed, transform = preprocess(image, crop_to_text=False)
+    assert np.allclose(transform, np.eye(3))
+    assert processed.shape == image.shape
+
+
+def test_skew_angle_is_folded_into_plus_minus_45():
+    for angle in (-30.0, -8.0, 8.0, 30.0):
+        assert -45 <= residual_skew(synthetic_label(angle)) < 45
+
+
+def test_boxes_map_back_to_the_original_frame():
+    image = synthetic_label(-8.0)
+    _, transform = preprocess(image, max_long_edge=600)
+    corners = [[100.0, 100.0], [300.0, 100.0], [300.0, 140.0], [100.0, 140.0]]
+    homogeneous = np.hstack([np.array(corners), np.ones((4, 1))]) @ transform.T
+    items = [{"text": "x", "coords": homogeneous[:, :2].tolist()}]
+    assert np.allclose(map_items_back(items, transform)[0]["coords"], corners, atol=1e-6)
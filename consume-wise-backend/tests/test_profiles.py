@@ -0,0 +1,32 @@
+# consume-wise-backend/tests/test_profiles.py
+
+import pytest
+
+from profiles import ALL_SECTIONS, PROFILES, max_output_tokens, resolve_sections
+
+
+def test_profile_sections_are_in_canonical_order():
+    assert resolve_sections("full") == ALL_SECTIONS
+    assert resolve_sections("product") == PROFILES["product"]
+
+
+def test_section_names_override_the_profile():
+    assert resolve_sections("full", "DietCompliance, ProcessingLevel") == ["ProcessingLevel", "DietCompliance"]
+
+
+@pytest.mark.parametrize("names", [",", " , ,"])
+def test_empty_section_list_is_rejected(names):
+    with pytest.raises(ValueError):
+        resolve_sections("full", names)
+
+
+def test_unknown_sections_and_profiles_are_rejected():
+    with pytest.raises(ValueError):
+        resolve_sections("full", "Nope")
+    with pytest.raises(ValueError):
+        resolve_sections("nope")
+
+
+def test_every_profile_has_an_output_budget():
+    for sections in PROFILES.values():
+        assert max_output_tokens(sections) > 0
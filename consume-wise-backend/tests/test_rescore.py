@@ -0,0 +1,55 @@
+# consume-wise-backend/tests/test_rescore.py
+
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from rescore import CHECKPOINT_ID, DRY_RUN_CHECKPOINT_ID, Rescorer
+from scoring import calculate_health_score
+
+ANALYSIS = {"HarmfulIngredients": [{"Ingredient": "Sugar", "Reason": "Added sugar"}], "ProcessingLevel": {"Level": "High"}}
+
+
+def catalogue(count):
+    db = AsyncMongoMockClient()["test"]
+    products = [
+        {"product_name": f"P{index}", "analysis": ANALYSIS, "health_score": {"score": 100, "review": "stale"}}
+        for index in range(count)
+    ]
+    asyncio.run(db["products"].insert_many(products))
+    return db, Rescorer(db["products"], db["rescore_checkpoints"], batch_size=4)
+
+
+def test_dry_runs_resume_past_max_documents_without_writing():
+    db, rescorer = catalogue(25)
+
+    async def scenario():
+        reports = [await rescorer.run(dry_run=True, max_documents=10) for _ in range(4)]
+        checkpoint = await db["rescore_checkpoints"].find_one({"_id": DRY_RUN_CHECKPOINT_ID})
+        real = await db["rescore_checkpoints"].find_one({"_id": CHECKPOINT_ID})
+        stale = await db["products"].count_documents({"health_score.review": "stale"})
+        return reports, checkpoint, real, stale
+
+    reports, checkpoint, real, stale = asyncio.run(scenario())
+    assert [(report["scanned"], report["done"]) for report in reports] == [(10, False), (10, False), (5, True), (10, False)]
+    assert reports[0]["resumed_after"] is None and reports[1]["resumed_after"] is not None
+    # The catalogue was covered once, then a finished dry run starts over
+    assert sum(report["changed"] for report in reports[:3]) == 25
+    assert reports[3]["resumed_after"] is None
+    assert checkpoint["scanned"] == 10 and not checkpoint["completed"]
+    assert real is None
+    assert stale == 25
+
+
+def test_real_run_ignores_the_dry_run_checkpoint():
+    db, rescorer = catalogue(9)
+
+    async def scenario():
+        await rescorer.run(dry_run=True, max_documents=5)
+        report = await rescorer.run()
+        scores = [product["health_score"]["score"] async for product in db["products"].find()]
+        return report, scores
+
+    report, scores = asyncio.run(scenario())
+    assert report["resumed_after"] is None and report["scanned"] == 9 and report["done"]
+    assert scores == [calculate_health_score(ANALYSIS)] * 9
@@ -0,0 +1,98 @@
+# consume-wise-backend/tests/test_singleflight.py
+
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from label_image import LabelImage
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    async def scenario():
+        flight = SingleFlight("test_share")
+        results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert results == [{"value": 1}] * 5
+    assert len(runs) == 1
+    assert flight.dedupe_ratio.value == pytest.approx(0.8)
+
+
+def test_errors_reach_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+
+    async def scenario():
+        flight = SingleFlight("test_errors")
+        return await asyncio.gather(*[flight.do("key", fail) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(scenario()))
+
+
+def test_shared_call_is_cancelled_only_when_every_waiter_left():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        flight = SingleFlight("test_cancel")
+        first = asyncio.ensure_future(flight.do("key", slow))
+        second = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+        second.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled
+        # A new call with the same key starts afresh
+        assert await flight.do("key", lambda: asyncio.sleep(0, result="fresh")) == "fresh"
+
+    asyncio.run(scenario())
+
+
+def test_shared_call_outlives_the_input_of_a_cancelled_first_waiter():
+    # As in main.get_detected_items: the shared call gets the decoded frame, so the first
+    # caller closing its LabelImage after leaving does not affect the other waiters
+    upload = cv2.imencode(".png", np.full((4, 4, 3), 7, dtype=np.uint8))[1].tobytes()
+    images = [LabelImage(upload), LabelImage(upload)]
+
+    async def ocr(frame):
+        await asyncio.sleep(0.05)
+        return int(frame.sum())
+
+    async def request(flight, image):
+        try:
+            frame = image.decoded()
+            return await flight.do("key", lambda: ocr(frame))
+        finally:
+            image.close()
+
+    async def scenario():
+        flight = SingleFlight("test_owned_input")
+        first = asyncio.ensure_future(request(flight, images[0]))
+        second = asyncio.ensure_future(request(flight, images[1]))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert images[0].raw is None  # The first caller closed its image
+        return await second
+
+    assert asyncio.run(scenario()) == 7 * 4 * 4 * 3
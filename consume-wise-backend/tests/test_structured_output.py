@@ -0,0 +1,53 @@
+# consume-wise-backend/tests/test_structured_output.py
+
+from structured_output import CLEAN, REPAIRED, parse_json_object, validate_analysis
+
+
+def test_invalid_items_are_dropped_from_a_list_section_not_the_whole_section():
+    data = {
+        "HarmfulIngredients": [
+            {"Ingredient": "Palm Oil", "Reason": "Saturated fat"},
+            {"Reason": "No ingredient named"},
+            "Sugar",
+            {"Ingredient": "Sodium Benzoate"},
+        ],
+        "MisleadingClaims": [{"Reason": "No claim named"}],
+        "ProcessingLevel": {"Level": "High"},
+    }
+    analysis, dropped = validate_analysis(data)
+    assert [item["Ingredient"] for item in analysis["HarmfulIngredients"]] == ["Palm Oil", "Sugar", "Sodium Benzoate"]
+    assert analysis["MisleadingClaims"] == []
+    assert analysis["ProcessingLevel"]["Level"] == "High"
+    assert dropped == ["HarmfulIngredients[1]", "MisleadingClaims[0]"]
+
+
+def test_invalid_sections_are_reset_and_reported():
+    analysis, dropped = validate_analysis({"NutritionalAnalysis": "n/a", "RecommendedAlternatives": "Oats"})
+    assert dropped == ["NutritionalAnalysis"]
+    assert analysis["NutritionalAnalysis"]["HealthRisks"] == []
+    assert analysis["RecommendedAlternatives"] == ["Oats"]
+
+
+def test_valid_analysis_reports_nothing_and_keeps_requested_sections():
+    analysis, dropped = validate_analysis({"HarmfulIngredients": ["Sugar"]}, ["HarmfulIngredients"])
+    assert dropped == []
+    assert analysis == {"HarmfulIngredients": [{"Ingredient": "Sugar", "Reason": ""}]}
+
+
+def test_truncated_json_is_repaired():
+    assert parse_json_object('{"a": [1, 2]}') == ({"a": [1, 2]}, CLEAN)
+    assert parse_json_object('{"a": [1, 2], "b": "unfinish') == ({"a": [1, 2], "b": "unfinish"}, REPAIRED)
+
+
+def test_object_sections_that_arrive_as_lists_are_dropped():
+    data = {
+        "ProcessingLevel": [],
+        "NutritionalAnalysis": [{"HealthRisks": ["Sugar"]}],
+        "DietCompliance": [{"CompliantDiets": ["Vegan"]}],
+        "HarmfulIngredients": [{"Ingredient": "Palm Oil"}, {"Reason": "No ingredient named"}],
+    }
+    analysis, dropped = validate_analysis(data)
+    assert dropped == ["ProcessingLevel", "NutritionalAnalysis", "DietCompliance", "HarmfulIngredients[1]"]
+    assert analysis["ProcessingLevel"]["Level"] == "Unknown"
+    assert analysis["DietCompliance"]["CompliantDiets"] == []
+    assert [item["Ingredient"] for item in analysis["HarmfulIngredients"]] == ["Palm Oil"]